@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_buffer.py
+
+Unit tests of WriteBuffer
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import errno
+import socket
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
+
+from exaproxy.util import buffer
+from exaproxy.util.buffer import WriteBuffer
+
+
+class Socket (object):
+	"""a socket accepting at most limit bytes per call, raising error after some calls"""
+
+	def __init__ (self, limit=None, error=None, after=0):
+		self.limit = limit
+		self.error = error
+		self.after = after
+		self.sent = []
+
+	def send (self, data):
+		if self.error is not None and len(self.sent) >= self.after:
+			raise socket.error(self.error, os.strerror(self.error))
+
+		data = data.tobytes() if isinstance(data, memoryview) else data
+		data = data[:self.limit] if self.limit is not None else data
+		self.sent.append(data)
+		return len(data)
+
+	def sendmsg (self, chunks):
+		return self.send(''.join(chunk if isinstance(chunk, str) else chunk.tobytes() for chunk in chunks))
+
+
+class TestWriteBuffer (unittest.TestCase):
+	def setUp (self):
+		# the tests are the same with or without sendmsg
+		self.sendmsg = buffer._sendmsg
+
+	def tearDown (self):
+		buffer._sendmsg = self.sendmsg
+
+	def test_append (self):
+		w_buffer = WriteBuffer('abc')
+		w_buffer.append('')
+		w_buffer.append('def')
+		w_buffer.prepend('012')
+
+		self.assertEqual(len(w_buffer), 9)
+		self.assertEqual(str(w_buffer), '012abcdef')
+		self.assertTrue(w_buffer)
+
+		w_buffer.clear()
+		self.assertFalse(w_buffer)
+		self.assertEqual(str(w_buffer), '')
+
+	def test_consume (self):
+		w_buffer = WriteBuffer('abc')
+		w_buffer.append('defgh')
+		w_buffer.append('ij')
+
+		# within the first chunk, which is then a view
+		w_buffer.consume(1)
+		self.assertEqual(str(w_buffer), 'bcdefghij')
+		self.assertTrue(isinstance(w_buffer.chunks[0], memoryview))
+
+		# within a view
+		w_buffer.consume(1)
+		self.assertEqual(str(w_buffer), 'cdefghij')
+
+		# across chunks
+		w_buffer.consume(3)
+		self.assertEqual(str(w_buffer), 'fghij')
+		self.assertEqual(len(w_buffer), 5)
+
+		# exactly to the end of a chunk
+		w_buffer.consume(3)
+		self.assertEqual(list(w_buffer.chunks), ['ij'])
+
+		w_buffer.consume(2)
+		self.assertFalse(w_buffer)
+		self.assertEqual(len(w_buffer.chunks), 0)
+
+	def test_send_partial (self):
+		for sendmsg in (False, True):
+			buffer._sendmsg = sendmsg
+
+			sock = Socket(limit=4)
+			w_buffer = WriteBuffer('0123456789')
+
+			self.assertEqual(w_buffer.send(sock), 4)
+			self.assertEqual(str(w_buffer), '456789')
+			self.assertEqual(w_buffer.send(sock), 4)
+			self.assertEqual(w_buffer.send(sock), 2)
+			self.assertFalse(w_buffer)
+			self.assertEqual(''.join(sock.sent), '0123456789')
+
+	def test_send_empty (self):
+		# the socket is still written to, so it can report an error
+		sock = Socket()
+		self.assertEqual(WriteBuffer().send(sock), 0)
+		self.assertEqual(sock.sent, [''])
+
+	def test_flush_short_write (self):
+		for sendmsg in (False, True):
+			buffer._sendmsg = sendmsg
+
+			# the socket is full after a short write, we do not try again
+			sock = Socket(limit=3)
+			w_buffer = WriteBuffer('abcdef')
+
+			self.assertEqual(w_buffer.flush(sock), 3)
+			self.assertEqual(len(sock.sent), 1)
+			self.assertEqual(str(w_buffer), 'def')
+
+	def test_flush_block (self):
+		buffer._sendmsg = False
+
+		# some data was sent before the socket was full
+		sock = Socket(error=errno.EAGAIN, after=1)
+		w_buffer = WriteBuffer('x' * (buffer.GATHER_SIZE + 1))
+		w_buffer.append('y' * buffer.GATHER_SIZE)
+
+		self.assertEqual(w_buffer.flush(sock), buffer.GATHER_SIZE + 1)
+		self.assertEqual(str(w_buffer), 'y' * buffer.GATHER_SIZE)
+
+		# nothing could be sent
+		sock = Socket(error=errno.EAGAIN)
+		self.assertRaises(socket.error, w_buffer.flush, sock)
+		self.assertEqual(len(w_buffer), buffer.GATHER_SIZE)
+
+		# other errors are always raised
+		sock = Socket(error=errno.ECONNRESET, after=1)
+		w_buffer = WriteBuffer('x' * (buffer.GATHER_SIZE + 1))
+		w_buffer.append('y')
+		self.assertRaises(socket.error, w_buffer.flush, sock)
+
+	def test_gather (self):
+		buffer._sendmsg = False
+
+		# the small chunks are sent with one call
+		sock = Socket()
+		w_buffer = WriteBuffer()
+		for number in range(100):
+			w_buffer.append(str(number))
+
+		expected = ''.join(str(number) for number in range(100))
+		self.assertEqual(w_buffer.flush(sock), len(expected))
+		self.assertEqual(sock.sent, [expected])
+
+		# but not merged past GATHER_SIZE
+		sock = Socket()
+		w_buffer = WriteBuffer('a' * (buffer.GATHER_SIZE - 1))
+		w_buffer.append('bb')
+		w_buffer.append('c' * buffer.GATHER_SIZE)
+
+		w_buffer.flush(sock)
+		self.assertEqual(sock.sent, ['a' * (buffer.GATHER_SIZE - 1), 'bb', 'c' * buffer.GATHER_SIZE])
+
+	def test_gather_view (self):
+		buffer._sendmsg = False
+
+		# what is left of a partly sent chunk is merged with the next ones
+		sock = Socket(limit=2)
+		w_buffer = WriteBuffer('abcd')
+		w_buffer.append('ef')
+
+		self.assertEqual(w_buffer.send(sock), 2)
+		sock.limit = None
+		self.assertEqual(w_buffer.flush(sock), 4)
+		self.assertEqual(sock.sent, ['ab', 'cdef'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_cache.py
+
+Unit tests of DNSCache and VerdictCache
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import imp
+import unittest
+
+lib = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib')
+sys.path.insert(0, lib)
+
+from exaproxy.reactor.resolver import cache as dnscache
+from exaproxy.reactor.resolver.cache import DNSCache, ENTRY_OVERHEAD
+
+# the redirector package needs the configuration loaded, the cache does not
+verdicts = imp.load_source('verdicts', os.path.join(lib, 'exaproxy', 'reactor', 'redirector', 'cache.py'))
+
+
+class Clock (object):
+	def __init__ (self, now):
+		self.now = now
+
+	def __call__ (self):
+		return self.now
+
+
+class Request (object):
+	def __init__ (self, method):
+		self.method = method
+
+class Message (object):
+	def __init__ (self, method, host, url):
+		self.request = Request(method)
+		self.host = host
+		self.url = url
+
+
+class TestDNSCache (unittest.TestCase):
+	def setUp (self):
+		self.time = dnscache.time
+		self.clock = Clock(1000.0)
+		dnscache.time = self.clock
+
+	def tearDown (self):
+		dnscache.time = self.time
+
+	def test_ttl (self):
+		cache = DNSCache(1024*1024, 10, 3600, 30)
+
+		cache.set('short.test', '192.0.2.1', 1)
+		cache.set('long.test', '192.0.2.2', 100000)
+		cache.set('default.test', '192.0.2.3')
+		cache.set('normal.test', '192.0.2.4', 60)
+
+		# the TTL is at least the minimum
+		self.clock.now = 1009.0
+		self.assertEqual(cache.get('short.test'), '192.0.2.1')
+		self.clock.now = 1011.0
+		self.assertEqual(cache.get('short.test', False), False)
+
+		self.clock.now = 1059.0
+		self.assertEqual(cache.get('normal.test'), '192.0.2.4')
+		self.clock.now = 1061.0
+		self.assertEqual(cache.get('normal.test'), None)
+
+		# and at most the maximum, which is used when the TTL is not known
+		self.clock.now = 4599.0
+		self.assertEqual(cache.get('long.test'), '192.0.2.2')
+		self.assertEqual(cache.get('default.test'), '192.0.2.3')
+		self.clock.now = 4601.0
+		self.assertEqual(cache.get('long.test'), None)
+		self.assertEqual(cache.get('default.test'), None)
+
+		self.assertEqual(cache.expired, 4)
+		self.assertEqual(len(cache), 0)
+		self.assertEqual(cache.used, 0)
+
+	def test_negative (self):
+		cache = DNSCache(1024*1024, 10, 3600, 30)
+		cache.set('missing.test', None, 3600)
+
+		# known not to resolve (None) rather than unknown (the default)
+		self.assertEqual(cache.get('missing.test', False), None)
+		self.assertEqual(cache.negative_hit, 1)
+		self.assertEqual(cache.hit, 0)
+
+		self.clock.now = 1031.0
+		self.assertEqual(cache.get('missing.test', False), False)
+		self.assertEqual(cache.miss, 1)
+
+	def test_count (self):
+		cache = DNSCache(1024*1024, 10, 3600, 30)
+		cache.set('host.test', '192.0.2.1')
+
+		cache.get('host.test', count=False)
+		cache.get('other.test', count=False)
+		self.assertEqual((cache.hit, cache.miss), (0, 0))
+
+		cache.get('host.test')
+		cache.get('other.test')
+		self.assertEqual((cache.hit, cache.miss), (1, 1))
+
+	def test_eviction (self):
+		size = ENTRY_OVERHEAD + len('a.test') + len('192.0.2.1')
+		cache = DNSCache(3 * size, 10, 3600, 30)
+
+		cache.set('a.test', '192.0.2.1')
+		cache.set('b.test', '192.0.2.2')
+		cache.set('c.test', '192.0.2.3')
+		self.assertEqual(cache.used, 3 * size)
+
+		# a is now the most recently used, b is dropped first
+		cache.get('a.test')
+		cache.set('d.test', '192.0.2.4')
+
+		self.assertEqual(cache.evicted, 1)
+		self.assertEqual(cache.get('b.test'), None)
+		self.assertEqual(cache.get('a.test'), '192.0.2.1')
+
+		# replacing an entry does not evict anything
+		cache.set('c.test', '192.0.2.5')
+		self.assertEqual(cache.evicted, 1)
+		self.assertEqual(len(cache), 3)
+		self.assertEqual(cache.used, 3 * size)
+
+	def test_expire (self):
+		cache = DNSCache(1024*1024, 10, 3600, 30)
+		cache.set('a.test', '192.0.2.1', 20)
+		cache.set('b.test', '192.0.2.2', 60)
+		cache.set('a.test', '192.0.2.1', 120)
+
+		# a was given a new TTL, its first expiration is ignored
+		self.clock.now = 1061.0
+		cache.expire()
+		self.assertEqual(len(cache), 1)
+		self.assertEqual(cache.expired, 1)
+		self.assertEqual(cache.get('a.test'), '192.0.2.1')
+
+		self.clock.now = 1121.0
+		cache.expire()
+		self.assertEqual(len(cache), 0)
+		self.assertEqual(cache.used, 0)
+
+
+class TestVerdictCache (unittest.TestCase):
+	def setUp (self):
+		self.time = verdicts.time
+		self.clock = Clock(1000.0)
+		verdicts.time = self.clock
+
+	def tearDown (self):
+		verdicts.time = self.time
+
+	def test_key (self):
+		get = Message('GET', 'www.test', 'http://www.test/page')
+		connect = Message('CONNECT', 'www.test', 'www.test:443')
+
+		self.assertEqual(verdicts.VerdictCache('url', 10, 60).key(get, '192.0.2.1'), (False, 'http://www.test/page'))
+		self.assertEqual(verdicts.VerdictCache('host', 10, 60).key(connect, '192.0.2.1'), (True, 'www.test'))
+		self.assertEqual(verdicts.VerdictCache('client', 10, 60).key(get, '192.0.2.1'), (False, 'www.test', '192.0.2.1'))
+
+	def test_ttl (self):
+		cache = verdicts.VerdictCache('host', 10, 60)
+
+		cache.set('default', 'allow')
+		cache.set('given', 'deny', 5)
+		cache.set('never', 'allow', 0)
+
+		self.assertEqual(cache.get('never'), None)
+		self.assertEqual(len(cache), 2)
+
+		self.clock.now = 1006.0
+		self.assertEqual(cache.get('given'), None)
+		self.assertEqual(cache.get('default'), 'allow')
+
+		self.clock.now = 1061.0
+		self.assertEqual(cache.get('default'), None)
+
+		self.assertEqual((cache.hit, cache.miss), (1, 3))
+
+	def test_size (self):
+		cache = verdicts.VerdictCache('url', 2, 60)
+
+		cache.set('a', 1)
+		cache.set('b', 2)
+		cache.get('a')
+		cache.set('c', 3)
+
+		# b was the least recently used
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.get('c'), 3)
+		self.assertEqual(len(cache), 2)
+
+
+if __name__ == '__main__':
+	unittest.main()
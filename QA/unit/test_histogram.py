@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_histogram.py
+
+Unit tests of Histogram and TimerWheel
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
+
+from exaproxy.util import wheel
+from exaproxy.util.histogram import Histogram, bucket, highest
+from exaproxy.util.wheel import TimerWheel
+
+
+class Clock (object):
+	"""replaces the time module"""
+
+	def __init__ (self, now):
+		self.now = now
+
+	def time (self):
+		return self.now
+
+
+class TestHistogram (unittest.TestCase):
+	def test_bucket (self):
+		previous = 0
+
+		for value in range(0, 100000, 7) + [2**40 + 12345]:
+			index = bucket(value)
+
+			# the buckets are sorted and a value is known within 12.5%
+			self.assertTrue(index >= previous)
+			self.assertTrue(value <= highest(index) <= value * 1.125 + 1)
+			previous = index
+
+		# the small values are exact
+		for value in range(16):
+			self.assertEqual(highest(bucket(value)), value)
+
+	def test_percentile (self):
+		histogram = Histogram()
+		self.assertEqual(histogram.percentile(50), 0)
+
+		for value in range(1, 1001):
+			histogram.record(value / 1000000.0)
+
+		self.assertEqual(histogram.count, 1000)
+		self.assertEqual(histogram.maximum, 1000)
+
+		for percent in (50, 90, 99):
+			self.assertTrue(percent * 10 <= histogram.percentile(percent) <= percent * 10 * 1.125)
+
+		# never more than the longest duration recorded
+		self.assertEqual(histogram.percentile(100), 1000)
+
+		summary = histogram.summary()
+		self.assertEqual(summary['count'], 1000)
+		self.assertEqual(summary['mean'], 500)
+		self.assertEqual(summary['max'], 1000)
+
+	def test_merge (self):
+		first, second, both = Histogram(), Histogram(), Histogram()
+
+		for value in (0.000010, 0.002, 0.5):
+			first.record(value)
+			both.record(value)
+
+		for value in (0.000300, 0.002, 3.0):
+			second.record(value)
+			both.record(value)
+
+		first.merge(second.dump())
+		self.assertEqual(first.dump(), both.dump())
+
+	def test_below (self):
+		histogram = Histogram()
+
+		for value in (5, 10, 100, 1000, 10000):
+			histogram.record(value / 1000000.0)
+
+		# a bucket is only counted once all its values are within the limit
+		self.assertEqual(histogram.below([1, 10, 1000, 1023, 1000000]), [0, 2, 3, 4, 5])
+
+
+class TestTimerWheel (unittest.TestCase):
+	def setUp (self):
+		self.time = wheel.time
+		self.clock = Clock(1000.5)
+		wheel.time = self.clock
+
+	def tearDown (self):
+		wheel.time = self.time
+
+	def expired (self, timers, when):
+		self.clock.now = when
+		return sorted(timers.expired())
+
+	def test_deadline (self):
+		timers = TimerWheel(1)
+		timers.add('a', 5)
+		timers.add('b', 10)
+
+		self.assertEqual(len(timers), 2)
+		self.assertTrue('a' in timers)
+		self.assertEqual(timers.near, 2)
+
+		# never early, at most a tick late
+		self.assertEqual(self.expired(timers, 1005.9), [])
+		self.assertEqual(self.expired(timers, 1006.0), ['a'])
+		self.assertEqual(self.expired(timers, 1006.5), [])
+		self.assertEqual(self.expired(timers, 1020), ['b'])
+
+		self.assertEqual(len(timers), 0)
+		self.assertFalse('a' in timers)
+
+	def test_move (self):
+		timers = TimerWheel(1)
+		timers.add('a', 5)
+		timers.add('b', 5)
+		timers.remove('b')
+		timers.remove('unknown')
+
+		# pushed back, as when data is received
+		self.clock.now = 1004.5
+		timers.add('a', 5)
+
+		self.assertEqual(self.expired(timers, 1006.5), [])
+		self.assertEqual(self.expired(timers, 1010), ['a'])
+
+	def test_levels (self):
+		timers = TimerWheel(1)
+		delays = (30, 100, 5000, 300000, 20000000)
+
+		for delay in delays:
+			timers.add(delay, delay)
+
+		# the deadlines are moved down the wheels as time passes
+		self.assertEqual(timers.near, 1)
+
+		# the last one is further than the coarsest wheel can count
+		for delay in delays:
+			self.assertEqual(self.expired(timers, 1000.5 + delay - 1), [])
+			self.assertEqual(self.expired(timers, 1000.5 + delay + 1), [delay])
+
+		self.assertEqual(len(timers), 0)
+
+	def test_late (self):
+		# not called for a long time, all the deadlines which passed are returned at once
+		timers = TimerWheel(0.1)
+
+		for number in range(200):
+			timers.add(number, number * 7)
+
+		self.assertEqual(self.expired(timers, 1000.5 + 200 * 7), range(200))
+
+
+if __name__ == '__main__':
+	unittest.main()
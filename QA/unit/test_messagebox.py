@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_messagebox.py
+
+Unit tests of the FrameBox framing
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import fcntl
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
+
+from exaproxy.util.messagebox import FrameBox, frame
+
+
+class TestFrameBox (unittest.TestCase):
+	def setUp (self):
+		reader, writer = os.pipe()
+		self.writer = writer
+		self.sender = FrameBox(None, writer)
+		self.receiver = FrameBox(reader, None)
+
+	def tearDown (self):
+		self.sender.close()
+		self.receiver.close()
+
+	def test_types (self):
+		messages = [
+			('1', '127.0.0.1', 3128, '192.0.2.1', 'GET / HTTP/1.1\r\n\r\n', None, 'proxy'),
+			('2', 'download', ('192.0.2.1', 80, '', '0', 'GET / HTTP/1.1\r\n\r\n')),
+			(True, False, 2**70, -1, u'caf\xe9', ['a', ('b', [])]),
+			{'not': 'framed'},
+			'',
+			1.5,
+		]
+
+		for message in messages:
+			self.sender.put(message)
+
+		self.sender.flush()
+
+		# lists are given back as tuples, what we do not frame is pickled
+		expected = list(messages)
+		expected[2] = (True, False, 2**70, -1, u'caf\xe9', ('a', ('b', ())))
+		self.assertEqual(self.receiver.read(), expected)
+
+	def test_partial (self):
+		data = frame(('1', 'a' * 1000)) + frame(('2', 'b'))
+
+		# the end of a message not yet received is kept for the next read
+		os.write(self.writer, data[:500])
+		self.assertEqual(self.receiver.read(), [])
+
+		os.write(self.writer, data[500:-3])
+		self.assertEqual(self.receiver.read(), [('1', 'a' * 1000)])
+
+		os.write(self.writer, data[-3:])
+		self.assertEqual(self.receiver.read(), [('2', 'b')])
+
+	def test_closed (self):
+		self.sender.put('last')
+		self.sender.flush()
+		self.sender.close()
+
+		# the messages received before the pipe was closed are still given
+		self.assertEqual(self.receiver.read(), ['last'])
+		self.assertEqual(self.receiver.read(), None)
+
+	def test_invalid (self):
+		# a field type we do not know, we can not find the next message
+		os.write(self.writer, '\x00\x00\x00\x05X\x00\x00\x00\x00')
+		self.assertEqual(self.receiver.read(), None)
+
+	def test_send (self):
+		flags = fcntl.fcntl(self.writer, fcntl.F_GETFL)
+		fcntl.fcntl(self.writer, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+		# more than the pipe can take, what is left is kept until it can be written
+		messages = [(str(number), 'x' * 1000) for number in range(200)]
+		for message in messages:
+			self.sender.put(message)
+
+		self.assertFalse(self.sender.send())
+
+		received = []
+		while not self.sender.send():
+			received.extend(self.receiver.read())
+
+		while len(received) < len(messages):
+			received.extend(self.receiver.read())
+
+		self.assertEqual(received, messages)
+
+
+if __name__ == '__main__':
+	unittest.main()
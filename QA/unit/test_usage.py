@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_usage.py
+
+Unit tests of the binary usage records
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'lib'))
+
+from exaproxy.util.log.usage import FIELDS, pack, unpack, records
+
+
+RECORDS = [
+	(
+		1400000000.25, '12', 'proxy', '127.0.0.1', 3128, '192.0.2.1', 'GET', 'http://www.test/', 'download', '192.0.2.80',
+		0.5, 0.001, 0.002, 0.003, 0.010, 0.250,
+		200, 12345,
+	),
+	# a request which never reached a web server
+	(
+		1400000001.0, '13', 'tls', '::1', 443, '2001:db8::1', 'CONNECT', 'www.test:443', 'rewrite', '',
+		0.0, 0.001, None, None, None, None,
+		None, None,
+	),
+	# an empty body is not a missing one
+	(
+		1400000002.5, '14', 'proxy', '127.0.0.1', 3128, '192.0.2.1', 'HEAD', 'http://www.test/' + 'x' * 5000, 'download', '192.0.2.80',
+		0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+		304, 0,
+	),
+]
+
+
+class TestUsage (unittest.TestCase):
+	def test_round_trip (self):
+		for record in RECORDS:
+			self.assertEqual(len(record), len(FIELDS))
+
+			data = pack(record)
+			self.assertEqual(unpack(data), (record, len(data)))
+
+	def test_records (self):
+		data = ''.join(pack(record) for record in RECORDS)
+		self.assertEqual(list(records(data)), RECORDS)
+
+		# a record still being written is not returned
+		self.assertEqual(list(records(data[:-10])), RECORDS[:-1])
+		self.assertEqual(list(records(data + pack(RECORDS[0])[:20])), RECORDS)
+
+	def test_offset (self):
+		first = pack(RECORDS[0])
+		data = first + pack(RECORDS[1])
+
+		self.assertEqual(unpack(data, len(first)), (RECORDS[1], len(data)))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -132,17 +132,25 @@ def main ():
 			'listen'  : (value.boolean,string.lower,'false', 'should we listen for connections over IPv6'),
 			'out'     : (value.boolean,string.lower,'true',  'allow connections to remote web servers over IPv6'),
 			'bind'    : (value.unquote,string.quote,'::',    'which ipv6 to use when creating outbound connection'),
+			'fallback': (value.unsigned,string.nop,'250',    'ms before also trying IPv4 if IPv6 did not connect (0 to not race IPv6 and IPv4)'),
 		},
 		'redirector' : {
 			'enable'  : (value.boolean,string.lower,'false',                         'use redirector programs to filter http request'),
 			'program' : (value.exe,string.path,'etc/exaproxy/redirector/url-allow',  'the program used to know where to send request'),
 			'minimum' : (value.integer,string.nop,'5',                               'minimum number of worker threads (forked program)'),
 			'maximum' : (value.integer,string.nop,'25',                              'maximum number of worker threads (forked program)'),
+			'concurrency' : (value.integer,string.nop,'1',                           'requests given at once to each url program (above 1: with a squid channel-ID)'),
+			'cache'       : (value.verdict,string.lower,'none',                      'remember the decisions of the url program for the same: none, url, host or peer (host and client)'),
+			'cache-ttl'   : (value.integer,string.nop,'60',                          'time (in seconds) a decision is remembered, unless the program answers with ttl=<seconds>'),
+			'cache-size'  : (value.integer,string.nop,'10000',                       'the maximum number of decisions remembered, the least recently used are forgotten first'),
 			'protocol': (value.redirector,string.quote,'url',                        'what protocol to use (url -> squid like / icap:://<uri> -> icap like)')
 		},
 		'http' : {
 			'enable'          : (value.boolean,string.lower,'true',  'enable the http server'),
 			'idle-connect'    : (value.integer,string.nop,'300',     'time before we abandon new inactive http client connections (0: unlimited)'),
+			'idle-transfer'   : (value.unsigned,string.nop,'0',      'time before we abandon connections on which no data was sent or received (0: unlimited)'),
+			'connect-timeout' : (value.unsigned,string.nop,'30',     'time to connect to a web server before the client is sent noconnect.html (0: unlimited)'),
+			'response-timeout': (value.unsigned,string.nop,'0',      'time for a web server to start answering a request before we give up (0: unlimited)'),
 			'connections'     : (value.integer,string.nop,'32768',   'the maximum number of proxy connections'),
 			'transparent'     : (value.boolean,string.lower,'false', 'do not reveal the presence of the proxy'),
 			'forward'         : (value.lowunquote,string.quote,'',   'read client address from this header (normally x-forwarded-for)'),
@@ -153,6 +161,12 @@ def main ():
 			'proxied'         : (value.boolean,string.lower,'false', 'request is encapsulated with haproxy proxy protocol'),
 			'header-size'     : (value.integer,string.nop,'65536',   'maximum size in bytes for HTTP headers (0 : unlimited)'),
 		},
+		'pool' : {
+			'enable'          : (value.boolean,string.lower,'true',  'keep idle connections to web servers open to serve other clients'),
+			'idle'            : (value.integer,string.nop,'1024',    'the maximum number of idle connections to web servers'),
+			'per-host'        : (value.integer,string.nop,'8',       'the maximum number of idle connections to the same web server'),
+			'timeout'         : (value.integer,string.nop,'15',      'time before we close an idle connection to a web server'),
+		},
 		'passthrough' : {
 			'enable'          : (value.boolean,string.lower,'false',             'enable the passthrough server'),
 			'host'            : (value.unquote,string.quote,'127.0.0.1',        'the address the passthrough server listens on'),
@@ -195,9 +209,11 @@ def main ():
 			'pidfile'     : (value.unquote,string.quote,'',      'where to save the pid if we manage it'),
 			'user'        : (value.user,string.quote,'nobody',   'user to run as'),
 			'daemonize'   : (value.boolean,string.lower,'false', 'should we run in the background'),
-			'reactor'     : (value.unquote,string.quote,'best', 'event polling mechanism to use (select/epoll/kqueue/best)'),
+			'reactor'     : (value.unquote,string.quote,'best', 'event polling mechanism to use (select/epoll/edge/kqueue/best)'),
 			'speed'       : (value.integer,string.nop,'2',       'sleep duration when waiting for connection'),
 			'poll-interfaces' : (value.boolean,string.lower,'true',  'periodically poll for local addresses the proxy should not connect to'),
+			'splice'      : (value.boolean,string.lower,'true',  'relay CONNECT and passthrough tunnels in the kernel with splice (linux only)'),
+			'reactors'    : (value.integer,string.nop,'1',       'number of processes accepting connections on the same ports (SO_REUSEPORT)'),
 		},
 		'security' : {
 			'local'       : (value.services,string.services,   '',              'ip:port for allowed services (*:80 or 127.0.0.1:*) allowed'),
@@ -208,7 +224,10 @@ def main ():
 			'resolver'     : (value.resolver,string.path,'/etc/resolv.conf',       'resolver file'),
 			'timeout'      : (value.integer,string.nop,'2',                        'how long to wait for DNS replies before retrying'),
 			'retries'      : (value.integer,string.nop,'10',                       'how many times to retry sending requests'),
-			'ttl'          : (value.integer,string.nop,'900',                      'amount of time (in seconds) we will cache dns results for'),
+			'ttl'          : (value.integer,string.nop,'900',                      'longest time (in seconds) we will cache dns results for, even if their TTL is higher'),
+			'minimum'      : (value.integer,string.nop,'30',                       'shortest time (in seconds) we will cache dns results for, even if their TTL is lower'),
+			'negative'     : (value.integer,string.nop,'10',                       'time (in seconds) we will remember that a hostname could not be resolved'),
+			'cache'        : (value.integer,string.nop,'20971520',                 'memory (in bytes) used to cache dns results, the least recently used are forgotten first'),
 			'fqdn'         : (value.boolean,string.lower,'true',                   'only resolve FQDN (hostnames must have a dot'),
 			'definitions'  : (value.folder,string.path,'etc/exaproxy/dns/types',   'location of file defining dns query types'),
 		},
@@ -233,6 +252,13 @@ def main ():
 		'usage' : {
 			'enable'        : (value.boolean,string.lower,'false',              'enable traffic logging'),
 			'destination'   : (value.unquote,string.quote,'stdout',              'where syslog should log'),
+			'queue'         : (value.integer,string.nop,'65536',                 'how many records can wait to be written by the usage thread'),
+			'overflow'      : (value.overflow,string.quote,'drop',               'when the queue is full: drop the records or block until they are written'),
+			'format'        : (value.usage,string.quote,'text',                  'text lines, or one record per request with its timings: json lines or binary records'),
+			'sample'        : (value.unsigned,string.nop,'1',                    'with a structured format, write the record of one request in this many (0 for none)'),
+			'rotate-size'   : (value.unsigned,string.nop,'5242880',              'rotate the usage file when it reaches this size in bytes (0 to never)'),
+			'rotate-time'   : (value.unsigned,string.nop,'0',                    'rotate the usage file every this many seconds (0 to never)'),
+			'rotate-keep'   : (value.unsigned,string.nop,'5',                    'how many rotated usage files to keep (0 to keep them all)'),
 		},
 		'profile' : {
 			'enable'      : (value.boolean,string.lower,'false', 'enable profiling'),
@@ -87,6 +87,13 @@ class value (object):
 			raise TypeError('the value must be positive')
 		return value
 
+	@staticmethod
+	def unsigned (_):
+		value = int(_)
+		if value < 0:
+			raise TypeError('the value can not be negative')
+		return value
+
 	@staticmethod
 	def lowunquote (_):
 		return _.strip().strip('\'"').lower()
@@ -195,6 +202,24 @@ class value (object):
 			return name
 		raise TypeError('invalid redirector protocol %s, options are url or header' % name)
 
+	@staticmethod
+	def verdict (name):
+		if name in ('none', 'url', 'host', 'peer'):
+			return name
+		raise TypeError('invalid redirector cache %s, options are none, url, host or peer' % name)
+
+	@staticmethod
+	def overflow (name):
+		if name in ('drop', 'block'):
+			return name
+		raise TypeError('invalid overflow policy %s, options are drop or block' % name)
+
+	@staticmethod
+	def usage (name):
+		if name in ('text', 'json', 'binary'):
+			return name
+		raise TypeError('invalid usage format %s, options are text, json or binary' % name)
+
 
 
 
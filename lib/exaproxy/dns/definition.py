@@ -172,6 +172,11 @@ class DNSResponseType(DNSBaseType):
 
 		return related
 
+	def getTTL(self):
+		# the answer is valid as long as the shortest lived record it was built from
+		ttls = [response.ttl for response in self.responses if response.ttl is not None]
+		return min(ttls) if ttls else None
+
 	def isComplete(self):
 		return self.complete
 
@@ -0,0 +1,186 @@
+# encoding: utf-8
+"""
+metrics.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+# the statistics we export, in the OpenMetrics text format (which prometheus can scrape)
+# name, type, help, ((labels, statistic), ...)
+
+_families = (
+	('exaproxy_client_requests', 'counter', 'Requests received from clients', (
+		('', 'clients.requests'),
+	)),
+	('exaproxy_client_sent_bytes', 'counter', 'Bytes sent to the clients', (
+		('family="ipv4"', 'transfer.client4'),
+		('family="ipv6"', 'transfer.client6'),
+	)),
+	('exaproxy_server_sent_bytes', 'counter', 'Bytes sent to the web servers', (
+		('family="ipv4"', 'transfer.content4'),
+		('family="ipv6"', 'transfer.content6'),
+	)),
+	('exaproxy_clients', 'gauge', 'Client connections by state', (
+		('state="silent"', 'clients.silent'),
+		('state="speaking"', 'clients.speaking'),
+	)),
+	('exaproxy_listener_clients', 'gauge', 'Client connections accepted by each server', (
+		('server="proxy"', 'clients.proxy'),
+		('server="icap"', 'clients.icap'),
+		('server="tls"', 'clients.tls'),
+		('server="passthrough"', 'clients.passthrough'),
+		('server="web"', 'clients.web'),
+	)),
+	('exaproxy_servers', 'gauge', 'Web server connections by state', (
+		('state="opening"', 'servers.opening'),
+		('state="established"', 'servers.established'),
+		('state="spliced"', 'servers.spliced'),
+		('state="idle"', 'pool.idle'),
+	)),
+	('exaproxy_pool_requests', 'counter', 'Requests which could use an idle web server connection', (
+		('result="hit"', 'pool.hit'),
+		('result="miss"', 'pool.miss'),
+		('result="retried"', 'pool.retried'),
+	)),
+	('exaproxy_server_connections', 'counter', 'Connections to the web servers by family and result', (
+		('family="ipv4",result="success"', 'connect.ipv4.success'),
+		('family="ipv4",result="failure"', 'connect.ipv4.failure'),
+		('family="ipv6",result="success"', 'connect.ipv6.success'),
+		('family="ipv6",result="failure"', 'connect.ipv6.failure'),
+	)),
+	('exaproxy_server_fallbacks', 'counter', 'Connections established to another address than the preferred one', (
+		('', 'connect.fallback'),
+	)),
+	('exaproxy_server_responses', 'counter', 'Responses received from the web servers by class of status', (
+		('class="1xx"', 'response.1xx'),
+		('class="2xx"', 'response.2xx'),
+		('class="3xx"', 'response.3xx'),
+		('class="4xx"', 'response.4xx'),
+		('class="5xx"', 'response.5xx'),
+	)),
+	('exaproxy_server_received_bytes', 'counter', 'Bytes of the bodies of the responses of the web servers', (
+		('', 'transfer.received'),
+	)),
+	('exaproxy_deadlines_passed', 'counter', 'Downloads and clients abandoned as they waited for too long', (
+		('deadline="connect"', 'deadline.connect'),
+		('deadline="response"', 'deadline.response'),
+		('deadline="idle"', 'deadline.idle'),
+	)),
+	('exaproxy_pool_connections', 'counter', 'Web server connections kept or closed by the pool', (
+		('event="released"', 'pool.released'),
+		('event="expired"', 'pool.expired'),
+	)),
+	('exaproxy_resolver_cache_entries', 'gauge', 'Hostnames in the DNS cache', (
+		('', 'resolver.cached'),
+	)),
+	('exaproxy_resolver_cache_bytes', 'gauge', 'Memory used by the DNS cache (estimated)', (
+		('', 'resolver.memory'),
+	)),
+	('exaproxy_resolver_cache_lookups', 'counter', 'Hostnames looked up in the DNS cache', (
+		('result="hit"', 'resolver.hit'),
+		('result="negative"', 'resolver.negative'),
+		('result="miss"', 'resolver.miss'),
+	)),
+	('exaproxy_resolver_cache_removed', 'counter', 'Hostnames removed from the DNS cache', (
+		('reason="expired"', 'resolver.expired'),
+		('reason="evicted"', 'resolver.evicted'),
+	)),
+	('exaproxy_resolver_queries', 'gauge', 'DNS queries waiting for an answer', (
+		('', 'resolver.resolving'),
+	)),
+	('exaproxy_resolver_coalesced', 'counter', 'Lookups answered with the query already sent for the same hostname', (
+		('', 'resolver.coalesced'),
+	)),
+	('exaproxy_redirector_queue', 'gauge', 'Requests waiting for a redirector process', (
+		('', 'queue.size'),
+	)),
+	('exaproxy_redirector_cache_entries', 'gauge', 'Decisions of the url programs remembered', (
+		('', 'redirector.cached'),
+	)),
+	('exaproxy_redirector_cache_lookups', 'counter', 'Requests looked up in the decisions remembered', (
+		('result="hit"', 'redirector.hit'),
+		('result="miss"', 'redirector.miss'),
+	)),
+	('exaproxy_usage_lines', 'counter', 'Usage log lines written or dropped as the queue was full', (
+		('result="written"', 'usage.written'),
+		('result="dropped"', 'usage.dropped'),
+	)),
+	('exaproxy_redirector_processes', 'gauge', 'Redirector processes', (
+		('state="forked"', 'processes.forked'),
+		('state="minimum"', 'processes.min'),
+		('state="maximum"', 'processes.max'),
+	)),
+	('exaproxy_reactor_processes', 'gauge', 'Reactor processes', (
+		('', 'processes.reactors'),
+	)),
+	('exaproxy_reactor_loops', 'counter', 'Reactor loop iterations', (
+		('', 'load.loops'),
+	)),
+	('exaproxy_reactor_events', 'counter', 'Sockets reported ready by the poller', (
+		('', 'load.events'),
+	)),
+	('exaproxy_poller_syscalls', 'counter', 'System calls made by the poller', (
+		('', 'load.syscalls'),
+	)),
+)
+
+# the longest loop is recorded in microseconds
+_lag = '# TYPE exaproxy_reactor_lag_seconds gauge\n# HELP exaproxy_reactor_lag_seconds Longest reactor loop since the last second\nexaproxy_reactor_lag_seconds %s'
+
+# the histograms of Monitor.merged: family, kind, label of the samples, description
+_histograms = (
+	('exaproxy_reactor_handler_seconds', 'handler', 'handler', 'Time spent in each reactor handler'),
+	('exaproxy_request_stage_seconds', 'stage', 'stage', 'Time taken by the requests to reach each stage, from when they were read'),
+	('exaproxy_server_connect_seconds', 'connect', 'family', 'Time taken to connect to the web servers'),
+)
+
+# powers of two microseconds, from 16us to 16s, match the buckets of the histograms
+_limits = [(1 << bits) - 1 for bits in range(4, 25, 2)]
+_le = [str((limit + 1) / 1000000.0) for limit in _limits] + ['+Inf']
+
+
+def _sample (name, labels):
+	return '%s{%s} ' % (name, labels) if labels else '%s ' % name
+
+
+class Metrics (object):
+	"""The statistics of the reactor processes, rendered for scraping
+
+	The text around the values is prepared once, rendering only reads
+	the live counters (as returned by Monitor.statistics)"""
+
+	def __init__ (self, monitor):
+		self.monitor = monitor
+		self.families = []
+
+		for name, kind, description, samples in _families:
+			header = '# TYPE %s %s\n# HELP %s %s' % (name, kind, name, description)
+			sample = '%s_total' % name if kind == 'counter' else name
+			self.families.append((header, [(_sample(sample, labels), key) for (labels, key) in samples]))
+
+	def render (self):
+		stats = self.monitor.statistics()
+		lines = []
+
+		for header, samples in self.families:
+			lines.append(header)
+
+			for prefix, key in samples:
+				lines.append(prefix + str(stats.get(key, 0)))
+
+		lines.append(_lag % (stats.get('load.lag', 0) / 1000000.0))
+
+		for family, kind, label, description in _histograms:
+			lines.append('# TYPE %s histogram\n# HELP %s %s' % (family, family, description))
+
+			for name, histogram in sorted(self.monitor.merged(kind).items()):
+				counts = histogram.below(_limits) + [histogram.count]
+
+				for le, count in zip(_le, counts):
+					lines.append('%s_bucket{%s="%s",le="%s"} %d' % (family, label, name, le, count))
+
+				lines.append('%s_count{%s="%s"} %d' % (family, label, name, histogram.count))
+				lines.append('%s_sum{%s="%s"} %s' % (family, label, name, histogram.total / 1000000.0))
+
+		lines.append('# EOF\n')
+		return '\n'.join(lines)
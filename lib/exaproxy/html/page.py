@@ -20,6 +20,7 @@ from .mail import mail
 from .index import index
 from .licence import licence
 from .humans import humans
+from .metrics import Metrics
 
 from exaproxy.util.log.history import History,Errors
 from exaproxy.util.log.logger import Logger
@@ -29,17 +30,22 @@ options = (
 		('Introspection', '/information/introspection/supervisor.html', False),
 		('Configuration', '/information/configuration.html', False),
 		('Statistics', '/information/statistics.html', False),
+		('Latency', '/information/latency.html', False),
+		('Timing', '/information/timing.html', False),
 	)),
 	('Graphs', '/graph.html', (
 		('Requests', '/graph/requests.html', False),
 		('Loops', '/graph/loops.html', False),
 		('Events', '/graph/events.html', False),
+		('Syscalls', '/graph/syscalls.html', False),
+		('Lag', '/graph/lag.html', False),
 		('Processes', '/graph/processes.html', False),
 		('Queue', '/graph/queue.html', False),
 		('Connections', '/graph/connections.html', False),
 		('Transfered', '/graph/transfered.html', False),
 		('Clients', '/graph/clients.html', False),
 		('Servers', '/graph/servers.html', False),
+		('Pool', '/graph/pool.html', False),
 	)),
 	('End Points', '/end-point.html', (
 		('Clients', '/end-point/clients.html', False),
@@ -52,6 +58,11 @@ options = (
 	('JSON', '/index.html', (
 		('running', '/json/running', True),
 		('configuration', '/json/configuration', True),
+		('latency', '/json/latency', True),
+		('timing', '/json/timing', True),
+	)),
+	('Metrics', '/index.html', (
+		('OpenMetrics', '/metrics', True),
 	)),
 	('Logs','/index.html', (
 		('Logs', '/information/logs.html', True),
@@ -103,6 +114,7 @@ class Page (object):
 	def __init__(self,supervisor):
 		self.supervisor = supervisor
 		self.monitor = supervisor.monitor
+		self.metrics = Metrics(supervisor.monitor)
 		self.email_sent = False
 		self.log = Logger('web', supervisor.configuration.log.web)
 
@@ -129,6 +141,20 @@ class Page (object):
 			line.append('<span class="key">%s</span><span class="value">&nbsp; %s</span><br/>' % (k,cgi.escape(str(str(v)))))
 		return introduction + _listing % ('\n'.join(line))
 
+	def _summaries (self, title, summaries):
+		introduction = '<div style="padding: 10px 10px 10px 10px; font-weight:bold;">%s (microseconds)</div><br/>\n' % title
+		line = []
+		for name,summary in sorted(summaries.items()):
+			values = ' '.join('%s %s' % (k,summary[k]) for k in ('count','mean','p50','p90','p99','p99.9','max'))
+			line.append('<span class="key">%s</span><span class="value">&nbsp; %s</span><br/>' % (cgi.escape(name),values))
+		return introduction + _listing % ('\n'.join(line))
+
+	def _latency (self):
+		return self._summaries('Time spent by the reactor', self.monitor.latency())
+
+	def _timing (self):
+		return self._summaries('Time taken by the requests to reach each stage, from when they were read, and to connect to the servers', self.monitor.timing())
+
 	def _connections (self):
 		return graph(
 			self.monitor,
@@ -139,6 +165,8 @@ class Page (object):
 				'clients.speaking',
 				'servers.opening',
 				'servers.established',
+				'servers.spliced',
+				'pool.idle',
 				]
 		)
 
@@ -151,6 +179,7 @@ class Page (object):
 				'processes.forked',
 				'processes.min',
 				'processes.max',
+				'processes.reactors',
 			]
 		)
 
@@ -191,6 +220,19 @@ class Page (object):
 			adaptor=Bpstobps,
 		)
 
+	def _pool (self):
+		return graph(
+			self.monitor,
+			'Requests/seconds sent on idle server connections',
+			20000,
+			[
+				'pool.hit',
+				'pool.miss',
+				'pool.retried',
+			],
+			True,
+		)
+
 	def _transfer (self):
 		return graph(
 			self.monitor,
@@ -226,6 +268,28 @@ class Page (object):
 			True,
 		)
 
+	def _syscalls (self):
+		return graph(
+			self.monitor,
+			'System calls made by the poller',
+			20000,
+			[
+				'load.loops',
+				'load.syscalls',
+			],
+			True,
+		)
+
+	def _lag (self):
+		return graph(
+			self.monitor,
+			'Longest reactor loop (microseconds)',
+			20000,
+			[
+				'load.lag',
+			]
+		)
+
 	def _queue (self):
 		return graph(
 			self.monitor,
@@ -307,6 +371,12 @@ class Page (object):
 	def _json_running (self):
 		return json.dumps(self.monitor.seconds[-1],sort_keys=True,indent=2,separators=(',', ': '))
 
+	def _json_latency (self):
+		return json.dumps(self.monitor.latency(),sort_keys=True,indent=2,separators=(',', ': '))
+
+	def _json_timing (self):
+		return json.dumps(self.monitor.timing(),sort_keys=True,indent=2,separators=(',', ': '))
+
 	def _json_configuration (self):
 		return json.dumps(self.monitor.configuration(),sort_keys=True,indent=2,separators=(',', ': '))
 
@@ -327,7 +397,9 @@ class Page (object):
 		elif not path.endswith('.html'):
 			if path == '/humans.txt':
 				return humans.txt
-			if path not in ('/json','/json/running','/json/configuration','/control/workers/commit','/control/debug/eval','/control/debug/exec'):
+			if path == '/metrics':
+				return self.metrics.render()
+			if path not in ('/json','/json/running','/json/configuration','/json/latency','/json/timing','/control/workers/commit','/control/debug/eval','/control/debug/exec'):
 				return menu('<center><b>invalid url</b></center>')
 			sections = path[1:].split('/') + ['']
 		else:
@@ -343,7 +415,11 @@ class Page (object):
 				return self._json_running()
 			if subsection == 'configuration':
 				return self._json_configuration()
-			return '{ "errror" : "invalid url", "valid-paths": [ "/json/running", "/json/configuration" ] }'
+			if subsection == 'latency':
+				return self._json_latency()
+			if subsection == 'timing':
+				return self._json_timing()
+			return '{ "errror" : "invalid url", "valid-paths": [ "/json/running", "/json/configuration", "/json/latency", "/json/timing" ] }'
 
 		if section == 'index':
 			return menu(index)
@@ -355,6 +431,10 @@ class Page (object):
 				return menu(self._configuration())
 			if subsection == 'statistics':
 				return menu(self._statistics())
+			if subsection == 'latency':
+				return menu(self._latency())
+			if subsection == 'timing':
+				return menu(self._timing())
 			if subsection == 'logs':
 				return self._logs()
 			if subsection == 'errs':
@@ -368,6 +448,8 @@ class Page (object):
 				return menu(self._connections())
 			if subsection == 'servers':
 				return menu(self._servers())
+			if subsection == 'pool':
+				return menu(self._pool())
 			if subsection == 'clients':
 				return menu(self._clients())
 			if subsection == 'transfered':
@@ -378,6 +460,10 @@ class Page (object):
 				return menu(self._loops())
 			if subsection == 'events':
 				return menu(self._events())
+			if subsection == 'syscalls':
+				return menu(self._syscalls())
+			if subsection == 'lag':
+				return menu(self._lag())
 			if subsection == 'queue':
 				return menu(self._queue())
 			return menu(index)
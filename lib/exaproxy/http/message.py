@@ -36,7 +36,7 @@ class HTTP (object):
 		self.validated = False
 
 	def parse (self,transparent):
-		self.log.debug('parsing header [[%s]]' % str(self.raw).replace('\t','\\t').replace('\r','\\r').replace('\n','\\n\n'))
+		self.log.debug(lambda: 'parsing header [[%s]]' % str(self.raw).replace('\t','\\t').replace('\r','\\r').replace('\n','\\n\n'))
 
 		try:
 			if '\r' in self.raw:
@@ -111,8 +111,8 @@ class HTTP (object):
 			self.reply_string = 'problem parsing the request'
 			return None
 		except InvalidRequest,e:
-			self.log.debug('invalid request received, %s' % str(e))
-			self.log.debug('[[%s]]' % self.raw.replace('\t','\\t').replace('\r','\\r').replace('\n','\\n\n'))
+			self.log.debug('invalid request received, %s', e)
+			self.log.debug(lambda: '[[%s]]' % self.raw.replace('\t','\\t').replace('\r','\\r').replace('\n','\\n\n'))
 			self.reply_code = 400
 			self.reply_string = str(e)
 			return None
@@ -73,22 +73,29 @@ def file_header (code, size, protocol='1.1'):
 		'Content-Type: text/html',
 		'Cache-Control: no-store',
 		'Pragma: no-cache',
+		'',
 		''
 	])
 
-def http (code,message, protocol='1.1'):
-	encoding = 'html' if message[:5].lower().startswith('<html') else 'plain'
-	date = time.strftime('%c %Z')
+def http_header (code, encoding, protocol='1.1'):
+	"""the header of http(), with the date (%s) and the length of the message (%d) left to fill"""
 	version = load().proxy.version
 
+	# the code comes from the redirector, a % would be taken for a field
 	return '\r\n'.join([
-		'HTTP/%s %s %s' % (protocol, str(code), _HTTP_NAMES.get(code,'-')),
-		'Date: %s' % date,
-		'Server: exaproxy/%s (%s)' % (str(version), str(sys.platform)),
-		'Content-Length: %d' % len(message),
+		('HTTP/%s %s %s' % (protocol, str(code), _HTTP_NAMES.get(code,'-'))).replace('%', '%%'),
+		'Date: %s',
+		('Server: exaproxy/%s (%s)' % (str(version), str(sys.platform))).replace('%', '%%'),
+		'Content-Length: %d',
 		'Content-Type: text/%s' % encoding,
 		'Cache-Control: no-store',
 		'Pragma: no-cache',
 		'',
-		message
+		''
 	])
+
+def http (code,message, protocol='1.1'):
+	encoding = 'html' if message[:5].lower().startswith('<html') else 'plain'
+	date = time.strftime('%c %Z')
+
+	return http_header(code, encoding, protocol) % (date, len(message)) + message
@@ -7,6 +7,13 @@ Copyright (c) 2011-2013 Exa Networks. All rights reserved.
 """
 
 from collections import deque
+from collections import defaultdict
+
+from .util.histogram import Histogram
+
+# statistics of the other reactor processes which are not added to ours
+_ignored = ('pid.saved',)
+_maximum = ('load.lag',)
 
 class _Container (object):
 	def __init__ (self,supervisor):
@@ -20,6 +27,7 @@ class Monitor (object):
 		self._container = _Container(supervisor)
 		self.seconds = deque()
 		self.minutes = deque()
+		self.redirector = {}    # the last statistics received from the redirector process
 
 	def zero (self, stats):
 		if stats:
@@ -63,8 +71,13 @@ class Monitor (object):
 			'exaproxy.dns.resolver': conf.dns.resolver,
 			'exaproxy.dns.timeout': conf.dns.timeout,
 			'exaproxy.dns.ttl': conf.dns.ttl,
+			'exaproxy.dns.minimum': conf.dns.minimum,
+			'exaproxy.dns.negative': conf.dns.negative,
+			'exaproxy.dns.cache': conf.dns.cache,
 			'exaproxy.daemon.user': conf.daemon.user,
 			'exaproxy.daemon.reactor': conf.daemon.reactor,
+			'exaproxy.daemon.splice': conf.daemon.splice,
+			'exaproxy.daemon.reactors': conf.daemon.reactors,
 			'exaproxy.log.level.daemon': conf.log.daemon,
 			'exaproxy.log.level.supervisor': conf.log.supervisor,
 			'exaproxy.log.level.signal': conf.log.signal,
@@ -90,21 +103,40 @@ class Monitor (object):
 			'exaproxy.tcp6.listen': conf.tcp6.listen,
 			'exaproxy.tcp6.out': conf.tcp6.out,
 			'exaproxy.tcp6.bind': conf.tcp6.bind,
+			'exaproxy.tcp6.fallback': conf.tcp6.fallback,
 			'exaproxy.http.connect': conf.http.connect,
 			'exaproxy.http.connections': conf.http.connections,
+			'exaproxy.http.connect-timeout': conf.http.connect_timeout,
+			'exaproxy.http.response-timeout': conf.http.response_timeout,
+			'exaproxy.http.idle-transfer': conf.http.idle_transfer,
 			'exaproxy.http.forward': conf.http.forward,
 			'exaproxy.http.transparent': conf.http.transparent,
 			'exaproxy.http.extensions': ' '.join(str (_) for _ in conf.http.extensions),
+			'exaproxy.pool.enable': conf.pool.enable,
+			'exaproxy.pool.idle': conf.pool.idle,
+			'exaproxy.pool.per-host': conf.pool.per_host,
+			'exaproxy.pool.timeout': conf.pool.timeout,
 			'exaproxy.proxy.version': conf.proxy.version,
 			'exaproxy.redirector.enable': conf.redirector.enable,
 			'exaproxy.redirector.protocol': conf.redirector.protocol,
 			'exaproxy.redirector.program': conf.redirector.program,
 			'exaproxy.redirector.minimum': conf.redirector.minimum,
 			'exaproxy.redirector.maximum': conf.redirector.maximum,
+			'exaproxy.redirector.concurrency': conf.redirector.concurrency,
+			'exaproxy.redirector.cache': conf.redirector.cache,
+			'exaproxy.redirector.cache-ttl': conf.redirector.cache_ttl,
+			'exaproxy.redirector.cache-size': conf.redirector.cache_size,
 			'exaproxy.security.local': ' '.join(str(_) for _ in conf.security.local),
 			'exaproxy.security.connect': ' '.join(str(_) for _ in conf.security.connect),
 			'exaproxy.usage.destination': conf.usage.destination,
 			'exaproxy.usage.enable': conf.usage.enable,
+			'exaproxy.usage.queue': conf.usage.queue,
+			'exaproxy.usage.overflow': conf.usage.overflow,
+			'exaproxy.usage.format': conf.usage.format,
+			'exaproxy.usage.rotate-size': conf.usage.rotate_size,
+			'exaproxy.usage.rotate-time': conf.usage.rotate_time,
+			'exaproxy.usage.rotate-keep': conf.usage.rotate_keep,
+			'exaproxy.usage.sample': conf.usage.sample,
 			'exaproxy.web.enable': conf.web.enable,
 			'exaproxy.web.host': '127.0.0.1',
 			'exaproxy.web.port': conf.web.port,
@@ -115,41 +147,138 @@ class Monitor (object):
 		content = self._supervisor.content
 		client = self._supervisor.client
 		reactor = self._supervisor.reactor
+		resolver = self._supervisor.resolver
+		deadlines = self._supervisor.deadlines
 
 		returned = {
 			'pid.saved': self._supervisor.pid._saved_pid,
 			'clients.silent': len(client.norequest),
 			'clients.speaking': len(client.byname),
 			'clients.requests': client.total_requested,
+			'clients.proxy': self._supervisor.proxy.client_count,
+			'clients.icap': self._supervisor.icap.client_count,
+			'clients.tls': self._supervisor.tls.client_count,
+			'clients.passthrough': self._supervisor.passthrough.client_count,
+			'clients.web': self._supervisor.web.client_count,
 			'servers.opening': len(content.opening),
 			'servers.established': len(content.established),
+			'servers.spliced': len(content.tunnels)/2,
+			'pool.idle': len(content.pool),
+			'pool.hit': content.pool.hit,
+			'pool.miss': content.pool.miss,
+			'pool.released': content.pool.released,
+			'pool.expired': content.pool.expired,
+			'pool.retried': content.pool.retried,
+			'connect.ipv4.success': content.connecting['ipv4'].count,
+			'connect.ipv4.failure': content.failed['ipv4'],
+			'connect.ipv6.success': content.connecting['ipv6'].count,
+			'connect.ipv6.failure': content.failed['ipv6'],
+			'connect.fallback': content.fallbacks,
+			'response.1xx': content.responses['1xx'],
+			'response.2xx': content.responses['2xx'],
+			'response.3xx': content.responses['3xx'],
+			'response.4xx': content.responses['4xx'],
+			'response.5xx': content.responses['5xx'],
+			'deadline.connect': deadlines.count['connect'],
+			'deadline.response': deadlines.count['response'],
+			'deadline.idle': deadlines.count['idle'],
+			'resolver.cached': len(resolver.cache),
+			'resolver.memory': resolver.cache.used,
+			'resolver.hit': resolver.cache.hit,
+			'resolver.miss': resolver.cache.miss,
+			'resolver.negative': resolver.cache.negative_hit,
+			'resolver.evicted': resolver.cache.evicted,
+			'resolver.expired': resolver.cache.expired,
+			'resolver.coalesced': resolver.coalesced,
+			'resolver.resolving': len(resolver.resolving),
 			'transfer.client4': client.total_sent4,
 			'transfer.client6': client.total_sent6,
 			'transfer.client': client.total_sent4 + client.total_sent6,
 			'transfer.content4': content.total_sent4,
 			'transfer.content6': content.total_sent6,
 			'transfer.content': content.total_sent4 + content.total_sent6,
+			'transfer.received': content.received,
 			'load.loops': reactor.nb_loops,
 			'load.events': reactor.nb_events,
+			'load.syscalls': self._supervisor.poller.syscalls,
+			'load.lag': int(reactor.lag * 1000000),
+			'processes.reactors': 1,
+			'usage.dropped': self._supervisor.usage_writer.dropped,
+			'usage.written': self._supervisor.usage_writer.written,
 		}
 
+		# we are not sent the redirector statistics with every call
+		if stats:
+			self.redirector = stats
+		else:
+			stats = self.redirector
+
 		if stats:
 			returned.update({
 				'queue.size': stats['queue'],
 				'processes.forked': stats['forked'],
 				'processes.min': stats['min'],
 				'processes.max': stats['max'],
+				'redirector.hit': stats.get('hit', 0),
+				'redirector.miss': stats.get('miss', 0),
+				'redirector.cached': stats.get('cached', 0),
 			})
+
+			# the usage lines of the url programs are written by the redirector process
+			returned['usage.dropped'] += stats.get('dropped', 0)
+			returned['usage.written'] += stats.get('written', 0)
 		else:
 			returned.update({
 				'queue.size': 0,
 				'processes.forked': 0,
 				'processes.min': 0,
 				'processes.max': 0,
+				'redirector.hit': 0,
+				'redirector.miss': 0,
+				'redirector.cached': 0,
 			})
 
+		# add the statistics of the other reactor processes to ours
+		for other in self._supervisor.reactors.statistics.values():
+			for key, value in other.items():
+				if key not in returned or key in _ignored:
+					continue
+
+				if key in _maximum:
+					returned[key] = max(returned[key], value)
+				else:
+					returned[key] += value
+
 		return returned
 
+	def histograms (self):
+		"""the time spent in each reactor handler, taken by the requests to reach each stage and to connect to the servers"""
+		return {
+			'handler': dict((name, histogram.dump()) for (name, histogram) in self._supervisor.reactor.latency.items()),
+			'stage': dict((name, histogram.dump()) for (name, histogram) in self._supervisor.timer.stages.items()),
+			'connect': dict((name, histogram.dump()) for (name, histogram) in self._supervisor.content.connecting.items()),
+		}
+
+	def merged (self, kind='handler'):
+		"""the histograms of all the reactor processes added together"""
+		merged = defaultdict(Histogram)
+
+		for histograms in [self.histograms()] + self._supervisor.reactors.latency.values():
+			for name, data in histograms.get(kind, {}).items():
+				merged[name].merge(data)
+
+		return merged
+
+	def latency (self):
+		"""the time spent in each reactor handler (in microseconds), for all the reactor processes"""
+		return dict((name, histogram.summary()) for (name, histogram) in self.merged().items())
+
+	def timing (self):
+		"""the time taken by the requests to reach each stage and to connect to the servers (in microseconds), for all the reactor processes"""
+		timing = dict((name, histogram.summary()) for (name, histogram) in self.merged('stage').items())
+		timing.update(('connect.%s' % family, histogram.summary()) for (family, histogram) in self.merged('connect').items())
+		return timing
+
 	def second (self, stats):
 		self.seconds.append(stats)
 
@@ -34,12 +34,16 @@ def Poller (configuration, speed=None):
 		reactor = configuration.reactor
 		log.info('the chosen polling reactor was %s' % reactor)
 
-	if reactor not in ('epoll','kqueue','select'):
+	if reactor not in ('edge','epoll','kqueue','select'):
 		log.error('invalid reactor name: "%s"' % reactor)
 		sys.exit(1)
 
 	timeout = speed if speed is not None else configuration.speed
 
+	if reactor == 'edge' and hasattr(select, 'epoll'):
+		from edge import EdgePoller as Poller
+		return Poller(timeout)
+
 	if reactor == 'epoll' and hasattr(select, 'epoll'):
 		from epoll import EPoller as Poller
 		return Poller(timeout)
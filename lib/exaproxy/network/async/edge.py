@@ -0,0 +1,268 @@
+# encoding: utf-8
+"""
+edge.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import select
+import errno
+import socket
+
+from interface import IPoller
+
+from select import EPOLLIN, EPOLLOUT, EPOLLHUP, EPOLLERR, EPOLLET
+
+
+class EdgePoller (IPoller):
+	"""A single epoll descriptor, with one interest mask per socket
+
+	Changes of interest (add, remove, cork, uncork) are only recorded and given
+	to the kernel in one pass before waiting, so a socket corked and uncorked
+	during the same loop does not cost any system call.
+
+	Events set up with edge=True are edge triggered when all the events the
+	socket is watched for are, their handlers must read or write until the
+	socket would block. A socket also watched for a level triggered event
+	(a client we read from while writing to it) stays level triggered."""
+
+	edge = True
+	epoll = staticmethod(select.epoll)
+
+	def __init__(self, speed):
+		self.speed = speed
+
+		self.master = self.epoll()
+		self.names = {}       # name -> reading, edge, sockets (socket -> corked)
+		self.interest = {}    # socket -> the names the socket is watched for
+		self.registered = {}  # socket -> file descriptor, mask as known by the kernel
+		self.fdtosock = {}
+		self.changed = set()  # sockets for which the kernel mask must be computed again
+		self.errors = {}
+		self.syscalls = 0
+
+
+	def _add(self, name, sock):
+		sockets = self.names[name][2]
+		if sock in sockets:
+			return False
+
+		sockets[sock] = False
+		self.interest.setdefault(sock, set()).add(name)
+		self.changed.add(sock)
+		return True
+
+	def _remove(self, name, sock):
+		sockets = self.names[name][2]
+		if sockets.pop(sock, None) is not None:
+			self.interest[sock].discard(name)
+			self.changed.add(sock)
+
+		if sock in self.errors:
+			self.errors.pop(sock)
+
+	def _cork(self, name, sock):
+		sockets = self.names[name][2]
+		if sockets.get(sock, True):
+			return False
+
+		sockets[sock] = True
+		self.changed.add(sock)
+		return True
+
+	def _uncork(self, name, sock):
+		sockets = self.names[name][2]
+		if not sockets.get(sock, False):
+			return False
+
+		sockets[sock] = False
+		self.changed.add(sock)
+		return True
+
+	def _setup(self, name, reading, edge):
+		if name not in self.names:
+			self.names[name] = reading, edge, {}
+
+	def _clear(self, name):
+		reading, edge, sockets = self.names.get(name, (None, None, {}))
+		for sock in sockets:
+			self.interest[sock].discard(name)
+			self.changed.add(sock)
+
+		sockets.clear()
+
+
+	def addReadSocket(self, name, sock):
+		return self._add(name, sock)
+
+	def removeReadSocket(self, name, sock):
+		return self._remove(name, sock)
+
+	def removeClosedReadSocket(self, name, sock):
+		pass
+
+	def corkReadSocket(self, name, sock):
+		return self._cork(name, sock)
+
+	def uncorkReadSocket(self, name, sock):
+		return self._uncork(name, sock)
+
+	def setupRead(self, name, edge=False):
+		self._setup(name, True, edge)
+
+	def clearRead(self, name):
+		self._clear(name)
+
+
+	def addWriteSocket(self, name, sock):
+		return self._add(name, sock)
+
+	def removeWriteSocket(self, name, sock):
+		return self._remove(name, sock)
+
+	def removeClosedWriteSocket(self, name, sock):
+		pass
+
+	def corkWriteSocket(self, name, sock):
+		return self._cork(name, sock)
+
+	def uncorkWriteSocket(self, name, sock):
+		return self._uncork(name, sock)
+
+	def setupWrite(self, name, edge=False):
+		self._setup(name, False, edge)
+
+	def clearWrite(self, name):
+		self._clear(name)
+
+
+	def _mask(self, sock):
+		mask = 0
+		edge = True
+
+		for name in self.interest[sock]:
+			reading, edge_name, sockets = self.names[name]
+			if sockets[sock]:
+				continue
+
+			mask |= EPOLLIN if reading else EPOLLOUT
+			edge = edge and edge_name
+
+		# all corked: errors are still reported by the kernel, but only once
+		if not mask:
+			return EPOLLET
+
+		mask |= EPOLLHUP
+		return mask | EPOLLET if edge else mask
+
+	def _unregister(self, sock):
+		self.interest.pop(sock, None)
+		fd, mask = self.registered.pop(sock, (None, None))
+
+		# the descriptor may have been closed and given to another socket
+		if fd is None or self.fdtosock.get(fd) is not sock:
+			return
+
+		del self.fdtosock[fd]
+
+		try:
+			self.syscalls += 1
+			self.master.unregister(fd)
+		except (IOError, OSError):
+			# the socket was closed, the kernel already forgot about it
+			pass
+
+	def _register(self, sock):
+		mask = self._mask(sock)
+		fd, current = self.registered.get(sock, (None, None))
+
+		try:
+			if fd is None or self.fdtosock.get(fd) is not sock:
+				fd = sock.fileno()
+				self.syscalls += 1
+
+				try:
+					self.master.register(fd, mask)
+				except IOError, e:
+					if e.errno != errno.EEXIST:
+						raise
+
+					# a closed socket, never unregistered, had the same descriptor
+					self.syscalls += 1
+					self.master.modify(fd, mask)
+
+			# an edge triggered socket is modified even if its mask did not change,
+			# so the kernel reports the data which arrived while it was corked
+			elif mask != current or mask & EPOLLET:
+				self.syscalls += 1
+				self.master.modify(fd, mask)
+
+		except (IOError, OSError, ValueError, socket.error), e:
+			print "ERROR registering socket (%s): %s" % (str(sock), str(e))
+
+			# let the handler of the event find that the socket is not usable
+			names = self.interest.pop(sock, set())
+			for name in names:
+				self.names[name][2].pop(sock, None)
+
+			if names and sock not in self.errors:
+				self.errors[sock] = names.pop()
+
+			self.registered.pop(sock, None)
+			return
+
+		self.registered[sock] = fd, mask
+		self.fdtosock[fd] = sock
+
+	def _apply(self):
+		changed = self.changed
+		self.changed = set()
+
+		# removals first, a descriptor may have been reused by a new socket
+		for sock in changed:
+			if not self.interest.get(sock):
+				self._unregister(sock)
+
+		for sock in changed:
+			if self.interest.get(sock):
+				self._register(sock)
+
+
+	def poll(self):
+		if self.changed:
+			self._apply()
+
+		try:
+			self.syscalls += 1
+			res = self.master.poll(self.speed)
+		except IOError, e:
+			if e.errno != errno.EINTR:
+				raise
+
+			res = []
+			response = {}
+		else:
+			response = dict((name, []) for name in self.names)
+
+		names = self.names
+		interest = self.interest
+
+		for fd, events in res:
+			sock = self.fdtosock.get(fd, None)
+			if sock is None:
+				continue
+
+			failed = events & (EPOLLHUP | EPOLLERR)
+
+			for name in interest.get(sock, ()):
+				reading, edge, sockets = names[name]
+				if sockets[sock]:
+					continue
+
+				if failed or events & (EPOLLIN if reading else EPOLLOUT):
+					response[name].append(sock)
+
+		for sock, name in self.errors.iteritems():
+			response.setdefault(name, []).append(sock)
+
+		return response
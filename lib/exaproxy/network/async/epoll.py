@@ -35,6 +35,7 @@ class EPoller (IPoller):
 			sockets[sock] = True
 			try:
 				fileno = sock.fileno()
+				self.syscalls += 1
 				poller.register(sock, EPOLLIN | EPOLLHUP)
 				res = True
 			except socket.error, e:
@@ -64,6 +65,7 @@ class EPoller (IPoller):
 
 			sockets.pop(sock)
 			if sock not in corked:
+				self.syscalls += 1
 				poller.unregister(sock)
 			else:
 				corked.pop(sock)
@@ -78,6 +80,7 @@ class EPoller (IPoller):
 		sockets, poller, fdtosock, corked = self.sockets[name]
 		if sock in sockets and sock not in corked:
 			corked[sock] = True
+			self.syscalls += 1
 			poller.unregister(sock)
 			res = True
 		else:
@@ -90,6 +93,7 @@ class EPoller (IPoller):
 		if sock in sockets:
 			if corked.pop(sock, None):
 				try:
+					self.syscalls += 1
 					poller.register(sock, EPOLLIN | EPOLLHUP)
 					res = True
 				except socket.error, e:
@@ -108,7 +112,7 @@ class EPoller (IPoller):
 
 		return res
 
-	def setupRead(self, name):
+	def setupRead(self, name, edge=False):
 		if name not in self.sockets:
 			poller = self.epoll()
 			sockets = {}
@@ -117,11 +121,13 @@ class EPoller (IPoller):
 			self.pollers[poller.fileno()] = name, poller, sockets, fdtosock
 
 			self.sockets[name] = sockets, poller, fdtosock, corked
+			self.syscalls += 1
 			self.master.register(poller, EPOLLIN)
 
 	def clearRead(self, name):
 		sockets, poller, fdtosock, corked = self.sockets.pop(name, ({}, None, None, None))
 		if sockets:
+			self.syscalls += 1
 			self.master.unregister(poller)
 			self.pollers.pop(poller.fileno(), None)
 			poller.close()
@@ -134,6 +140,7 @@ class EPoller (IPoller):
 			sockets[sock] = True
 			try:
 				fileno = sock.fileno()
+				self.syscalls += 1
 				poller.register(sock, EPOLLOUT | EPOLLHUP)
 				res = True
 			except socket.error, e:
@@ -162,6 +169,7 @@ class EPoller (IPoller):
 
 			sockets.pop(sock)
 			if sock not in corked:
+				self.syscalls += 1
 				poller.unregister(sock)
 			else:
 				corked.pop(sock)
@@ -175,6 +183,7 @@ class EPoller (IPoller):
 	def corkWriteSocket(self, name, sock):
 		sockets, poller, fdtosock, corked = self.sockets[name]
 		if sock in sockets and sock not in corked:
+			self.syscalls += 1
 			poller.unregister(sock)
 			corked[sock] = True
 			res = True
@@ -188,6 +197,7 @@ class EPoller (IPoller):
 		if sock in sockets:
 			if corked.pop(sock, None):
 				try:
+					self.syscalls += 1
 					poller.register(sock, EPOLLOUT | EPOLLHUP)
 					res = True
 				except socket.error, e:
@@ -206,7 +216,7 @@ class EPoller (IPoller):
 
 		return res
 
-	def setupWrite(self, name):
+	def setupWrite(self, name, edge=False):
 		if name not in self.sockets:
 			poller = self.epoll()
 			sockets = {}
@@ -215,11 +225,13 @@ class EPoller (IPoller):
 			self.pollers[poller.fileno()] = name, poller, sockets, fdtosock
 
 			self.sockets[name] = sockets, poller, fdtosock, corked
+			self.syscalls += 1
 			self.master.register(poller, EPOLLIN)
 
 	def clearWrite(self, name):
 		sockets, poller, fdtosock, corked = self.sockets.pop(name, ({}, None, None, None))
 		if sockets:
+			self.syscalls += 1
 			self.master.unregister(poller)
 			self.pollers.pop(poller.fileno(), None)
 			poller.close()
@@ -228,6 +240,7 @@ class EPoller (IPoller):
 
 	def poll(self):
 		try:
+			self.syscalls += 1
 			res = self.master.poll(self.speed)
 		except IOError, e:
 			if e.errno != errno.EINTR:
@@ -240,6 +253,7 @@ class EPoller (IPoller):
 
 		for fd, events in res:
 			name, poller, sockets, fdtosock = self.pollers[fd]
+			self.syscalls += 1
 			events = poller.poll(0)
 
 			response[name] = [fdtosock[sock_fd] for (sock_fd, sock_events) in events]
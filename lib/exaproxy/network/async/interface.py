@@ -9,6 +9,9 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 class IPoller:
 	"""Interface for pollers"""
 
+	edge = False   # can events be edge triggered (the handlers must then drain the sockets)
+	syscalls = 0   # number of system calls made to poll or change what is watched
+
 	def addReadSocket(self, name, socket):
 		"""Start watching for data in the socket's recvbuf"""
 		raise NotImplementedError
@@ -27,8 +30,9 @@ class IPoller:
 		"""Start watching the socket for incoming data again"""
 		raise NotImplementedError
 
-	def setupRead(self, name):
-		"""Define a new event that sockets can subscribe to"""
+	def setupRead(self, name, edge=False):
+		"""Define a new event that sockets can subscribe to. Pollers able
+		   to do so report edge events only when the socket becomes ready"""
 		raise NotImplementedError
 
 	def clearRead(self, name):
@@ -53,8 +57,9 @@ class IPoller:
 		"""Start watching for space in the socket's sendbuf again"""
 		raise NotImplementedError
 
-	def setupWrite(self, name):
-		"""Define a new event that sockets can subscribe to"""
+	def setupWrite(self, name, edge=False):
+		"""Define a new event that sockets can subscribe to. Pollers able
+		   to do so report edge events only when the socket becomes ready"""
 		raise NotImplementedError
 
 	def clearWrite(self, name):
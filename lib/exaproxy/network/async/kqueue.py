@@ -46,6 +46,7 @@ class KQueuePoller (IPoller):
 				assert fdtosock.get(fileno, None) is None
 				fdtosock[fileno] = sock
 
+				self.syscalls += 1
 				poller.control([kevent(sock, KQ_FILTER_READ, KQ_EV_ADD)], 0)
 				res = True
 			except socket.error, e:
@@ -75,6 +76,7 @@ class KQueuePoller (IPoller):
 
 			sockets.pop(sock)
 			if sock not in corked:
+				self.syscalls += 1
 				poller.control([kevent(sock, KQ_FILTER_READ, KQ_EV_DELETE)], 0)
 			else:
 				corked.pop(sock)
@@ -89,6 +91,7 @@ class KQueuePoller (IPoller):
 		sockets, poller, fdtosock, corked = self.sockets[name]
 		if sock in sockets and sock not in corked:
 			corked[sock] = True
+			self.syscalls += 1
 			poller.control([kevent(sock, KQ_FILTER_READ, KQ_EV_DELETE)], 0)
 			res = True
 		else:
@@ -101,6 +104,7 @@ class KQueuePoller (IPoller):
 		if sock in sockets:
 			if corked.pop(sock, None):
 				try:
+					self.syscalls += 1
 					poller.control([kevent(sock, KQ_FILTER_READ, KQ_EV_ADD)], 0)
 					res = True
 				except socket.error, e:
@@ -119,7 +123,7 @@ class KQueuePoller (IPoller):
 
 		return res
 
-	def setupRead(self, name):
+	def setupRead(self, name, edge=False):
 		if name not in self.sockets:
 			poller = self.kqueue()
 			sockets = {}
@@ -129,11 +133,13 @@ class KQueuePoller (IPoller):
 			self.pollers[poller.fileno()] = name, poller, sockets, fdtosock
 			self.sockets[name] = sockets, poller, fdtosock, corked
 
+			self.syscalls += 1
 			self.master.control([kevent(poller, KQ_FILTER_READ, KQ_EV_ADD)], 0)
 
 	def clearRead(self, name):
 		sockets, poller, fdtosock, corked = self.sockets.pop(name, ({}, None, None, None))
 		if sockets:
+			self.syscalls += 1
 			self.master.control([kevent(poller, KQ_FILTER_READ, KQ_EV_DELETE)], 0)
 			self.pollers.pop(poller.fileno(), None)
 			poller.close()
@@ -149,6 +155,7 @@ class KQueuePoller (IPoller):
 				assert fdtosock.get(fileno, None) is None
 				fdtosock[fileno] = sock
 
+				self.syscalls += 1
 				poller.control([kevent(sock, KQ_FILTER_WRITE, KQ_EV_ADD)], 0)
 				res = True
 			except socket.error, e:
@@ -178,6 +185,7 @@ class KQueuePoller (IPoller):
 
 			sockets.pop(sock)
 			if sock not in corked:
+				self.syscalls += 1
 				poller.control([kevent(sock, KQ_FILTER_WRITE, KQ_EV_DELETE)], 0)
 			else:
 				corked.pop(sock)
@@ -192,6 +200,7 @@ class KQueuePoller (IPoller):
 		sockets, poller, fdtosock, corked = self.sockets[name]
 		if sock in sockets and sock not in corked:
 			corked[sock] = True
+			self.syscalls += 1
 			poller.control([kevent(sock, KQ_FILTER_WRITE, KQ_EV_DELETE)], 0)
 			res = True
 		else:
@@ -204,6 +213,7 @@ class KQueuePoller (IPoller):
 		if sock in sockets:
 			if corked.pop(sock, None):
 				try:
+					self.syscalls += 1
 					poller.control([kevent(sock, KQ_FILTER_WRITE, KQ_EV_ADD)], 0)
 					res = True
 				except socket.error, e:
@@ -221,7 +231,7 @@ class KQueuePoller (IPoller):
 			res = False
 		return res
 
-	def setupWrite(self, name):
+	def setupWrite(self, name, edge=False):
 		if name not in self.sockets:
 			poller = self.kqueue()
 			sockets = {}
@@ -231,12 +241,14 @@ class KQueuePoller (IPoller):
 			self.pollers[poller.fileno()] = name, poller, sockets, fdtosock
 			self.sockets[name] = sockets, poller, fdtosock, corked
 
+			self.syscalls += 1
 			self.master.control([kevent(poller, KQ_FILTER_READ, KQ_EV_ADD)], 0)
 
 
 	def clearWrite(self, name):
 		sockets, poller, fdtosock, corked = self.sockets.pop(name, ({}, None, None, None))
 		if sockets:
+			self.syscalls += 1
 			self.master.control([kevent(poller, KQ_FILTER_READ, KQ_EV_DELETE)], 0)
 			self.pollers.pop(poller.fileno(), None)
 			poller.close()
@@ -244,6 +256,7 @@ class KQueuePoller (IPoller):
 
 	def poll(self):
 		try:
+			self.syscalls += 1
 			res = self.master.control(None, self.max_events, self.speed)
 		except EnvironmentError, e:
 			if e.errno != errno.EINTR:
@@ -262,6 +275,7 @@ class KQueuePoller (IPoller):
 			fd = events.ident
 
 			name, poller, sockets, fdtosock = self.pollers[fd]
+			self.syscalls += 1
 			events = poller.control(None, self.max_events, 0)
 
 			if len(events) == self.max_events:
@@ -282,6 +296,7 @@ class KQueuePoller (IPoller):
 						sock_events.data, sock_events.udata))
 
 					sock = fdtosock.pop(sock_fd, None)
+					self.syscalls += 1
 					poller.control([kevent(sock, sock_events.filter, KQ_EV_DELETE)], 0)
 					sockets.pop(sock)
 
@@ -82,7 +82,7 @@ class SelectPoller (IPoller):
 			sockets.remove(socket)
 			self.read_modified[name] = True
 
-	def setupRead(self, name):
+	def setupRead(self, name, edge=False):
 		if name not in self.read_sockets:
 			self.read_sockets[name] = []
 
@@ -105,7 +105,7 @@ class SelectPoller (IPoller):
 			sockets.remove(socket)
 			self.write_modified[name] = True
 
-	def setupWrite(self, name):
+	def setupWrite(self, name, edge=False):
 		if name not in self.write_sockets:
 			self.write_sockets[name] = []
 
@@ -126,11 +126,13 @@ class SelectPoller (IPoller):
 		all_socks = {}
 
 		for name, socks in self.read_sockets.items():
+			self.syscalls += 1
 			socks, _, __ = self.poller(socks, [], 0)
 			if socks:
 				all_socks[name] = socks
 
 		for name, socks in self.write_sockets.items():
+			self.syscalls += 1
 			_, socks, __ = self.poller([], socks, 0)
 			if socks:
 				all_socks[name] = socks
@@ -146,13 +148,16 @@ class SelectPoller (IPoller):
 			self.write_all = sum(self.write_sockets.values(), [])
 			self.write_modified = {}
 
+		self.syscalls += 1
 		r, w, x  = self.poller(self.read_all, self.write_all, self.speed)
 
 		for name, socks in self.read_sockets.items():
+			self.syscalls += 1
 			polled, _, __ = self.poller(socks, [], 0)
 			if polled: all_socks[name] = polled
 
 		for name, socks in self.write_sockets.items():
+			self.syscalls += 1
 			polled, all_socks[name], __ = self.poller([], socks, 0)
 			if polled: all_socks[name] = polled
 
@@ -0,0 +1,63 @@
+# encoding: utf-8
+"""
+sendfile.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import sys
+import errno
+import socket
+
+import ctypes
+import ctypes.util
+
+
+def _make_sendfile ():
+	"""Set up a sendfile(2) wrapper, None if the system does not provide it"""
+
+	# python 3.3 and later
+	if hasattr(os, 'sendfile'):
+		return os.sendfile
+
+	# the BSD call has another signature, we only bind the linux one
+	if not sys.platform.startswith('linux'):
+		return None
+
+	try:
+		libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		c_sendfile = libc.sendfile64
+	except (OSError, AttributeError):
+		return None
+
+	# ssize_t sendfile64(int out_fd, int in_fd, off64_t *offset, size_t count)
+	c_sendfile.argtypes = [
+		ctypes.c_int, ctypes.c_int,
+		ctypes.POINTER(ctypes.c_int64),
+		ctypes.c_size_t
+	]
+	c_sendfile.restype = ctypes.c_ssize_t
+
+	def sendfile (out_fd, in_fd, offset, count):
+		"""send up to count bytes of in_fd, starting at offset, without changing its file position
+		raise socket.error with the errno on failure (EINTR is retried)"""
+
+		c_offset = ctypes.c_int64(offset)
+
+		while True:
+			res = c_sendfile(out_fd, in_fd, ctypes.byref(c_offset), count)
+
+			if res == -1:
+				errno_ = ctypes.get_errno()
+
+				if errno_ == errno.EINTR:
+					continue
+
+				raise socket.error(errno_, os.strerror(errno_))
+
+			return res
+
+	return sendfile
+
+sendfile = _make_sendfile()
@@ -11,6 +11,7 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 
 from .functions import listen
 from .functions import listen_intercept
+from .errno_list import errno_block
 import socket
 
 from exaproxy.util.log.logger import Logger
@@ -68,6 +69,8 @@ class Server(object):
 	def listen(self, ip, port, timeout, backlog):
 		s = self._listen(ip, port,timeout,backlog)
 		if s:
+			# accept must not wait once the queue is empty
+			s.setblocking(0)
 			self.binding.add((ip,port,timeout,backlog))
 			self.socks[s] = (ip,port)
 
@@ -78,24 +81,27 @@ class Server(object):
 		return s
 
 	def accept(self, sock):
-		try:
-			# should we check to make sure it's a socket we provided
-			s, a = sock.accept()
-			s.setblocking(0)
-			# NOTE: we really should try to handle the entire queue at once
-			yield s, a[0]
-		except socket.error, e:
-			# It doesn't really matter if accept fails temporarily. We will
-			# try again next loop
-			self.log.debug('%s could not accept a new connection %s' % (self.name,str(e)))
-		else:
+		# handle the entire queue at once (we may not be told again about the pending connections)
+		while self.client_count < self.max_clients:
+			try:
+				# should we check to make sure it's a socket we provided
+				s, a = sock.accept()
+				s.setblocking(0)
+			except socket.error, e:
+				# It doesn't really matter if accept fails temporarily. We will
+				# try again next loop
+				if e.args[0] not in errno_block:
+					self.log.debug('%s could not accept a new connection %s' % (self.name,str(e)))
+				break
+
 			self.client_count += 1
-		finally:
-			if self.client_count >= self.max_clients:
-				self.saturated = True
+			yield s, a[0]
 
-				for listening_sock in self.socks:
-					self.poller.removeReadSocket(self.read_name, listening_sock)
+		if self.client_count >= self.max_clients:
+			self.saturated = True
+
+			for listening_sock in self.socks:
+				self.poller.removeReadSocket(self.read_name, listening_sock)
 
 	def notifyClose (self, client, count=1):
 		paused = self.client_count >= self.max_clients
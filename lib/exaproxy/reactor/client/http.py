@@ -11,20 +11,20 @@ import errno
 
 from exaproxy.network.functions import isipv4
 from exaproxy.network.errno_list import errno_block
+from exaproxy.network.sendfile import sendfile
+from exaproxy.util.buffer import WriteBuffer
 
 from exaproxy.util.proxy import ProxyProtocol
+from .scanner import HeaderScanner
 
 def ishex (s):
 	return bool(s) and not bool(s.strip('0123456789abcdefABCDEF'))
 
-def count_quotes (data):
-	return data.count('"') - data.count('\\"')
-
 class HTTPClient (object):
 	eor = ['\r\n\r\n', '\n\n']
 	proxy_protocol = ProxyProtocol()
 
-	__slots__ = ['name', 'ipv4', 'sock', 'accept_addr', 'accept_port', 'peer', 'reader', 'writer', 'w_buffer', 'log']
+	__slots__ = ['name', 'ipv4', 'sock', 'accept_addr', 'accept_port', 'peer', 'reader', 'writer', 'w_buffer', 'scanner', 'log']
 
 	def __init__(self, name, sock, peer, logger, max_buffer, proxied):
 		addr, port = sock.getsockname()[:2]
@@ -37,7 +37,8 @@ class HTTPClient (object):
 		self.ipv4 = isipv4(addr)
 		self.reader = self._read(sock, max_buffer, proxied=proxied)
 		self.writer = self._write(sock)
-		self.w_buffer = ''
+		self.w_buffer = WriteBuffer()
+		self.scanner = HeaderScanner()
 
 		self.log = logger
 
@@ -45,17 +46,11 @@ class HTTPClient (object):
 		self.reader.next()
 
 	def checkRequest (self, r_buffer, size, seek=0):
-		for eor in self.eor:
-			pos = r_buffer[seek:].find(eor)
-			if pos == -1: continue
-
-			buff = r_buffer[:seek+pos]
-			if not buff: continue
-
-			if not count_quotes(buff) % 2:  # we have matching pairs
-				return buff + eor, r_buffer[seek+pos+len(eor):], seek
+		# the scanner carries on from where it stopped with the previous read
+		end = self.scanner.scan(r_buffer, seek)
 
-			seek += pos + len(eor)
+		if end != -1:
+			return r_buffer[:end], r_buffer[end:], seek
 
 		if size and len(r_buffer) > size:
 			return None,None,None
@@ -319,26 +314,29 @@ class HTTPClient (object):
 
 	def _write(self, sock):
 		"""Coroutine managing data sent to the client"""
-		filename = yield None
+		local = yield None
 
 		# check to see if we are returning data directly from a local file
-		if filename is not None:
-			try:
-				# NOTE: we must read from the file on demand rather than doing this
-				with open(filename) as fd:
-					file_data = fd.read()
-
-				found = True, False, 0, 0
-			except IOError:
-				found = None
+		if local is not None:
+			fd, remaining = local
+			found = True, False, 0, 0
 
 			data = yield found
-			self.w_buffer += data + file_data
-			file_data = ''
+			self.w_buffer.append(data)
+
+			if sendfile is None:
+				# the file content has to go through our buffer
+				fd.seek(0)
+				self.w_buffer.append(fd.read(remaining))
+				fd, remaining = None, 0
 
 		else:
+			fd, remaining = None, 0
 			found = None
 
+		# the file is shared with other clients, we send it from our own offset
+		offset = 0
+
 		data = yield found
 		finished = False
 		w_buffer = self.w_buffer
@@ -347,30 +345,43 @@ class HTTPClient (object):
 			try:
 				while True:
 					w_buffer = self.w_buffer
-					had_buffer = bool(w_buffer)
+					had_buffer = bool(w_buffer) or bool(remaining)
 
 					if data is not None:
-						w_buffer += data
+						w_buffer.append(data)
 					else:
 						# We've finished downloading, even if the client hasn't yet
 						finished = True
 
 					if finished:
-						if not w_buffer:
+						if not w_buffer and not remaining:
 							break	  # terminate the client connection
 						elif data:
 							self.log.error('Tried to send data to client after we told it to close. Dropping it.')
 
 					if not had_buffer or data == '':
-						sent = sock.send(w_buffer)
-						#if sent:
-						#	self.log.debug(">> [%s]" % w_buffer[:sent].replace('\t','\\t').replace('\r','\\r').replace('\n','\\n'))
-						w_buffer = w_buffer[sent:]
+						sent = w_buffer.flush(sock)
+
+						# the headers are gone, the file is copied to the socket by the kernel
+						if remaining and not w_buffer:
+							# the headers must not be sent again if the socket is now full
+							self.w_buffer = w_buffer
+
+							try:
+								moved = sendfile(sock.fileno(), fd.fileno(), offset, remaining)
+							except socket.error, e:
+								# we resume from the same offset on the next write event
+								if e.args[0] not in errno_block:
+									raise
+							else:
+								# the file was truncated under us
+								remaining = remaining - moved if moved else 0
+								offset += moved
+								sent += moved
 					else:
 						sent = 0
 
-					self.w_buffer = w_buffer
-					buffered = bool(w_buffer) or finished
+					buffered = bool(w_buffer) or bool(remaining) or finished
 					data = yield buffered, had_buffer, sent if self.ipv4 else 0, 0 if self.ipv4 else sent
 
 				# break out of the outer loop as soon as we leave the inner loop
@@ -379,11 +390,10 @@ class HTTPClient (object):
 				break
 
 			except socket.error, e:
-				self.w_buffer = w_buffer
 				if e.args[0] in errno_block:
 					self.log.debug('interrupted when trying to sent %d bytes, fine, will retry' % len(data))
 					self.log.debug('reason: errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
-					data = yield bool(w_buffer) or finished, had_buffer, 0, 0
+					data = yield bool(w_buffer) or bool(remaining) or finished, had_buffer, 0, 0
 				else:
 					self.log.debug('handled an unexpected error writing on socket')
 					self.log.debug('reason, errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
@@ -410,8 +420,8 @@ class HTTPClient (object):
 			self.writer.send(None)  # close the connection once the buffer is empty
 
 		elif command == 'file':
-			header, filename = data
-			res = self.writer.send(filename)  # use local file
+			header, fd, size = data
+			res = self.writer.send((fd, size))  # use local file
 			self.writer.send(header)  # write the response headers before the file
 
 			self.writer.send(None)  # close the connection once the buffer is empty
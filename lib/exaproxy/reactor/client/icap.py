@@ -11,6 +11,7 @@ import errno
 
 from exaproxy.network.functions import isipv4
 from exaproxy.network.errno_list import errno_block
+from exaproxy.util.buffer import WriteBuffer
 
 from exaproxy.util.proxy import ProxyProtocol
 
@@ -41,7 +42,7 @@ class ICAPClient (object):
 		self.ipv4 = isipv4(addr)
 		self.reader = self._read(sock, max_buffer, proxied=proxied)
 		self.writer = self._write(sock)
-		self.w_buffer = ''
+		self.w_buffer = WriteBuffer()
 		self.log = logger
 
 		# start the _read coroutine
@@ -336,21 +337,22 @@ class ICAPClient (object):
 
 	def _write(self, sock):
 		"""Coroutine managing data sent to the client"""
-		filename = yield None
+		local = yield None
 
 		# check to see if we are returning data directly from a local file
-		if filename is not None:
+		if local is not None:
 			try:
-				# NOTE: we must read from the file on demand rather than doing this
-				with open(filename) as fd:
-					self.w_buffer += fd.read()
+				# NOTE: the file object is shared with other clients
+				fd, size = local
+				fd.seek(0)
+				self.w_buffer.append(fd.read(size))
 
 				found = True, False, 0, 0
 			except IOError:
 				found = None
 
 			data = yield found
-			self.w_buffer = data + self.w_buffer
+			self.w_buffer.prepend(data)
 		else:
 			found = None
 
@@ -365,7 +367,7 @@ class ICAPClient (object):
 					had_buffer = bool(w_buffer)
 
 					if data is not None:
-						w_buffer += data
+						w_buffer.append(data)
 					else:
 						# We've finished downloading, even if the client hasn't yet
 						finished = True
@@ -377,14 +379,10 @@ class ICAPClient (object):
 							self.log.error('Tried to send data to client after we told it to close. Dropping it.')
 
 					if not had_buffer or data == '':
-						sent = sock.send(w_buffer)
-						#if sent:
-						#	self.log.debug(">> [%s]" % w_buffer[:sent].replace('\t','\\t').replace('\r','\\r').replace('\n','\\n'))
-						w_buffer = w_buffer[sent:]
+						sent = w_buffer.flush(sock)
 					else:
 						sent = 0
 
-					self.w_buffer = w_buffer
 					buffered = bool(w_buffer) or finished
 					data = yield buffered, had_buffer, sent if self.ipv4 else 0, 0 if self.ipv4 else sent
 
@@ -394,7 +392,6 @@ class ICAPClient (object):
 				break
 
 			except socket.error, e:
-				self.w_buffer = w_buffer
 				if e.args[0] in errno_block:
 					self.log.debug('interrupted when trying to sent %d bytes, fine, will retry' % len(data))
 					self.log.debug('reason: errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
@@ -426,8 +423,8 @@ class ICAPClient (object):
 			res = self.writer.send(None)  # close the connection once the buffer is empty
 
 		elif command == 'file':
-			header, filename = data
-			res = self.writer.send(filename)  # use local file
+			header, fd, size = data
+			res = self.writer.send((fd, size))  # use local file
 			self.writer.send(header)  # write the response headers before the file
 
 			self.writer.send(None)  # close the connection once the buffer is empty
@@ -15,16 +15,18 @@ from .tls import TLSClient
 from .passthrough import PassthroughClient
 
 class ClientManager (object):
-	def __init__(self, poller, configuration):
+	def __init__(self, poller, configuration, timer, deadlines):
 		self.total_sent4 = 0L
 		self.total_sent6 = 0L
 		self.total_requested = 0L
 		self.norequest = TimeCache(configuration.http.idle_connect)
 		self.bysock = {}
 		self.byname = {}
-		self.buffered = []
+		self.buffered = set()
 		self._nextid = 0
 		self.poller = poller
+		self.timer = timer
+		self.deadlines = deadlines
 		self.log = Logger('client', configuration.log.client)
 		self.http_max_buffer = configuration.http.header_size
 		self.icap_max_buffer = configuration.icap.header_size
@@ -62,6 +64,7 @@ class ClientManager (object):
 
 		self.norequest[sock] = client, source
 		self.byname[name] = sock
+		self.timer.accept(sock)
 
 		# watch for the opening request
 		self.poller.addReadSocket('opening_client', client.sock)
@@ -75,6 +78,7 @@ class ClientManager (object):
 
 		self.norequest[sock] = client, source
 		self.byname[name] = sock
+		self.timer.accept(sock)
 
 		# watch for the opening request
 		self.poller.addReadSocket('opening_client', client.sock)
@@ -88,6 +92,7 @@ class ClientManager (object):
 
 		self.norequest[sock] = client, source
 		self.byname[name] = sock
+		self.timer.accept(sock)
 
 		# watch for the opening request
 		self.poller.addReadSocket('opening_client', client.sock)
@@ -101,11 +106,14 @@ class ClientManager (object):
 
 		self.bysock[sock] = client, source
 		self.byname[name] = sock
+		self.timer.accept(sock)
 
 		# watch for the opening data
 		self.poller.addReadSocket('read_client', client.sock)
 
 		accept_addr, accept_port = client.getAcceptAddress()
+		self.timer.start(sock, name, accept_addr, accept_port, peer, '', source)
+		self.deadlines.start('idle', sock)
 
 		#self.log.info('new id %s (socket %s) in clients : %s' % (name, sock, sock in self.bysock))
 		return name, accept_addr, accept_port
@@ -119,6 +127,8 @@ class ClientManager (object):
 			name, accept_addr, accept_port, peer, request, subrequest, content = client.readData()
 			if request:
 				self.total_requested += 1
+				self.timer.start(sock, name, accept_addr, accept_port, peer, request, source)
+				self.deadlines.start('idle', sock)
 
 				# headers can be read only once
 				self.norequest.pop(sock, (None, None))
@@ -146,8 +156,13 @@ class ClientManager (object):
 		client, source = self.bysock.get(sock, (None, None))
 		if client:
 			name, accept_addr, accept_port, peer, request, subrequest, content = client.readData()
+			if request or content:
+				self.deadlines.start('idle', sock)
+
 			if request:
 				self.total_requested += 1
+				self.timer.start(sock, name, accept_addr, accept_port, peer, request, source)
+
 				# Parsing of the new request will be handled asynchronously. Ensure that
 				# we do not read anything from the client until a request has been sent
 				# to the remote webserver.
@@ -183,10 +198,14 @@ class ClientManager (object):
 				self.total_sent6 += sent6
 				result = buffered
 
+				if sent4 or sent6:
+					self.timer.sent(sock)
+					self.deadlines.start('idle', sock)
+
 
 			if buffered:
 				if sock not in self.buffered:
-					self.buffered.append(sock)
+					self.buffered.add(sock)
 					buffer_change = True
 
 					# watch for the socket's send buffer becoming less than full
@@ -255,6 +274,10 @@ class ClientManager (object):
 			self.total_sent4 += sent4
 			self.total_sent6 += sent6
 
+			if sent4 or sent6:
+				self.timer.sent(client.sock)
+				self.deadlines.start('idle', client.sock)
+
 		else:
 			self.cleanup(client.sock, name)
 			return None, source
@@ -273,12 +296,12 @@ class ClientManager (object):
 			content = None
 
 		if buffered is True and had_buffer is False:
-			self.buffered.append(client.sock)
+			self.buffered.add(client.sock)
 
 			self.poller.addWriteSocket('write_client', client.sock)
 
 		elif buffered is False and had_buffer is True:
-			self.buffered.remove(client.sock)
+			self.buffered.discard(client.sock)
 
 			self.poller.removeWriteSocket('write_client', client.sock)
 
@@ -293,14 +316,50 @@ class ClientManager (object):
 		if sock in self.bysock:
 			self.poller.uncorkReadSocket('read_client', sock)
 
+	def canSplice(self, sock):
+		client, source = self.bysock.get(sock, (None, None))
+		return client is not None and sock not in self.buffered and not client.w_buffer
+
+	def startSplice(self, sock):
+		# the tunnel data is now relayed by the kernel and not read by the client
+		self.poller.removeReadSocket('read_client', sock)
+
+	def accountSplice(self, sock, sent):
+		client, source = self.bysock.get(sock, (None, None))
+		if client:
+			if client.ipv4:
+				self.total_sent4 += sent
+			else:
+				self.total_sent6 += sent
+
+			self.timer.sent(sock)
+			self.deadlines.start('idle', sock)
+
+	def endSplice(self, sock):
+		client, source = self.bysock.get(sock, (None, None))
+		if client:
+			self.cleanup(sock, client.name)
+
+		return source
+
+	def close(self, sock):
+		"""Close the client connection now, even if some data was not yet sent"""
+		client, source = self.bysock.get(sock, (None, None))
+		if client:
+			self.cleanup(sock, client.name)
+
+		return source
+
 	def cleanup(self, sock, name):
-		self.log.debug('cleanup for socket %s' % sock)
+		self.log.debug('cleanup for socket %s', sock)
 		client, source = self.bysock.get(sock, (None,None))
 		client, source = (client,None) if client else self.norequest.get(sock, (None,None))
 
 		self.bysock.pop(sock, None)
 		self.norequest.pop(sock, (None,None))
 		self.byname.pop(name, None)
+		self.timer.close(sock)
+		self.deadlines.close(sock)
 
 		if client:
 			self.poller.removeWriteSocket('write_client', client.sock)
@@ -334,4 +393,4 @@ class ClientManager (object):
 		self.bysock = {}
 		self.norequest = {}
 		self.byname = {}
-		self.buffered = []
+		self.buffered = set()
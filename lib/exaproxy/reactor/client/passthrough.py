@@ -11,6 +11,7 @@ import errno
 
 from exaproxy.network.functions import isipv4
 from exaproxy.network.errno_list import errno_block
+from exaproxy.util.buffer import WriteBuffer
 
 from exaproxy.util.proxy import ProxyProtocol
 
@@ -30,7 +31,7 @@ class PassthroughClient (object):
 		self.ipv4 = isipv4(addr)
 		self.reader = self._read(sock, max_buffer, proxied=proxied)
 		self.writer = self._write(sock)
-		self.w_buffer = ''
+		self.w_buffer = WriteBuffer()
 
 		self.log = logger
 
@@ -165,7 +166,7 @@ class PassthroughClient (object):
 					had_buffer = bool(w_buffer)
 
 					if data is not None:
-						w_buffer += data
+						w_buffer.append(data)
 					else:
 						# We've finished downloading, even if the client hasn't yet
 						finished = True
@@ -177,14 +178,10 @@ class PassthroughClient (object):
 							self.log.error('Tried to send data to client after we told it to close. Dropping it.')
 
 					if not had_buffer or data == '':
-						sent = sock.send(w_buffer)
-						#if sent:
-						#	self.log.debug(">> [%s]" % w_buffer[:sent].replace('\t','\\t').replace('\r','\\r').replace('\n','\\n'))
-						w_buffer = w_buffer[sent:]
+						sent = w_buffer.flush(sock)
 					else:
 						sent = 0
 
-					self.w_buffer = w_buffer
 					buffered = bool(w_buffer) or finished
 					data = yield buffered, had_buffer, sent if self.ipv4 else 0, 0 if self.ipv4 else sent
 
@@ -194,7 +191,6 @@ class PassthroughClient (object):
 				break
 
 			except socket.error, e:
-				self.w_buffer = w_buffer
 				if e.args[0] in errno_block:
 					self.log.debug('interrupted when trying to sent %d bytes, fine, will retry' % len(data))
 					self.log.debug('reason: errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
@@ -0,0 +1,90 @@
+# encoding: utf-8
+"""
+scanner.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+
+# what is left to match of '\n\n' or '\r\n\r\n' after we see a new line
+_newline = {
+	''        : '\n',
+	'\r'      : '\r\n',
+	'\n'      : None,     # '\n\n'
+	'\r\n'    : None,     # '\r\n\n', which contains '\n\n'
+	'\r\n\r'  : None,     # '\r\n\r\n'
+}
+
+
+class HeaderScanner (object):
+	"""Find the end of a request header block while it is being received
+
+	The scanner remembers where it stopped, the number of quotes seen and
+	any partially matched terminator, so the data is only scanned when it is
+	received, however small the reads are"""
+
+	__slots__ = ['offset', 'quotes', 'match']
+
+	def __init__ (self):
+		self.offset = 0    # the first byte not yet scanned
+		self.quotes = 0    # unescaped quotes seen so far, terminators are ignored within quotes
+		self.match = ''    # the end of the scanned data which could be the start of a terminator
+
+	def reset (self):
+		self.offset = 0
+		self.quotes = 0
+		self.match = ''
+
+	def _quotes (self, data, start, end):
+		# the unescaped quotes in data[start:end], counted without copying the data
+		quotes = data.count('"', start, end) - data.count('\\"', start, end)
+
+		if start and start < end and data[start] == '"' and data[start-1] == '\\':
+			quotes -= 1
+
+		return quotes
+
+	def _skip (self, data, start, end, match):
+		# the bytes in data[start:end] do not contain any new line
+		if end == start:
+			return match
+
+		if data[end-1] != '\r':
+			return ''
+
+		if end == start + 1 and match == '\r\n':
+			return '\r\n\r'
+
+		return '\r'
+
+	def scan (self, data, start=0):
+		"""return the position following the header terminator, or -1 if it was not yet received
+		data must be the same buffer as in the previous call, with the new data added to its end"""
+
+		offset = max(self.offset, start)
+		quotes = self.quotes
+		match = self.match
+
+		newline = data.find('\n', offset)
+
+		while newline != -1:
+			quotes += self._quotes(data, offset, newline)
+			match = _newline[self._skip(data, offset, newline, match)]
+			offset = newline + 1
+
+			if match is None:
+				if not quotes % 2:  # we have matching pairs
+					self.reset()
+					return offset
+
+				match = ''
+
+			newline = data.find('\n', offset)
+
+		# no complete terminator, remember how the data ends
+		end = len(data)
+
+		self.quotes = quotes + self._quotes(data, offset, end)
+		self.match = self._skip(data, offset, end, match)
+		self.offset = end
+		return -1
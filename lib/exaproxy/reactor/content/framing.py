@@ -0,0 +1,255 @@
+# encoding: utf-8
+"""
+framing.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+from collections import deque
+
+# http://tools.ietf.org/html/rfc7230#section-3.3.3
+# We only follow the message boundaries of what the server sends back,
+# recording the status and body size of each response (for the usage log
+# and the statistics). The data is never copied (except for the headers
+# and the chunk size lines) and we only give up when what is received is
+# not what we expected (the connection can then not be reused).
+
+MAX_HEADER_SIZE = 64*1024
+MAX_LINE_SIZE = 1024
+
+
+class ResponseFraming (object):
+	__slots__ = ['state', 'buffer', 'remaining', 'pending', 'reusable', 'code', 'size', 'responses']
+
+	def __init__ (self):
+		self.state = 'idle'       # where we are in the response
+		self.buffer = ''          # partial header or chunk size line
+		self.remaining = 0        # bytes of body (or chunk) still to come
+		self.pending = deque()    # one entry per request sent, True for HEAD requests
+		self.reusable = True      # False once we know the connection can not be used again
+		self.code = None          # the status of the response being received, once its header was
+		self.size = 0             # the bytes of its body received so far (without the chunk framing)
+		self.responses = []       # (status, body size) of the responses received since last collected
+
+	def request (self, method, length):
+		"""Record that a request was sent to the server"""
+		# we do not follow the request body, only allow reuse when there is none
+		if length != 0:
+			self.reusable = False
+
+		self.pending.append(method == 'HEAD')
+
+		if self.state == 'idle':
+			self.state = 'header'
+
+	def idle (self):
+		"""True if every response was fully received and the server expects a new request"""
+		return self.reusable and self.state == 'idle' and not self.pending
+
+	def completed (self):
+		"""The (status, body size) of the responses received since last called"""
+		responses, self.responses = self.responses, []
+		return responses
+
+	def close (self):
+		"""The connection was closed, the response being received (if any) ends here"""
+		if self.code is not None:
+			self.responses.append((self.code, self.size))
+			self.code = None
+			self.size = 0
+
+		self.state = 'lost'
+		self.reusable = False
+
+	def feed (self, data):
+		"""Follow the framing of the data received from the server"""
+		pos = 0
+		size = len(data)
+
+		while pos < size:
+			state = self.state
+
+			if state == 'body' or state == 'chunk-data':
+				consumed = min(self.remaining, size - pos)
+				self.remaining -= consumed
+				self.size += consumed
+				pos += consumed
+
+				if not self.remaining:
+					if state == 'body':
+						self._complete()
+					else:
+						self.state = 'chunk-end'
+
+			elif state == 'header':
+				pos = self._header(data, pos)
+
+			elif state == 'chunk-size':
+				line, pos = self._line(data, pos)
+				if line is None:
+					continue
+
+				try:
+					length = int(line.split(';', 1)[0].strip(), 16)
+				except ValueError:
+					self._unframed(size - pos)
+					break
+
+				if length:
+					self.remaining = length
+					self.state = 'chunk-data'
+				else:
+					self.state = 'trailer'
+
+			elif state == 'chunk-end':
+				line, pos = self._line(data, pos)
+				if line is None:
+					continue
+
+				if line.strip():
+					self._unframed(size - pos)
+					break
+
+				self.state = 'chunk-size'
+
+			elif state == 'trailer':
+				line, pos = self._line(data, pos)
+				if line is None:
+					continue
+
+				if not line.strip():
+					self._complete()
+
+			elif state == 'close':
+				# the body ends when the server closes the connection
+				self.size += size - pos
+				break
+
+			else:
+				# data we did not ask for, or what follows data we could not make sense of
+				self.state = 'lost'
+				self.reusable = False
+				break
+
+		return self.reusable
+
+	def _complete (self):
+		self.pending.popleft()
+		self.responses.append((self.code, self.size))
+		self.code = None
+		self.size = 0
+		self.state = 'header' if self.pending else 'idle'
+
+	def _unframed (self, left):
+		# the body is not framed as announced, what follows is counted as body until the connection is closed
+		self.size += left
+		self.state = 'close'
+		self.reusable = False
+
+	def _line (self, data, pos):
+		end = data.find('\n', pos)
+		if end == -1:
+			self.buffer += data[pos:]
+			if len(self.buffer) > MAX_LINE_SIZE:
+				self._unframed(len(self.buffer))
+				self.buffer = ''
+			return None, len(data)
+
+		line = self.buffer + data[pos:end]
+		self.buffer = ''
+		return line, end + 1
+
+	def _header (self, data, pos):
+		# only search the newly received data (and the few bytes before which could be part of the separator)
+		start = max(0, len(self.buffer) - 3)
+		buffer = self.buffer + data[pos:]
+
+		crlf = buffer.find('\r\n\r\n', start)
+		lf = buffer.find('\n\n', start)
+
+		if crlf != -1 and (lf == -1 or crlf < lf):
+			end = crlf + 4
+		elif lf != -1:
+			end = lf + 2
+		else:
+			self.buffer = buffer
+			if len(buffer) > MAX_HEADER_SIZE:
+				self.buffer = ''
+				self.state = 'lost'
+				self.reusable = False
+			return len(data)
+
+		consumed = end - len(self.buffer)
+		self.buffer = ''
+		self._parse(buffer[:end])
+
+		return pos + consumed
+
+	def _parse (self, header):
+		lines = header.split('\n')
+
+		try:
+			version, code = lines[0].split(None, 2)[:2]
+			code = int(code)
+		except ValueError:
+			self.state = 'lost'
+			self.reusable = False
+			return
+
+		length = None
+		chunked = False
+		tokens = set()
+
+		for line in lines[1:]:
+			if ':' not in line:
+				continue
+
+			key, value = line.split(':', 1)
+			key = key.strip().lower()
+
+			if key == 'content-length':
+				try:
+					length = int(value.strip())
+				except ValueError:
+					length = None
+					self.reusable = False
+
+			elif key == 'transfer-encoding':
+				chunked = value.strip().lower().endswith('chunked')
+
+			elif key == 'connection':
+				tokens.update(_.strip().lower() for _ in value.split(','))
+
+		if 100 <= code < 200:
+			# 100 continue and co. are followed by the real response, 101 hands the connection over
+			if code == 101:
+				self.code = code
+				self.state = 'close'
+				self.reusable = False
+			return
+
+		self.code = code
+
+		if 'close' in tokens:
+			self.reusable = False
+
+		elif version.upper() == 'HTTP/1.0' and 'keep-alive' not in tokens:
+			self.reusable = False
+
+		if self.pending[0] or code in (204, 304):
+			self._complete()
+
+		elif chunked:
+			self.state = 'chunk-size'
+
+		elif length is not None:
+			if length:
+				self.remaining = length
+				self.state = 'body'
+			else:
+				self._complete()
+
+		else:
+			# the end of the body is signaled by the server closing the connection
+			self.state = 'close'
+			self.reusable = False
@@ -7,13 +7,20 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 """
 
 import os
+import time
 import socket
-import struct
 
 from exaproxy.network.functions import isipv4,isipv6
+from exaproxy.network.splice import available as splice_available
 from exaproxy.util.log.logger import Logger
+from exaproxy.util.histogram import Histogram
 from exaproxy.http.response import http, file_header
 from .worker import Content
+from .pool import ConnectionPool
+from .race import Race
+from .security import Security
+from .template import Templates
+from .tunnel import Tunnel
 
 class ParsingError (Exception):
 	pass
@@ -27,45 +34,95 @@ class ContentManager(object):
 		self.opening = {}
 		self.established = {}
 		self.byclient = {}
-		self.buffered = []
+		self.buffered = set()
 		self.retry = []
 		self.configuration = configuration
 		self.supervisor = supervisor
 
 		self.poller = supervisor.poller
+		self.deadlines = supervisor.deadlines
+		self.timer = supervisor.timer
 		self.log = Logger('download', configuration.log.download)
 
 		self.location = os.path.realpath(os.path.normpath(configuration.web.html))
 		self.page = supervisor.page
 		self._header = {}
+		self._files = {}
+		self.templates = Templates()
+
+		# idle connections to web servers which can be used by other clients
+		self.pool = ConnectionPool(configuration)
+
+		# the addresses we must not connect to
+		self.security = Security(configuration)
+
+		# the servers with both an IPv6 and IPv4 address, being connected to, by client
+		self.racing = {}
+		self.fallback_delay = configuration.tcp6.fallback / 1000.0
+
+		# how long it took to connect to the servers and how many connections failed, by family
+		self.connecting = {'ipv4': Histogram(), 'ipv6': Histogram()}
+		self.failed = {'ipv4': 0, 'ipv6': 0}
+		self.fallbacks = 0
+
+		# the responses received from the web servers, by class of status, and the size of their bodies
+		self.responses = dict(('%dxx' % number, 0) for number in range(1, 6))
+		self.received = 0L
+
+		# tunnels relayed by the kernel, indexed by both their client and server socket
+		self.tunnels = {}
+		self.splice = configuration.daemon.splice and splice_available()
+
+		if configuration.daemon.splice and not self.splice:
+			self.log.info('splice is not available on this system, tunnels will be relayed by the proxy')
 
 	def hasClient (self, client):
 		return client in self.byclient
 
+	def _localFile (self, filename):
+		checked, version, fd = self._files.get(filename, (0, None, None))
+		now = time.time()
+
+		# the same few pages are served over and over during an outage, do not even stat them each time
+		if fd is not None and now - checked < 1:
+			return version, fd
+
+		try:
+			stat = os.stat(filename)
+		except OSError:
+			self._files.pop(filename, None)
+			return None, None
+
+		# clients still sending the previous version hold a reference to the old file
+		if fd is None or version != (stat.st_mtime, stat.st_size):
+			try:
+				fd = open(filename, 'rb')
+			except IOError:
+				self._files.pop(filename, None)
+				return None, None
+
+			version = stat.st_mtime, stat.st_size
+
+		self._files[filename] = now, version, fd
+		return version, fd
+
 	def getLocalContent (self, code, name):
 		filename = os.path.normpath(os.path.join(self.location, name))
 		if not filename.startswith(self.location + os.path.sep):
 			filename = ''
 
-		if os.path.isfile(filename):
-			try:
-				stat = os.stat(filename)
-			except IOError:
-				# NOTE: we are always returning an HTTP/1.1 response
-				content = 'close', http(501, 'local file is inaccessible %s' % str(filename))
-			else:
-				if filename in self._header :
-					cache_time, header = self._header[filename]
-				else:
-					cache_time, header = None, None
+		version, fd = self._localFile(filename) if filename else (None, None)
 
-				if cache_time is None or cache_time < stat.st_mtime:
-					header = file_header(code, stat.st_size)
-					self._header[filename] = stat.st_size, header
+		if fd is not None:
+			cache_version, header = self._header.get((code, filename), (None, None))
 
-				content = 'file', (header, filename)
+			if cache_version != version:
+				header = file_header(code, version[1])
+				self._header[(code, filename)] = version, header
+
+			content = 'file', (header, fd, version[1])
 		else:
-			self.log.debug('local file is missing for %s: %s' % (str(name), str(filename)))
+			self.log.debug('local file is missing for %s: %s', name, filename)
 			# NOTE: we are always returning an HTTP/1.1 response
 			content = 'close', http(501, 'could not serve missing file %s' % str(filename))
 
@@ -76,77 +133,93 @@ class ContentManager(object):
 		if not filename.startswith(self.location + os.path.sep):
 			filename = ''
 
-		if os.path.isfile(filename):
-			try:
-				with open(filename) as fd:
-					body = fd.read() % data
+		# NOTE: we are always returning an HTTP/1.1 response
+		response = self.templates.response(code, filename, data) if filename else None
 
-				# NOTE: we are always returning an HTTP/1.1 response
-				content = 'close', http(code, body)
-			except IOError:
-				self.log.debug('local file is missing for %s: %s' % (str(reason), str(filename)))
-				# NOTE: we are always returning an HTTP/1.1 response
-				content = 'close', http(501, 'could not serve missing file  %s' % str(reason))
+		if response is not None:
+			content = 'close', response
 		else:
-			self.log.debug('local file is missing for %s: %s' % (str(reason), str(filename)))
-				# NOTE: we are always returning an HTTP/1.1 response
+			self.log.debug('local file is missing for %s: %s', reason, filename)
 			content = 'close', http(501, 'could not serve missing file  %s' % str(reason))
 
 		return content
 
 
+	def _bind (self, host):
+		if isipv4(host):
+			return self.configuration.tcp4.bind
+
+		if isipv6(host):
+			return self.configuration.tcp6.bind
+
+		return None
+
+	def _permitted (self, host, port):
+		# deny connecton to the deny list
+		if self.security.denied(host):
+			return False
+
+		# supervisor.local is replaced when interface are changed, so do not cache or reference it in this class
+		if host in self.supervisor.local:
+			return self.security.allowed(host, port)
+
+		return True
+
+	def _open (self, client, addresses, port, command, request):
+		"""a connection to the first address we can connect to, the others are raced if it does not connect quickly"""
+		downloader = None
+
+		while addresses:
+			host = addresses.pop(0)
+			downloader = self.downloader_factory(client, host, port, self._bind(host), command, request, self.log)
+
+			if downloader.sock is not None:
+				break
+
+			self._connected(downloader, False)
+
+		if downloader is not None and downloader.sock is not None and addresses:
+			self.racing[client] = Race(downloader, addresses)
+			self.deadlines.start('fallback', client, self.fallback_delay)
+
+		return downloader
+
 	def getDownloader (self, client, host, port, command, request):
+		# the resolver gives both the IPv6 and IPv4 address of the servers which have them
+		addresses = list(host) if isinstance(host, tuple) else [host]
+
 		downloader = self.byclient.get(client, None)
 		if downloader:
 			# NOTE: with pipeline, consequent request could go to other sites if the browser knows we are a proxy
 			# NOTE: therefore the second request could reach the first site
 			# NOTE: and we could kill the connection before the data is fully back to the client
 			# NOTE: in practice modern browser are too clever and test for it !
-			if host != downloader.host or port != downloader.port:
+			if downloader.host not in addresses or port != downloader.port:
 				self.endClientDownload(client)
 				downloader = None
 			else:
 				newdownloader = False
 
-		if isipv4(host):
-			bind = self.configuration.tcp4.bind
-		elif isipv6(host):
-			bind = self.configuration.tcp6.bind
-		else:
+		if None in [self._bind(address) for address in addresses]:
 			# should really never happen
 			self.log.critical('the host IP address is neither IPv4 or IPv6 .. what year is it ?')
 			return None, False
 
 		if downloader is None:
-			if self.configuration.security.deny:
-				# deny connecton to the deny list
-				if ':' in host:
-					pr = 6
-					high,low = struct.unpack('!QQ',socket.inet_pton(socket.AF_INET6,host))
-					ip = (high << 64) + low
-				else:
-					pr = 4
-					ip = struct.unpack('!L',socket.inet_pton(socket.AF_INET,host))[0]
-
-				for proto, start, end in self.configuration.security.deny:
-					if pr != proto:
-						continue
-					if start <= ip <= end:
-						return None, False
-
-			# supervisor.local is replaced when interface are changed, so do not cache or reference it in this class
-			if host in self.supervisor.local:
-				for h,p in self.configuration.security.local:
-					if (h == '*' or h == host) and (p == '*' or p == port):
-						break
-				else:
-					# we did not break
-					return None, False
+			addresses = [address for address in addresses if self._permitted(address, port)]
+			if not addresses:
+				return None, False
+
+			downloader = self.pool.acquire(*[(address, port, self._bind(address)) for address in addresses]) if command == 'download' else None
+
+			if downloader is not None:
+				downloader.reuse(client, request)
+			else:
+				downloader = self._open(client, addresses, port, command, request)
 
-			downloader = self.downloader_factory(client, host, port, bind, command, request, self.log)
 			newdownloader = True
 
-		if downloader.sock is None:
+		if downloader is None or downloader.sock is None:
 			return None, False
 
 		return downloader, newdownloader
@@ -168,6 +241,8 @@ class ContentManager(object):
 						length = int(length) if length.isdigit() else length
 					else:
 						length = -1
+
+					downloader.expectResponse(request, length)
 				else:
 					content = self.getLocalContent('400', 'noconnect.html')
 					length = 0
@@ -270,7 +345,7 @@ class ContentManager(object):
 				length = 0
 
 		except ParsingError:
-			self.log.error('problem getting content %s %s' % (type(e),str(e)))
+			self.log.error('problem getting content %s %s', type(e), e)
 			downloader = None
 			newdownloader = False
 			request = ''
@@ -286,14 +361,18 @@ class ContentManager(object):
 
 			# register interest in the socket becoming available
 			self.poller.addWriteSocket('opening_download', downloader.sock)
+			self.deadlines.start('connect', client)
 
 		elif downloader is not None:
+			if downloader.method == 'download':
+				self.deadlines.start('response', client)
+
 			buffered,sent4,sent6 = downloader.writeData(request)
 			self.total_sent4 += sent4
 			self.total_sent6 += sent6
 			if buffered:
 				if downloader.sock not in self.buffered:
-					self.buffered.append(downloader.sock)
+					self.buffered.add(downloader.sock)
 					buffer_change = True
 					# watch for the socket's send buffer becoming less than full
 					self.poller.addWriteSocket('write_download', downloader.sock)
@@ -322,7 +401,103 @@ class ContentManager(object):
 		return content, length, buffered, buffer_change
 
 
+	def _connected (self, downloader, success):
+		# the connections taken from the pool were not timed
+		if downloader.started is None:
+			return
+
+		family = 'ipv4' if downloader.ipv4 else 'ipv6'
+
+		if success:
+			self.connecting[family].record(time.time() - downloader.started)
+		else:
+			self.failed[family] += 1
+
+	def _handover (self, client, downloader):
+		# the client data is now given to this connection
+		current = self.byclient.get(client, None)
+		if current is None or current is downloader:
+			return
+
+		self.byclient[client] = downloader
+
+		if current.sock in self.buffered:
+			self.buffered.remove(current.sock)
+			self.buffered.add(downloader.sock)
+
+	def _abandon (self, downloader):
+		# a connection which lost the race
+		self.opening.pop(downloader.sock, None)
+		self.poller.removeWriteSocket('opening_download', downloader.sock)
+
+		self.buffered.discard(downloader.sock)
+
+		downloader.shutdown()
+
+	def _attempt (self, client, race, model):
+		# connect to the next address, for the same request as the model
+		while race.addresses:
+			host = race.addresses.pop(0)
+			attempt = model.alternate(host, self._bind(host))
+
+			if attempt.sock is not None:
+				race.attempts.append(attempt)
+				self.opening[attempt.sock] = attempt
+				self.poller.addWriteSocket('opening_download', attempt.sock)
+				break
+
+			self._connected(attempt, False)
+
+		if race.addresses:
+			self.deadlines.start('fallback', client, self.fallback_delay)
+
+	def fallback (self, client):
+		"""the server did not connect within the fallback delay, try its next address"""
+		race = self.racing.get(client, None)
+		if race is not None and race.addresses:
+			self._attempt(client, race, race.attempts[0])
+
+	def _raced (self, race, downloader):
+		"""the connection to use, None while the other addresses are still being tried"""
+		client = downloader.client
+
+		if downloader.connected():
+			# the first connection established is used, the others are abandoned
+			del self.racing[client]
+			self._handover(client, downloader)
+
+			for attempt in race.attempts:
+				if attempt is not downloader:
+					self._abandon(attempt)
+
+			if downloader.host != race.first:
+				self.fallbacks += 1
+
+			return downloader
+
+		# this address does not work, try the next one now rather than after the delay
+		race.attempts.remove(downloader)
+		self._attempt(client, race, downloader)
+
+		if not race.attempts:
+			# none of the addresses worked, startDownload tells the client
+			del self.racing[client]
+			self._handover(client, downloader)
+			return downloader
+
+		self._connected(downloader, False)
+		self._handover(client, race.attempts[0])
+		self._abandon(downloader)
+		return None
+
 	def startDownload (self, sock):
+		downloader = self.opening.get(sock, None)
+		race = self.racing.get(downloader.client, None) if downloader else None
+
+		if race is not None and downloader in race.attempts:
+			if self._raced(race, downloader) is None:
+				return None, None, None
+
 		# shift the downloader to the other connected sockets
 		downloader = self.opening.pop(sock, None)
 		if downloader:
@@ -330,6 +505,12 @@ class ContentManager(object):
 
 			self.established[sock] = downloader
 			client, res, response = downloader.startConversation()
+			self._connected(downloader, res is True)
+			self.deadlines.stop('connect', client)
+
+			# the request was sent with the connection
+			if res is True and downloader.method == 'download':
+				self.deadlines.start('response', client)
 
 			# check to see if we were unable to connect
 			if res is not True:
@@ -351,27 +532,96 @@ class ContentManager(object):
 
 			buffer_change = downloader.sock in self.buffered
 
+			# the pooled connection was closed by the server before it got the request, as in readData
+			if res is not True and downloader.retry:
+				request = downloader.retry
+				self._terminate(sock, client)
+
+				if self.retryDownload(client, downloader, request) is not None:
+					response, buffer_change = None, False
+
 		else:
 			client, response, buffer_change = None, None, None
 
 		return client, response, buffer_change
 
-	def retryDownload (self, client, command, args):
-		return None
+	def abortConnection (self, client):
+		"""the server did not accept the connection in time, what to send to the client (None if it did connect)"""
+		downloader = self.byclient.get(client, None)
+		if downloader is None or downloader.sock not in self.opening:
+			return None
+
+		method = downloader.method
+		self._connected(downloader, False)
+		self._terminate(downloader.sock, client)
+
+		if method == 'intercept':
+			return ''
+
+		_, response = self.readLocalContent('400', 'noconnect.html')
+		return response
+
+	def retryDownload (self, client, downloader, request):
+		# the pooled connection was closed by the server before we got any response, open a new one
+		if downloader.ipv4:
+			bind = self.configuration.tcp4.bind
+		else:
+			bind = self.configuration.tcp6.bind
+
+		retry = self.downloader_factory(client, downloader.host, downloader.port, bind, 'download', request, self.log)
+		if retry.sock is None:
+			return None
+
+		retry.expectResponse(request, 0)
+		self.pool.retried += 1
+
+		self.opening[retry.sock] = retry
+		self.byclient[client] = retry
+
+		# register interest in the socket becoming available
+		self.poller.addWriteSocket('opening_download', retry.sock)
+		self.deadlines.start('connect', client)
+		return ''
 
 	def readData (self, sock):
 		downloader = self.established.get(sock, None)
 		if downloader:
 			client = downloader.client
+			retry = downloader.retry
 			data = downloader.readData()
 
 			if data is None:
 				self._terminate(sock, client)
+
+				if retry:
+					data = self.retryDownload(client, downloader, retry)
+
+			elif data:
+				self.deadlines.stop('response', client)
+				self.deadlines.start('idle', client)
+
+				if downloader.framing is not None:
+					self._responded(client, downloader.framing)
 		else:
 			client, data = None, None
 
 		return client, data
 
+	def _responded (self, client, framing):
+		# the status and body size of the responses, for the statistics and the usage log
+		if framing.responses:
+			for code, size in framing.completed():
+				name = '%dxx' % (code // 100)
+				if name in self.responses:
+					self.responses[name] += 1
+
+				self.received += size
+				self.timer.respond(client, code, size)
+
+		# the response still being received, in case the client goes away before its end
+		if framing.code is not None:
+			self.timer.respond(client, framing.code, framing.size)
+
 	def sendSocketData (self, sock, data):
 		downloader = self.established.get(sock, None)
 		if downloader:
@@ -380,9 +630,13 @@ class ContentManager(object):
 			self.total_sent6 += sent6
 			client = downloader.client
 
+			# the server can not answer before it got the whole request body
+			if sent4 or sent6:
+				self.deadlines.extend('response', client)
+
 			if buffered:
 				if sock not in self.buffered:
-					self.buffered.append(sock)
+					self.buffered.add(sock)
 					buffer_change = True
 
 					# watch for the socket's send buffer becoming less than full
@@ -414,10 +668,13 @@ class ContentManager(object):
 				self.total_sent4 += sent4
 				self.total_sent6 += sent6
 
+				if sent4 or sent6:
+					self.deadlines.extend('response', client)
+
 
 				if buffered:
 					if downloader.sock not in self.buffered:
-						self.buffered.append(downloader.sock)
+						self.buffered.add(downloader.sock)
 						buffer_change = True
 
 						# watch for the socket's send buffer becoming less than full
@@ -437,8 +694,15 @@ class ContentManager(object):
 
 			elif downloader.sock in self.opening:
 				buffered = downloader.bufferData(data)
+
+				# the connections racing to the other addresses of the server send the same data
+				race = self.racing.get(client, None)
+				if race is not None:
+					for attempt in race.attempts:
+						if attempt is not downloader:
+							attempt.bufferData(data)
 				if downloader.sock not in self.buffered:
-					self.buffered.append(downloader.sock)
+					self.buffered.add(downloader.sock)
 					buffer_change = True
 
 				else:
@@ -459,12 +723,174 @@ class ContentManager(object):
 	def endClientDownload (self, client):
 		downloader = self.byclient.get(client, None)
 		if downloader:
-			res = self._terminate(downloader.sock, client)
+			if downloader.sock in self.established and downloader.sock not in self.buffered and downloader.reusable():
+				res = self._release(downloader.sock, client)
+			else:
+				res = self._terminate(downloader.sock, client)
 		else:
 			res = False
 
 		return res
 
+	def _release (self, sock, client):
+		downloader = self.established.pop(sock)
+		self.byclient.pop(client, None)
+
+		# the pool does not watch idle connections, they are checked before being used again
+		self.poller.removeReadSocket('read_download', sock)
+
+		if downloader.ipv4:
+			bind = self.configuration.tcp4.bind
+		else:
+			bind = self.configuration.tcp6.bind
+
+		if not self.pool.release((downloader.host, downloader.port, bind), downloader):
+			downloader.shutdown()
+
+		return True
+
+	def expire (self, number=100):
+		return self.pool.expire(number)
+
+	def abortClient (self, client):
+		"""the client or its server was silent for too long, close the download or tunnel of the client"""
+		tunnel = self.tunnels.get(client, None)
+		if tunnel is not None:
+			self._endSplice(tunnel)
+			return True
+
+		return self.endClientDownload(client)
+
+	def startSplice (self, client):
+		downloader = self.byclient.get(client, None)
+		if not self.splice or downloader is None:
+			return False
+
+		# only tunnels are relayed as they are, and only once nothing is left buffered
+		if downloader.method not in ('connect', 'intercept'):
+			return False
+
+		sock = downloader.sock
+		if sock not in self.established or sock in self.buffered or downloader.w_buffer:
+			return False
+
+		try:
+			sock.getpeername()
+		except socket.error:
+			# we could not connect, the error page is being sent to the client
+			return False
+
+		try:
+			tunnel = Tunnel(client, downloader)
+		except OSError, e:
+			self.log.info('could not create the pipes to splice a tunnel: %s', e)
+			return False
+
+		self.established.pop(sock)
+		self.byclient.pop(client)
+		self.poller.removeReadSocket('read_download', sock)
+
+		self.tunnels[client] = tunnel
+		self.tunnels[sock] = tunnel
+
+		# from now on the data is read by the kernel from both sides
+		self.poller.addReadSocket('read_splice', client)
+		self.poller.addReadSocket('read_splice', sock)
+		return True
+
+	def readSplice (self, sock):
+		tunnel = self.tunnels.get(sock, None)
+		if tunnel is None:
+			return None, 0, None
+
+		relay = tunnel.reading(sock)
+		read = relay.read(64*1024)
+		sent = relay.flush()
+
+		# edge triggered, we will not be told again about the data left in the socket
+		while self.poller.edge and read and sent is not None and not relay.queued:
+			read = relay.read(64*1024)
+			flushed = relay.flush()
+			sent = sent + flushed if flushed is not None else None
+
+		if sent is None:
+			status = None
+
+		elif read is None:
+			if relay.finished and relay.queued:
+				# the source closed its connection, we still have data to send
+				status = True
+				self.poller.removeReadSocket('read_splice', sock)
+				self.poller.addWriteSocket('write_splice', relay.destination)
+			else:
+				status = None
+
+		elif relay.queued:
+			status = True
+
+			# do not read more until the destination took what we have
+			self.poller.corkReadSocket('read_splice', sock)
+			self.poller.addWriteSocket('write_splice', relay.destination)
+
+		else:
+			status = False
+
+		return self._spliced(tunnel, relay, sent, status)
+
+	def writeSplice (self, sock):
+		tunnel = self.tunnels.get(sock, None)
+		if tunnel is None:
+			return None, 0, None
+
+		relay = tunnel.writing(sock)
+		sent = relay.flush()
+
+		if sent is None:
+			status = None
+
+		elif relay.queued:
+			status = True
+
+		elif relay.finished:
+			status = None
+
+		else:
+			status = False
+
+			self.poller.removeWriteSocket('write_splice', sock)
+			self.poller.uncorkReadSocket('read_splice', relay.source)
+
+		return self._spliced(tunnel, relay, sent, status)
+
+	def _spliced (self, tunnel, relay, sent, status):
+		client = tunnel.client
+
+		if relay.destination is client:
+			to_client = sent or 0
+		else:
+			to_client = 0
+
+			if relay.ipv4:
+				self.total_sent4 += sent or 0
+			else:
+				self.total_sent6 += sent or 0
+
+		if status is None:
+			self._endSplice(tunnel)
+
+		elif sent:
+			self.deadlines.start('idle', client)
+
+		return client, to_client, status
+
+	def _endSplice (self, tunnel):
+		for sock in (tunnel.client, tunnel.downloader.sock):
+			self.tunnels.pop(sock, None)
+			self.poller.removeReadSocket('read_splice', sock)
+			self.poller.removeWriteSocket('write_splice', sock)
+
+		tunnel.close()
+
 	def corkClientDownload (self, client):
 		downloader = self.byclient.get(client, None)
 		if downloader:
@@ -477,6 +903,16 @@ class ContentManager(object):
 				self.poller.uncorkReadSocket('read_download', downloader.sock)
 
 	def _terminate (self, sock, client):
+		race = self.racing.pop(client, None)
+		if race is not None:
+			for attempt in race.attempts:
+				if attempt.sock is not sock:
+					self._abandon(attempt)
+
+		self.deadlines.stop('connect', client)
+		self.deadlines.stop('response', client)
+		self.deadlines.stop('fallback', client)
+
 		downloader = self.established.get(sock, None)
 		if downloader is None:
 			downloader = self.opening.get(sock, None)
@@ -499,6 +935,11 @@ class ContentManager(object):
 				# we no longer care about the socket's send buffer becoming less than full
 				self.poller.removeWriteSocket('write_download', downloader.sock)
 
+			# a response delimited by the connection close (or cut short) ends here
+			if downloader.framing is not None:
+				downloader.framing.close()
+				self._responded(client, downloader.framing)
+
 			downloader.shutdown()
 
 			res = True
@@ -516,13 +957,23 @@ class ContentManager(object):
 			for downloader in gen:
 				downloader.shutdown()
 
+		self.pool.stop()
+
+		for sock, tunnel in self.tunnels.items():
+			if sock is tunnel.client:
+				tunnel.close()
+
 		self.established = {}
 		self.opening = {}
 		self.byclient = {}
-		self.buffered = []
+		self.racing = {}
+		self.buffered = set()
+		self.tunnels = {}
 
 		self.poller.clearRead('read_download')
 		self.poller.clearWrite('write_download')
 		self.poller.clearWrite('opening_download')
+		self.poller.clearRead('read_splice')
+		self.poller.clearWrite('write_splice')
 
 		return True
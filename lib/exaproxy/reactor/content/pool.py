@@ -0,0 +1,115 @@
+# encoding: utf-8
+"""
+pool.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import time
+import socket
+
+from collections import OrderedDict
+
+from exaproxy.network.errno_list import errno_block
+
+
+class ConnectionPool (object):
+	"""Idle connections to web servers, kept open so that they can be used by another client"""
+
+	def __init__ (self, configuration):
+		self.maximum = configuration.pool.idle          # maximum number of idle connections
+		self.per_host = configuration.pool.per_host     # maximum number of idle connections to the same server
+		self.timeout = configuration.pool.timeout       # how long we keep an idle connection
+		self.enabled = configuration.pool.enable and self.maximum > 0 and self.per_host > 0
+
+		self.idle = OrderedDict()   # sock -> (time, key, downloader), oldest first
+		self.byhost = {}            # (host, port, bind) -> list of sockets, most recently used last
+
+		self.hit = 0
+		self.miss = 0
+		self.released = 0
+		self.expired = 0
+		self.retried = 0
+
+	def __len__ (self):
+		return len(self.idle)
+
+	def _remove (self, sock):
+		_, key, downloader = self.idle.pop(sock)
+
+		socks = self.byhost[key]
+		socks.remove(sock)
+		if not socks:
+			del self.byhost[key]
+
+		return downloader
+
+	def _alive (self, sock):
+		# the server may have closed the connection (or sent us something) while it was idle
+		try:
+			sock.recv(1, socket.MSG_PEEK)
+			return False
+		except socket.error, e:
+			return e.args[0] in errno_block
+
+	def acquire (self, *keys):
+		"""an idle connection to one of the servers, the keys are tried in order"""
+		if not self.enabled:
+			return None
+
+		for key in keys:
+			socks = self.byhost.get(key, None)
+
+			while socks:
+				downloader = self._remove(socks[-1])
+				if self._alive(downloader.sock):
+					self.hit += 1
+					return downloader
+
+				downloader.shutdown()
+				socks = self.byhost.get(key, None)
+
+		self.miss += 1
+		return None
+
+	def release (self, key, downloader):
+		if not self.enabled:
+			return False
+
+		socks = self.byhost.setdefault(key, [])
+
+		if len(socks) >= self.per_host:
+			self._remove(socks[0]).shutdown()
+			socks = self.byhost.setdefault(key, [])
+
+		elif len(self.idle) >= self.maximum:
+			self._remove(next(iter(self.idle))).shutdown()
+			socks = self.byhost.setdefault(key, [])
+
+		downloader.client = None
+		self.idle[downloader.sock] = time.time(), key, downloader
+		socks.append(downloader.sock)
+		self.released += 1
+		return True
+
+	def expire (self, number=100):
+		limit = time.time() - self.timeout
+		count = 0
+
+		while self.idle and count < number:
+			sock = next(iter(self.idle))
+			if self.idle[sock][0] > limit:
+				break
+
+			self._remove(sock).shutdown()
+			count += 1
+
+		self.expired += count
+		return count
+
+	def stop (self):
+		for _, _, downloader in self.idle.itervalues():
+			downloader.shutdown()
+
+		self.idle = OrderedDict()
+		self.byhost = {}
@@ -0,0 +1,20 @@
+# encoding: utf-8
+"""
+race.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+class Race (object):
+	"""The connections opened to the addresses of a web server for one client
+
+	The preferred address is tried first, the next one only if it did not
+	connect within the fallback delay (or failed): the first connection
+	established is used and the others are abandoned (RFC 8305)"""
+
+	__slots__ = ['first', 'attempts', 'addresses']
+
+	def __init__ (self, downloader, addresses):
+		self.first = downloader.host        # the preferred address
+		self.attempts = [downloader]        # the connections not yet established
+		self.addresses = addresses          # the addresses not yet tried
@@ -0,0 +1,85 @@
+# encoding: utf-8
+"""
+security.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import socket
+import struct
+
+from bisect import bisect_right
+
+# how many hosts we remember the verdict of
+VERDICTS = 10000
+
+
+def address (host):
+	"""the version and integer value of an IP address"""
+	if ':' in host:
+		high, low = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, host))
+		return 6, (high << 64) + low
+
+	return 4, struct.unpack('!L', socket.inet_pton(socket.AF_INET, host))[0]
+
+def merge (ranges):
+	"""the ranges (start, end) sorted, with the overlapping and adjacent ones joined, as two lists"""
+	starts, ends = [], []
+
+	for start, end in sorted(ranges):
+		if ends and start <= ends[-1] + 1:
+			if end > ends[-1]:
+				ends[-1] = end
+			continue
+
+		starts.append(start)
+		ends.append(end)
+
+	return starts, ends
+
+
+class Security (object):
+	"""Where the proxy is allowed to connect to
+
+	security.deny is compiled once into sorted, merged, ranges per IP version,
+	searched with bisect, and the verdict of the recent hosts is remembered.
+	security.local is a set of (host, port) where either can be '*'"""
+
+	def __init__ (self, configuration):
+		self.ranges = {}                # version -> starts, ends
+		for version in (4, 6):
+			self.ranges[version] = merge((start, end) for (proto, start, end) in configuration.security.deny if proto == version)
+
+		self.deny = bool(configuration.security.deny)
+		self.local = set(configuration.security.local)
+		self.verdicts = {}              # host -> denied
+
+	def _denied (self, host):
+		version, ip = address(host)
+		starts, ends = self.ranges[version]
+
+		index = bisect_right(starts, ip) - 1
+		return index >= 0 and ip <= ends[index]
+
+	def denied (self, host):
+		"""is the IP address in one of the security.deny ranges"""
+		if not self.deny:
+			return False
+
+		verdict = self.verdicts.get(host)
+
+		if verdict is None:
+			verdict = self._denied(host)
+
+			# forget them all rather than paying to know which were used last
+			if len(self.verdicts) >= VERDICTS:
+				self.verdicts.clear()
+
+			self.verdicts[host] = verdict
+
+		return verdict
+
+	def allowed (self, host, port):
+		"""can we connect to this port of one of our own addresses"""
+		local = self.local
+		return (host, port) in local or ('*', port) in local or (host, '*') in local or ('*', '*') in local
@@ -0,0 +1,136 @@
+# encoding: utf-8
+"""
+template.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import re
+import time
+
+from exaproxy.http.response import http_header
+
+# the details of the request a page can show, %(name)s, and %% for a %
+_FIELD = re.compile(r'%(?:\(([^()%]*)\)s|%)')
+
+
+class Template (object):
+	"""A local page, split once into its text and the fields filled for each response"""
+
+	__slots__ = ['text', 'first', 'fields']
+
+	def __init__ (self, text):
+		self.text = text
+		self.first = None   # the text before the first field
+		self.fields = None  # (name, text following the field), None if the page needs python formatting
+
+		literal = []
+		fields = []
+		name = None
+		position = 0
+
+		for match in _FIELD.finditer(text):
+			before = text[position:match.start()]
+			position = match.end()
+
+			# any other conversion is left to python
+			if '%' in before:
+				return
+
+			literal.append(before)
+
+			if match.group(1) is None:
+				literal.append('%')
+				continue
+
+			if name is None:
+				self.first = ''.join(literal)
+			else:
+				fields.append((name, ''.join(literal)))
+
+			name = match.group(1)
+			literal = []
+
+		after = text[position:]
+		if '%' in after:
+			return
+
+		literal.append(after)
+
+		if name is None:
+			self.first = ''.join(literal)
+		else:
+			fields.append((name, ''.join(literal)))
+
+		self.fields = fields
+
+	def render (self, data):
+		if self.fields is None:
+			return self.text % data
+
+		body = [self.first]
+
+		for name, literal in self.fields:
+			body.append(str(data[name]))
+			body.append(literal)
+
+		return ''.join(body)
+
+
+class Templates (object):
+	"""The local pages served for the rewrite decisions (dns.html, noconnect.html, ...)
+
+	They are read once and only read again when changed on disk, which is not
+	checked more than once a second: during an outage the same few pages are
+	served over and over, without any disk access"""
+
+	def __init__ (self):
+		self.pages = {}    # filename -> time checked, version, template
+		self.headers = {}  # code, encoding -> header with the date and length left to fill
+		self.date = 0, ''  # the second and the date header for it
+
+	def _page (self, filename):
+		checked, version, template = self.pages.get(filename, (0, None, None))
+		now = time.time()
+
+		if template is not None and now - checked < 1:
+			return template
+
+		try:
+			stat = os.stat(filename)
+		except OSError:
+			self.pages.pop(filename, None)
+			return None
+
+		if template is None or version != (stat.st_mtime, stat.st_size):
+			try:
+				with open(filename) as fd:
+					template = Template(fd.read())
+			except IOError:
+				self.pages.pop(filename, None)
+				return None
+
+			version = stat.st_mtime, stat.st_size
+
+		self.pages[filename] = now, version, template
+		return template
+
+	def response (self, code, filename, data):
+		"""the HTTP response with the page filled with data, None if the file can not be read"""
+		template = self._page(filename)
+		if template is None:
+			return None
+
+		body = template.render(data)
+		encoding = 'html' if body[:5].lower().startswith('<html') else 'plain'
+
+		header = self.headers.get((code, encoding), None)
+		if header is None:
+			header = self.headers[(code, encoding)] = http_header(code, encoding)
+
+		second = int(time.time())
+		if self.date[0] != second:
+			self.date = second, time.strftime('%c %Z')
+
+		return header % (self.date[1], len(body)) + body
@@ -0,0 +1,107 @@
+# encoding: utf-8
+"""
+tunnel.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import socket
+
+from exaproxy.network.splice import splice, pipe
+from exaproxy.network.splice import SPLICE_F_MOVE, SPLICE_F_NONBLOCK
+from exaproxy.network.errno_list import errno_block
+
+DEFAULT_PIPE_SIZE = 256*1024
+
+
+class Relay (object):
+	"""One direction of a tunnel, data is moved socket -> pipe -> socket without being copied to userspace"""
+
+	__slots__ = ['source', 'destination', 'reader', 'writer', 'queued', 'finished', 'ipv4']
+
+	def __init__ (self, source, destination, size):
+		self.source = source
+		self.destination = destination
+		self.reader, self.writer = pipe(size)
+		self.queued = 0          # bytes in the pipe not yet sent to the destination
+		self.finished = False    # the source closed its connection
+		self.ipv4 = destination.family == socket.AF_INET
+
+	def read (self, size):
+		"""Move data from the source into the pipe
+		return the number of bytes read, or None when the source is gone"""
+
+		try:
+			moved = splice(self.source.fileno(), self.writer, size, SPLICE_F_MOVE | SPLICE_F_NONBLOCK)
+		except (IOError, socket.error), e:
+			if e.args[0] in errno_block:
+				return 0
+			return None
+
+		if not moved:
+			self.finished = True
+			return None
+
+		self.queued += moved
+		return moved
+
+	def flush (self):
+		"""Move as much of the pipe content as the destination will take
+		return the number of bytes sent, or None if the destination is gone"""
+
+		sent = 0
+
+		# no SPLICE_F_MORE: all that is queued is sent, the kernel would otherwise hold back the end of it
+		while self.queued:
+			try:
+				moved = splice(self.reader, self.destination.fileno(), self.queued, SPLICE_F_MOVE | SPLICE_F_NONBLOCK)
+			except (IOError, socket.error), e:
+				if e.args[0] in errno_block:
+					break
+				return None
+
+			if not moved:
+				break
+
+			self.queued -= moved
+			sent += moved
+
+		return sent
+
+	def close (self):
+		for fd in (self.reader, self.writer):
+			try:
+				os.close(fd)
+			except OSError:
+				pass
+
+
+class Tunnel (object):
+	"""A client and a server connection relayed in the kernel using splice(2)"""
+
+	__slots__ = ['client', 'downloader', 'upload', 'download']
+
+	def __init__ (self, client, downloader, size=DEFAULT_PIPE_SIZE):
+		self.client = client
+		self.downloader = downloader
+		self.upload = Relay(client, downloader.sock, size)
+
+		try:
+			self.download = Relay(downloader.sock, client, size)
+		except OSError:
+			self.upload.close()
+			raise
+
+	def reading (self, sock):
+		"""the relay for which this socket is the source"""
+		return self.upload if sock is self.client else self.download
+
+	def writing (self, sock):
+		"""the relay for which this socket is the destination"""
+		return self.download if sock is self.client else self.upload
+
+	def close (self):
+		self.upload.close()
+		self.download.close()
+		self.downloader.shutdown()
@@ -9,9 +9,12 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 from exaproxy.network.functions import connect,isipv4
 from exaproxy.network.errno_list import errno_block
 from exaproxy.network.errno_list import errno_unavailable
+from exaproxy.util.buffer import WriteBuffer
+from .framing import ResponseFraming
 
 import socket
 import errno
+import time
 
 # http://tools.ietf.org/html/rfc2616#section-8.2.3
 # Says we SHOULD keep track of the server version and deal with 100-continue
@@ -23,7 +26,7 @@ DEFAULT_READ_BUFFER_SIZE = 64*1024
 class Content (object):
 	_connect = staticmethod(connect)
 
-	__slots__ = ['client', 'sock', 'host', 'port', 'method', 'w_buffer', 'log', 'ipv4']
+	__slots__ = ['client', 'sock', 'host', 'port', 'method', 'w_buffer', 'log', 'ipv4', 'framing', 'retry', 'started']
 
 	def __init__(self, client, host, port, bind, method, request, logger):
 		self.client = client
@@ -31,9 +34,50 @@ class Content (object):
 		self.host = host
 		self.port = port
 		self.method = method
-		self.w_buffer = request
+		self.w_buffer = WriteBuffer(request)
 		self.log = logger
 		self.ipv4 = isipv4(host)
+		self.framing = ResponseFraming() if method == 'download' else None
+		self.retry = ''
+		self.started = time.time()
+
+	def alternate(self, host, bind):
+		"""Another connection for the same request, to another address of the server"""
+		content = type(self)(self.client, host, self.port, bind, self.method, str(self.w_buffer), self.log)
+		content.framing = self.framing
+		content.retry = self.retry
+		return content
+
+	def connected(self):
+		"""True if the connection to the server was established"""
+		try:
+			return self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+		except socket.error:
+			return False
+
+	def reuse(self, client, request):
+		"""Hand an idle connection taken from the pool to a new client"""
+		self.client = client
+		# already connected, not timed
+		self.started = None
+		self.w_buffer.append(request)
+		# the server may close the connection before it sees the request, we can then send it again
+		self.retry = request
+
+	def expectResponse(self, request, length):
+		"""Follow the response the server will send back for this request"""
+		if self.framing is None:
+			return
+
+		# only a single request without body can safely be sent again
+		if self.framing.pending or length != 0 or not request.startswith(('GET ', 'HEAD ')):
+			self.retry = ''
+
+		self.framing.request(request.split(' ', 1)[0], length)
+
+	def reusable(self):
+		"""True if the connection could be used for another client"""
+		return self.framing is not None and not self.w_buffer and self.framing.idle()
 
 	def startConversation(self):
 		"""Send our buffered request to get the conversation flowing
@@ -56,10 +100,14 @@ class Content (object):
 			data = self.sock.recv(buflen) or None
 			#if data:
 			#	self.log.debug("<< [%s]" % data.replace('\t','\\t').replace('\r','\\r').replace('\n','\\n'))
+			if data and self.framing is not None:
+				self.retry = ''
+				self.framing.feed(data)
 		except socket.error, e:
 			if e.args[0] in errno_block:
-				self.log.info('interrupted when trying to read, will retry: got %s bytes' % len(data))
-				self.log.info('reason, errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
+				# expected when draining an edge triggered socket
+				self.log.debug('interrupted when trying to read, will retry: got %s bytes' % len(data))
+				self.log.debug('reason, errno %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '<no errno name>')))
 				data = ''
 			else:
 				#self.log.info('unexpected error reading on socket')
@@ -71,19 +119,16 @@ class Content (object):
 	def writeData(self, data):
 		"""Write data to the remote server"""
 
-		w_buffer = self.w_buffer + data
+		w_buffer = self.w_buffer
+		w_buffer.append(data)
 
 		try:
-			sent = self.sock.send(w_buffer)
-			#if sent:
-			#	self.log.debug(">> [%s]" % w_buffer[:sent].replace('\t','\\t').replace('\r','\\r').replace('\n','\\n'))
-			#self.log.info('sent %s of %s bytes of data. %s bytes were unbuffered : %s' % (sent, len(w_buffer), len(data), self.sock))
-			self.w_buffer = w_buffer[sent:]
-			res = bool(self.w_buffer)
+			sent = w_buffer.flush(self.sock)
+			#self.log.info('sent %s of %s bytes of data. %s bytes were unbuffered : %s' % (sent, len(w_buffer) + sent, len(data), self.sock))
+			res = bool(w_buffer)
 
 		except socket.error, e:
 			sent = 0
-			self.w_buffer = w_buffer
 
 			if e.args[0] in errno_block:
 				#self.log.error('Write failed as it would have blocked. Why were we woken up? Error %d: %s' % (e.args[0], errno.errorcode.get(e.args[0], '')))
@@ -97,7 +142,7 @@ class Content (object):
 
 	def bufferData(self, data):
 		"""Buffer data to be sent later"""
-		self.w_buffer += data
+		self.w_buffer.append(data)
 		return bool(self.w_buffer)
 
 	def shutdown(self):
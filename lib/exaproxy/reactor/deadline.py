@@ -0,0 +1,69 @@
+# encoding: utf-8
+"""
+deadline.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+from exaproxy.util.wheel import TimerWheel
+
+# how precise the deadlines are (the reactor is woken up this often when some are close)
+TICK = 0.025
+
+
+class Deadlines (object):
+	"""What the clients and their downloads are waiting for, and for how long
+
+	connect    the connection to the web server must be established
+	response   the web server must start answering the request sent
+	idle       data must be sent or received, by the client or its web server
+	fallback   the next address of the web server is tried (see content/race.py)
+
+	They are kept by (kind, client socket) in one timer wheel, the reactor
+	handles the deadlines which passed after each poll"""
+
+	def __init__ (self, configuration):
+		self.wheel = TimerWheel(TICK)
+		self.tick = TICK
+
+		# 0 for no deadline
+		self.delays = {
+			'connect': configuration.http.connect_timeout,
+			'response': configuration.http.response_timeout,
+			'idle': configuration.http.idle_transfer,
+		}
+
+		self.count = dict((kind, 0) for kind in self.delays)  # kind -> number of deadlines which passed
+
+	def start (self, kind, client, delay=None):
+		"""(re)start counting for client, for the configured delay if none is given"""
+		if delay is None:
+			delay = self.delays[kind]
+
+		if delay:
+			self.wheel.add((kind, client), delay)
+
+	def extend (self, kind, client):
+		"""start counting again for client, only if we already were"""
+		if (kind, client) in self.wheel:
+			self.wheel.add((kind, client), self.delays[kind])
+
+	def stop (self, kind, client):
+		self.wheel.remove((kind, client))
+
+	def close (self, client):
+		for kind in ('connect', 'response', 'idle', 'fallback'):
+			self.wheel.remove((kind, client))
+
+	def pending (self):
+		"""True if some deadlines will pass within a turn of the first wheel"""
+		return self.wheel.near > 0
+
+	def expired (self):
+		expired = self.wheel.expired()
+
+		for kind, _ in expired:
+			if kind in self.count:
+				self.count[kind] += 1
+
+		return expired
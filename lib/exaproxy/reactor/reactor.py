@@ -8,7 +8,12 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 
 # http://code.google.com/speed/articles/web-metrics.html
 
+import time
+
+from collections import defaultdict
+
 from exaproxy.util.log.logger import Logger
+from exaproxy.util.histogram import Histogram
 
 
 class StopReactor (Exception):
@@ -18,7 +23,7 @@ class StopReactor (Exception):
 class Reactor (object):
 	handlers = {}
 
-	def __init__(self, configuration, web, proxy, passthrough, icap, tls, decider, content, client, resolver, logger, usage, poller):
+	def __init__(self, configuration, web, proxy, passthrough, icap, tls, decider, content, client, resolver, logger, usage, timer, deadlines, poller, processes):
 		self.web = web                 # Manage listening web sockets
 		self.proxy = proxy             # Manage listening proxy sockets
 		self.passthrough = passthrough # Manage listening raw data sockets
@@ -31,9 +36,16 @@ class Reactor (object):
 		self.poller = poller           # Interface to the poller
 		self.logger = logger           # Log writing interfaces
 		self.usage = usage             # Request logging
+		self.timer = timer             # When each request went through each stage
+		self.deadlines = deadlines     # How long the clients and their downloads can wait
+		self.processes = processes     # The other reactor processes
+		self.drain = poller.edge       # Read and write until the sockets would block
+		self.speed = poller.speed      # Longest time the poller waits for events
 		self.nb_events = 0L            # Number of events received
 		self.nb_loops = 0L             # Number of loop iteration
 		self.events = []               # events so we can report them once in a while
+		self.latency = defaultdict(Histogram)  # time spent in each handler, the log writers and the whole loop
+		self.lag = 0.0                 # longest time spent handling one loop of events since the last interrupt
 
 		self.log = Logger('supervisor', configuration.log.supervisor)
 
@@ -160,6 +172,7 @@ class Reactor (object):
 				# status should be False - we're here because we flushed buffered data
 				if not status:    # No buffer
 					self.content.uncorkClientDownload(client)
+					self.spliceTunnel(client)
 
 				else:         # Buffering
 					self.content.corkClientDownload(client)
@@ -173,6 +186,8 @@ class Reactor (object):
 				self.client.uncorkUpload(client)
 
 			if client in self.client:
+				self.timer.stamp(client, 'connect')
+
 				if response:
 					status, buffer_change, name, source = self.client.sendData(client, response)
 					if status is None and client is not None:
@@ -197,36 +212,52 @@ class Reactor (object):
 						else:
 							self.content.uncorkClientDownload(client)
 
+				# the tunnel is established, let the kernel relay it if we can
+				self.spliceTunnel(client)
+
 	@register('read_download')
 	def incomingWebData (self, fetchers):
 		for fetcher in fetchers:
-			client, page_data = self.content.readData(fetcher)
+			draining = False
 
-			# send received data to the client that requested it
-			status, buffer_change, name, source = self.client.sendData(client, page_data)
+			while True:
+				client, page_data = self.content.readData(fetcher)
 
-			# check to see if the client went away
-			if status is None and client is not None:
-				# We just closed our connection to the client and need to count the disconnect.
-				if source == 'proxy':
-					self.proxy.notifyClose(client)
+				# we emptied the socket, there is nothing new for the client
+				if draining and page_data == '':
+					break
 
-				elif source == 'tls':
-					self.tls.notifyClose(client)
+				# send received data to the client that requested it
+				status, buffer_change, name, source = self.client.sendData(client, page_data)
 
-				elif source == 'passthrough':
-					self.passthrough.notifyClose(client)
+				# check to see if the client went away
+				if status is None and client is not None:
+					# We just closed our connection to the client and need to count the disconnect.
+					if source == 'proxy':
+						self.proxy.notifyClose(client)
+
+					elif source == 'tls':
+						self.tls.notifyClose(client)
 
-				if page_data is not None:
-					# The client disconnected? Close our connection to the remote webserver.
-					# We'll be notified of the client disconnect so don't count it here
-					self.content.endClientDownload(client)
+					elif source == 'passthrough':
+						self.passthrough.notifyClose(client)
 
-			elif buffer_change:
-				# status should be true here - we don't read from the server when buffering
-				if status:      # Buffering
+					if page_data is not None:
+						# The client disconnected? Close our connection to the remote webserver.
+						# We'll be notified of the client disconnect so don't count it here
+						self.content.endClientDownload(client)
+
+				elif status and (buffer_change or self.drain):
+					# we don't read from the server when buffering
+					# an edge triggered socket must be corked for the data left in it to be reported once uncorked
 					self.content.corkClientDownload(client)
 
+				# edge triggered, we will not be told again about the data left in the socket
+				if not self.drain or not page_data or status is not False:
+					break
+
+				draining = True
+
 	@register('write_download')
 	def flushWebOutput (self, fetchers):
 		for fetcher in fetchers:
@@ -238,40 +269,85 @@ class Reactor (object):
 
 				else:
 					self.client.uncorkUpload(client)
+					self.spliceTunnel(client)
+
+	def spliceTunnel (self, client):
+		if self.client.canSplice(client) and self.content.startSplice(client):
+			self.client.startSplice(client)
+
+	def updateTunnel (self, client, sent, status):
+		if sent:
+			self.client.accountSplice(client, sent)
+
+		if status is None and client is not None:
+			source = self.client.endSplice(client)
+			self.closeClient(client, source)
+
+	@register('read_splice')
+	def relayTunnelData (self, socks):
+		for sock in socks:
+			client, sent, status = self.content.readSplice(sock)
+			self.updateTunnel(client, sent, status)
+
+	@register('write_splice')
+	def flushTunnelData (self, socks):
+		for sock in socks:
+			client, sent, status = self.content.writeSplice(sock)
+			self.updateTunnel(client, sent, status)
 
 
 	@register('read_redirector')
 	def readRedirector (self, deciders):
 		for decider in deciders:
-			name, command, decision = self.decider.getDecision()
-			client = self.client.lookupSocket(name)
+			decisions = self.decider.getDecisions()
 
-			if command is None:
+			if decisions is None:
 				# if the redirector process disappears then we must close the proxy
 				raise StopReactor
 
-			# check that the client didn't get bored and go away
-			if client is not None:
-				if self.resolver.resolves(command, decision):
-					identifier, response = self.resolver.startResolving(client, command, decision)
-					if response:
-						_client, command, decision = response[0], response[1], response[2:]
-						yield client, command, decision
+			for name, command, decision in decisions:
+				client = self.client.lookupSocket(name)
 
-					# something went wrong
-					elif identifier is None:
-						command, decision = self.decider.showInternalError()
+				if command is None:
+					raise StopReactor
+
+				# check that the client didn't get bored and go away
+				if client is not None:
+					self.timer.decide(client, command, decision)
+
+					if self.resolver.resolves(command, decision):
+						identifier, response = self.resolver.startResolving(client, command, decision)
+						if response:
+							self.timer.stamp(client, 'dns')
+							_client, command, decision = response[0], response[1], response[2:]
+							yield client, command, decision
+
+						# something went wrong
+						elif identifier is None:
+							command, decision = self.decider.showInternalError()
+							yield client, command, decision
+
+					else:
 						yield client, command, decision
 
-				else:
-					yield client, command, decision
+	@register('write_redirector')
+	def flushRedirector (self, pipes):
+		if not self.decider.flushRequests():
+			raise StopReactor
+
+	@register('read_reactor')
+	def readReactorStatistics (self, pipes):
+		for pipe in pipes:
+			if not self.processes.receive(pipe):
+				# if one of the other reactor processes disappears then we must close the proxy
+				raise StopReactor
 
 	@register('read_resolver')
 	def readResolver (self, resolvers):
 		for resolver in resolvers:
-			response = self.resolver.getResponse(resolver)
-			if response:
+			for response in self.resolver.getResponse(resolver):
 				client, command, decision = response[0], response[1], response[2:]
+				self.timer.stamp(client, 'dns')
 				yield client, command, decision
 
 	@register('write_resolver')
@@ -283,6 +359,7 @@ class Reactor (object):
 		timedout = self.resolver.cleanup()
 
 		for client, command, decision in timedout:
+			self.timer.stamp(client, 'dns')
 			yield client, command, decision
 
 	def enactDecisions (self, decisions):
@@ -317,6 +394,33 @@ class Reactor (object):
 				self.closeClient(client, source)
 
 
+	def expireDeadlines (self):
+		for kind, client in self.deadlines.expired():
+			if kind == 'fallback':
+				self.content.fallback(client)
+				continue
+
+			if kind == 'connect':
+				# as when the connection fails, the client is sent noconnect.html
+				response = self.content.abortConnection(client)
+				if response is None:
+					continue
+
+				if response:
+					self.client.sendData(client, response)
+
+				status, buffer_change, name, source = self.client.sendData(client, None)
+				if status is None and name is not None:
+					self.closeClient(client, source)
+
+			else:
+				# the server did not answer or nothing moved for too long, data left to send is dropped
+				self.content.abortClient(client)
+				source = self.client.close(client)
+
+				if source is not None:
+					self.closeClient(client, source)
+
 	def handle (self, event, interfaces):
 		handler = self.handlers.get(event, None)
 		if not handler:
@@ -339,23 +443,62 @@ class Reactor (object):
 		self.resolver.expireCache()
 
 
+		latency = self.latency
+		deadlines = self.deadlines
+		self.lag = 0.0
+
 		try:
 			while True:
+				# do not sleep past the deadlines which are close
+				poller.speed = deadlines.tick if deadlines.pending() else self.speed
+
 				# wait until we have something to do
 				events = poller.poll()
 				self.events = events
 
 				self.nb_loops += 1
+				start = time.time()
 
 				for event, interfaces in events.items():
 					self.nb_events += len(interfaces)
 
-					decisions = self.handle(event, interfaces) if interfaces else []
+					if not interfaces:
+						continue
+
+					begin = time.time()
+
+					decisions = self.handle(event, interfaces)
 					if decisions:
 						self.enactDecisions(decisions)
 
+					latency[event].record(time.time() - begin)
+
+				# the clients and downloads which waited for too long, checked once per tick
+				begin = time.time()
+				self.expireDeadlines()
+				latency['deadlines'].record(time.time() - begin)
+
+				# the requests queued for the redirector process while handling the events
+				begin = time.time()
+				if not self.decider.flushRequests():
+					raise StopReactor
+				latency['flush_redirector'].record(time.time() - begin)
+
+				begin = time.time()
 				self.logger.writeMessages()
+				latency['write_log'].record(time.time() - begin)
+
+				begin = time.time()
 				self.usage.writeMessages()
+				end = time.time()
+				latency['write_usage'].record(end - begin)
+
+				# how long the sockets which became ready during this loop had to wait for us
+				lag = end - start
+				latency['loop'].record(lag)
+
+				if lag > self.lag:
+					self.lag = lag
 
 				received_interrupts = {k for k in interrupt_events if events.get(k)}
 				if received_interrupts:
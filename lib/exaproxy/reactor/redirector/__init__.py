@@ -7,11 +7,8 @@ from .supervisor import RedirectorSupervisor
 from .messagebox import ProxyToRedirectorMessageBox, RedirectorToProxyMessageBox
 from .dispatch import RedirectorDispatcher
 
-def redirector_message_thread (message_box):
-	dispatcher = RedirectorDispatcher(message_box)
-	dispatcher.start()
-
-	return dispatcher
+def redirector_dispatcher (poller, message_box):
+	return RedirectorDispatcher(message_box, poller)
 	
 
 def fork_redirector (poller, configuration):
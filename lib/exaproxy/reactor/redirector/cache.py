@@ -0,0 +1,73 @@
+# encoding: utf-8
+"""
+cache.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+try:
+	from collections import OrderedDict
+except ImportError:
+	# support installable ordereddict module in older python versions
+	from ordereddict import OrderedDict
+
+from time import time
+
+
+class VerdictCache (object):
+	"""The decisions of the url programs, so the same request is not asked again
+
+	The decisions are indexed by a projection of the request (the url, the host
+	or the host and the client), kept for a TTL (given by the program or our
+	default) and the least recently used are forgotten when the cache is full"""
+
+	def __init__ (self, projection, size, ttl):
+		self.projection = projection  # what part of the request the decision applies to
+		self.size = size              # how many decisions we keep
+		self.ttl = ttl                # how long a decision is kept unless the program says otherwise
+
+		self.entries = OrderedDict()  # key -> verdict, expire time (least recently used first)
+
+		self.hit = 0
+		self.miss = 0
+
+	def __len__ (self):
+		return len(self.entries)
+
+	def key (self, message, peer):
+		# a program may allow a host but not CONNECT to it
+		connect = message.request.method == 'CONNECT'
+
+		if self.projection == 'url':
+			return connect, message.url
+
+		if self.projection == 'host':
+			return connect, message.host
+
+		return connect, message.host, peer
+
+	def get (self, key):
+		"""the classification, data and comment given for the key, or None"""
+		entry = self.entries.pop(key, None)
+
+		if entry is None or entry[1] <= time():
+			self.miss += 1
+			return None
+
+		# most recently used
+		self.entries[key] = entry
+		self.hit += 1
+		return entry[0]
+
+	def set (self, key, verdict, ttl=None):
+		if ttl is None:
+			ttl = self.ttl
+
+		if ttl <= 0:
+			return
+
+		self.entries.pop(key, None)
+		self.entries[key] = verdict, time() + ttl
+
+		while len(self.entries) > self.size:
+			self.entries.popitem(last=False)
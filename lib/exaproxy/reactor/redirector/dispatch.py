@@ -1,39 +1,17 @@
-from threading import Thread
-from exaproxy.util.messagequeue import Queue
-
-
-class DispatcherThread (Thread):
-	def __init__ (self, messagebox, queue):
-		self.messagebox = messagebox
-		self.queue = queue
-		Thread.__init__(self)
-
-	def run (self):
-		while True:
-			command, message = self.queue.get()
-
-			if command == 'REQUEST':
-				self.messagebox.box.put(message)
-				continue
-
-			if command == 'STOP':
-				break
-
-
 class RedirectorDispatcher (object):
-	dispatcher_factory = DispatcherThread
+	"""Send the requests to the redirector process from the reactor itself
 
-	def __init__ (self, messagebox):
-		self.messagebox = messagebox
-		self.queue = Queue()
-		self.thread = self.dispatcher_factory(messagebox, self.queue)
+	The requests are queued and written once per reactor loop, without blocking.
+	What the pipe does not accept is kept and the pipe is polled for write readiness
+	until it is all sent"""
 
-	def start (self):
-		self.thread.start()
+	def __init__ (self, messagebox, poller):
+		self.messagebox = messagebox
+		self.poller = poller
+		self.pipe = messagebox.box.pipe_out
+		self.polling = False  # are we waiting for the pipe to be writable
 
 	def stop (self):
-		self.queue.put(('STOP', ''))
-		self.thread.join()
 		try:
 			res = self.messagebox.stop()
 		except IOError:
@@ -42,11 +20,28 @@ class RedirectorDispatcher (object):
 		return res
 
 	def sendRequest (self, client_id, accept_addr, accept_port, peer, request, subrequest, source):
-		message = client_id, accept_addr, accept_port, peer, request, subrequest, source
-		return self.queue.put(('REQUEST', message))
+		return self.messagebox.sendRequest(client_id, accept_addr, accept_port, peer, request, subrequest, source)
+
+	def flushRequests (self):
+		"""write what the pipe accepts of the queued requests, False if the redirector process is gone"""
+		try:
+			sent = self.messagebox.flushRequests()
+		except (OSError, ValueError):  # broken pipe or I/O operation on closed file
+			return False
+
+		if sent:
+			if self.polling:
+				self.poller.removeWriteSocket('write_redirector', self.pipe)
+				self.polling = False
+
+		elif not self.polling:
+			self.poller.addWriteSocket('write_redirector', self.pipe)
+			self.polling = True
+
+		return True
 
-	def getDecision (self):
-		return self.messagebox.getDecision()
+	def getDecisions (self):
+		return self.messagebox.getDecisions()
 
 	def respawn (self):
 		return self.messagebox.respawn()
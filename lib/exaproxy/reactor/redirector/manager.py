@@ -9,6 +9,8 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 import sys
 import time
 
+from collections import deque
+
 from exaproxy.util.messagequeue import Queue
 
 from .redirector import RedirectorFactory
@@ -30,8 +32,9 @@ class RedirectorManager (object):
 		self.worker = {}        # worker tasks for each spawned child
 		self.processes = {}     # worker tasks indexed by file descriptors we can poll
 		self.available = set()  # workers that are currently available to handle new requests
-		self.active = {}        # workers that are currently busy waiting for a response from the spawned process
+		self.active = {}        # workers waiting for responses from the spawned process (channel ID -> request)
 		self.stopping = set()   # workers we want to stop as soon as they stop being active
+		self.closing = deque()  # clients whose request was lost twice with a worker, to be answered
 
 		enabled = configuration.redirector.enable
 		program = configuration.redirector.program
@@ -87,21 +90,23 @@ class RedirectorManager (object):
 
 		if wid not in self.active:
 			self.log.info('worker %s is not active, killing it' % wid)
-			self.reap(wid)
+			self.requeue(self.reap(wid))
 		else:
 			self.log.info('worker %s is active, stopping it' % wid)
 			self.stopping.add(wid)
 
 	def reap (self, wid):
+		"""stop the worker, returns the requests it was still working on"""
 		self.log.info('we are killing worker %s' % wid)
 
 		if wid not in self.worker:
 			self.log.info('worker %s is already stopped' % wid)
-			return
+			return []
 
-		if wid in self.active:
+		requests = self.active.pop(wid, {}).values()
+
+		if requests:
 			self.log.error('reaping worker %s even though it is still active' % wid)
-			self.active.pop(wid)
 
 		if wid in self.stopping:
 			self.stopping.remove(wid)
@@ -116,6 +121,15 @@ class RedirectorManager (object):
 			self.processes.pop(worker.process.stdout)
 
 		worker.shutdown()
+		return requests
+
+	def requeue (self, requests):
+		"""give the requests of a worker we reaped to the other workers, closing those already retried"""
+		for client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted in requests:
+			if tainted is False:
+				self.queue.put((client_id, accept_addr, accept_port, peer, header, subheader, source, True))
+			else:
+				self.closing.append(client_id)
 
 	def _decrease (self):
 		if self.low < len(self.worker):
@@ -221,19 +235,43 @@ class RedirectorManager (object):
 			return
 
 		if wid in self.stopping:
-			self.log.info('worker %s is to be stopped, killing it' % wid)
-			self.reap(wid)
-		else:
+			if wid not in self.active:
+				self.log.info('worker %s is to be stopped, killing it' % wid)
+				self.reap(wid)
+
+		# a worker using channel IDs can take more requests while it works on others
+		elif len(self.active.get(wid, ())) < self.worker[wid].concurrency:
 			self.available.add(wid)
 
-	def persist (self, wid, client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted):
-		self.active[wid] = client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted
+	def persist (self, wid, channel, client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted):
+		self.active.setdefault(wid, {})[channel] = client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted
+
+	def progress (self, wid, channel):
+		requests = self.active.get(wid, {})
+		request = requests.pop(channel, None)
 
-	def progress (self, wid):
-		return self.active.pop(wid)
+		if not requests:
+			self.active.pop(wid, None)
+
+		return request
+
+	def retry (self, request):
+		client_id, accept_addr, accept_port, peer, data, header, subheader, source, tainted = request
+
+		if tainted is False:
+			_, command, decision = self.request(client_id, accept_addr, accept_port, peer, header, subheader, source, tainted=True)
+		else:
+			_, command, decision = Respond.close(client_id)
+
+		return client_id, command, decision
+
+	def pending (self):
+		return bool(self.closing) or (bool(self.available) and not self.queue.isempty())
 
 	def doqueue (self):
-		if self.available and not self.queue.isempty():
+		if self.closing:
+			client_id, command, decision = Respond.close(self.closing.popleft())
+		elif self.available and not self.queue.isempty():
 			client_id, accept_addr, accept_port, peer, header, subheader, source, tainted = self.queue.get()
 			_, command, decision = self.request(client_id, accept_addr, accept_port, peer, header, subheader, source, tainted=tainted)
 		else:
@@ -251,7 +289,7 @@ class RedirectorManager (object):
 
 			if command is None:
 				self.log.info('request failed for worker %s' % worker.wid)
-				self.reap(worker.wid)
+				self.requeue(self.reap(worker.wid))
 
 				if tainted is False:
 					_, command, decision = self.request(client_id, accept_addr, accept_port, peer, header, subheader, source, tainted=True)
@@ -262,21 +300,57 @@ class RedirectorManager (object):
 			self.queue.put((client_id, accept_addr, accept_port, peer, header, subheader, source, tainted))
 
 		if command == 'defer':
-			self.persist(worker.wid, client_id, accept_addr, accept_port, peer, decision, header, subheader, source, tainted)
+			self.persist(worker.wid, worker.channel, client_id, accept_addr, accept_port, peer, decision, header, subheader, source, tainted)
 			command, decision = None, None
 
-		elif worker is not None:
+		if worker is not None:
 			self.release(worker.wid)
 
 		return client_id, command, decision
 
+	def getDecisions (self, worker):
+		responses = worker.readChildResponses() if worker.checkChild() else None
+
+		# the child is gone, the requests it was working on are given to other workers
+		if responses is None:
+			self.log.info('reaping worker %s as its process stopped' % worker.wid)
+			requests = self.reap(worker.wid)
+			return [self.retry(request) for request in requests]
+
+		decisions = []
+
+		for channel, response_s in responses:
+			request = self.progress(worker.wid, channel)
+			if request is None:
+				self.log.info('worker %s answered on channel %d, which has no request' % (worker.wid, channel))
+				continue
+
+			worker.freeChannel(channel)
+			client_id, accept_addr, accept_port, peer, message, header, subheader, source, tainted = request
+
+			try:
+				_, command, decision = worker.respond(client_id, accept_addr, accept_port, peer, message, header, subheader, source, response_s)
+			except Exception, e:
+				self.log.info('worker issue: %s' % str(e))
+				command, decision = None, None
+
+			# other requests are in flight with this child, do not reap it for one bad answer
+			decisions.append(self.retry(request) if command is None else (client_id, command, decision))
+
+		self.release(worker.wid)
+		return decisions
+
 	def getDecision (self, pipe_in):
 		worker = self.processes.get(pipe_in, None)
 
+		if worker is not None and worker.concurrency > 1:
+			return self.getDecisions(worker)
+
 		if worker is not None and worker.wid in self.active:
-			client_id, accept_addr, accept_port, peer, request, header, subheader, source, tainted = self.progress(worker.wid)
+			request = self.progress(worker.wid, None)
+			client_id, accept_addr, accept_port, peer, message, header, subheader, source, tainted = request
 			try:
-				_, command, decision = worker.progress(client_id, accept_addr, accept_port, peer, request, header, subheader, source)
+				_, command, decision = worker.progress(client_id, accept_addr, accept_port, peer, message, header, subheader, source)
 			except Exception, e:
 				self.log.info('worker issue: %s' % str(e))
 				command, decision = None, None
@@ -286,11 +360,7 @@ class RedirectorManager (object):
 			if command is None:
 				self.log.info('reaping worker %s due to command' % worker.wid)
 				self.reap(worker.wid)
-
-				if tainted is False:
-					_, command, decision = self.request(client_id, accept_addr, accept_port, peer, header, subheader, source, tainted=True)
-				else:
-					_, command, decision = Respond.close(client_id)
+				_, command, decision = self.retry(request)
 		else:
 			client_id, command, decision = None, None, None
 
@@ -298,7 +368,7 @@ class RedirectorManager (object):
 			self.log.info('reaping worker %s due to client id' % worker.wid)
 			self.reap(worker.wid)
 
-		return client_id, command, decision
+		return [(client_id, command, decision)]
 
 	def showInternalError(self):
 		return 'file', ('200', 'internal_error.html')
@@ -6,15 +6,22 @@ Created by David Farrar on 2014-06-10 (or earlier).
 Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 """
 
-from exaproxy.util.messagebox import MessageBox
+import os
+import fcntl
+
+from exaproxy.util.messagebox import FrameBox
 from exaproxy.util.control import ControlBox
 
 class ProxyToRedirectorMessageBox:
 	def __init__ (self, pid, pipe_in, pipe_out, control_in, control_out):
 		self.pid = pid
-		self.box = MessageBox(pipe_in, pipe_out)
+		self.box = FrameBox(pipe_in, pipe_out)
 		self.control = ControlBox(control_in, control_out)
 
+		# the reactor must never wait for the redirector process to read its requests
+		flags = fcntl.fcntl(pipe_out, fcntl.F_GETFL)
+		fcntl.fcntl(pipe_out, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
 	def close (self):
 		return self.box.close()
 
@@ -22,15 +29,13 @@ class ProxyToRedirectorMessageBox:
 		message = client_id, accept_addr, accept_port, peer, request, subrequest, source
 		return self.box.put(message)
 
-	def getDecision (self):
-		message = self.box.get()
-		if message is not None:
-			client_id, command, decision = message
+	def flushRequests (self):
+		"""write the requests queued without blocking, True if none are left"""
+		return self.box.send()
 
-		else:
-			client_id, command, decision = None, None, None
-
-		return client_id, command, decision
+	def getDecisions (self):
+		"""the (client_id, command, decision) received, None if the redirector process is gone"""
+		return self.box.read()
 
 	def stop (self):
 		self.control.send('STOP')
@@ -55,7 +60,7 @@ class ProxyToRedirectorMessageBox:
 
 class RedirectorToProxyMessageBox:
 	def __init__ (self, pipe_in, pipe_out):
-		self.box = MessageBox(pipe_in, pipe_out)
+		self.box = FrameBox(pipe_in, pipe_out)
 
 	def close (self):
 		return self.box.close()
@@ -63,9 +68,14 @@ class RedirectorToProxyMessageBox:
 	def isClosed (self):
 		return self.box.pipe_in.closed
 
-	def getRequest (self):
-		return self.box.get()
+	def getRequests (self):
+		"""the requests received, None if the proxy is gone"""
+		return self.box.read()
 
 	def sendResponse (self, client_id, command, decision):
 		message = client_id, command, decision
 		return self.box.put(message)
+
+	def flush (self):
+		"""write all the responses given to sendResponse"""
+		return self.box.flush()
@@ -36,6 +36,8 @@ class RedirectorReactor (object):
 			self.querier.sendResponse(client_id, command, decision)
 			client_id, command, decision = self.decider.doqueue()
 
+		self.querier.flush()
+
 		while self.running:
 			# wait until we have something to do
 			events = self.poller.poll()
@@ -46,32 +48,35 @@ class RedirectorReactor (object):
 			# new requests
 			if events.get('read_request'):
 				try:
-					message = self.querier.getRequest()
+					messages = self.querier.getRequests()
 				except Exception:
-					message = None
+					messages = None
 
-				if message is None:
+				if messages is None:
 					return False
 
-				client_id, accept_addr, accept_port, peer, header, subheader, source = message
-				_, command, decision = self.decider.request(client_id, accept_addr, accept_port, peer, header, subheader, source)
+				for client_id, accept_addr, accept_port, peer, header, subheader, source in messages:
+					_, command, decision = self.decider.request(client_id, accept_addr, accept_port, peer, header, subheader, source)
 
-				if command is not None:
-					self.querier.sendResponse(client_id, command, decision)
+					if command is not None:
+						self.querier.sendResponse(client_id, command, decision)
 
 			# decisions made by the child processes
 			for worker in events.get('read_workers', []):
-				client_id, command, decision = self.decider.getDecision(worker)
-				if command is not None:
-					self.querier.sendResponse(client_id, command, decision)
+				for client_id, command, decision in self.decider.getDecision(worker):
+					if command is not None:
+						self.querier.sendResponse(client_id, command, decision)
 
 			# we should have available workers now so check for queued requests
-			for worker in events.get('read_workers', []):
+			while self.decider.pending():
 				client_id, command, decision = self.decider.doqueue()
 
 				if command is not None:
 					self.querier.sendResponse(client_id, command, decision)
 
+			# all the decisions made in this loop are sent together
+			self.querier.flush()
+
 			self.logger.writeMessages()
 			self.usage.writeMessages()
 
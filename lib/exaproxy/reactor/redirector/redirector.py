@@ -1,5 +1,6 @@
 from .worker import Redirector
 from .icap import ICAPRedirector
+from .cache import VerdictCache
 
 class RedirectorFactory (object):
 	def __init__ (self, configuration, program, protocol):
@@ -7,9 +8,15 @@ class RedirectorFactory (object):
 		self.program = program
 		self.protocol = protocol
 
+		cache = configuration.redirector.cache
+		if protocol == 'url' and cache != 'none':
+			self.verdicts = VerdictCache(cache, configuration.redirector.cache_size, configuration.redirector.cache_ttl)
+		else:
+			self.verdicts = None
+
 	def create (self, wid):
 		if self.protocol == 'url':
-			redirector = Redirector(self.configuration, wid, self.program, self.protocol)
+			redirector = Redirector(self.configuration, wid, self.program, self.protocol, self.verdicts)
 
 		elif self.protocol.startswith('icap://'):
 			redirector = ICAPRedirector(self.configuration, wid, self.program, self.protocol)
@@ -23,7 +23,7 @@ class RedirectorSupervisor (object):
 	def __init__ (self, configuration, messagebox, controlbox):
 		self.configuration = configuration
 		self.log_writer = SysLogWriter('log', configuration.log.destination, configuration.log.enable, level=configuration.log.level)
-		self.usage_writer = UsageWriter('usage', configuration.usage.destination, configuration.usage.enable)
+		self.usage_writer = UsageWriter('usage', configuration.usage.destination, configuration.usage.enable, size=configuration.usage.queue, overflow=configuration.usage.overflow, format=configuration.usage.format, rotate_size=configuration.usage.rotate_size, rotate_time=configuration.usage.rotate_time, rotate_keep=configuration.usage.rotate_keep)
 
 		if configuration.debug.log:
 			self.usage_writer.toggleDebug()
@@ -69,11 +69,18 @@ class RedirectorSupervisor (object):
 		self.manager.decrease(count)
 
 	def sendStats (self, identifier):
+		verdicts = self.manager.redirector_factory.verdicts
+
 		self.controlbox.respond(identifier, 'STATS', {
 			'forked' : len(self.manager.worker),
 			'min' :    self.manager.low,
 			'max' :    self.manager.high,
 			'queue' :  self.manager.queue.qsize(),
+			'hit' :    verdicts.hit if verdicts is not None else 0,
+			'miss' :   verdicts.miss if verdicts is not None else 0,
+			'cached' : len(verdicts) if verdicts is not None else 0,
+			'dropped' : self.usage_writer.dropped,
+			'written' : self.usage_writer.written,
 		})
 
 	def control (self):
@@ -140,3 +147,4 @@ class RedirectorSupervisor (object):
 			pass
 
 		self.manager.kill_workers()
+		self.usage_writer.stop()
@@ -37,16 +37,17 @@ class Redirector (object):
 	ResponseFactory = ResponseFactory
 	ChildFactory = ChildFactory
 
-	__slots__ = ['configuration', 'tls_parser', 'http_parser', 'enabled', '_transparent', 'log', 'usage', 'response_factory', 'child_factory', 'wid', 'creation', 'program', 'running', 'stats_timestamp', '_proxy', 'universal', 'process']
+	__slots__ = ['configuration', 'tls_parser', 'http_parser', 'enabled', '_transparent', 'log', 'usage', 'response_factory', 'child_factory', 'wid', 'creation', 'program', 'running', 'stats_timestamp', '_proxy', 'universal', 'process', 'concurrency', 'channels', 'channel', 'received', 'verdicts']
 
-	def __init__ (self, configuration, name, program, protocol):
+	def __init__ (self, configuration, name, program, protocol, verdicts=None):
 		self.configuration = configuration
 		self.http_parser = self.HTTPParser(configuration)
 		self.tls_parser = self.TLSParser(configuration)
 		self.enabled = bool(program is not None) and configuration.redirector.enable
 		self._transparent = configuration.http.transparent
 		self.log = Logger('worker ' + str(name), configuration.log.worker)
-		self.usage = UsageLogger('usage', configuration.log.worker)
+		# with a structured format the reactor writes one record per request instead
+		self.usage = UsageLogger('usage', configuration.log.worker and configuration.usage.format == 'text')
 		self.response_factory = self.ResponseFactory()
 		self.child_factory = self.ChildFactory(configuration, name)
 
@@ -62,6 +63,15 @@ class Redirector (object):
 		self._proxy = 'ExaProxy-%s-id-%d' % (configuration.proxy.version,os.getpid())
 
 		universal = configuration.redirector.protocol == 'url'
+
+		# squid "concurrency": each request is prefixed with a channel ID, which the child gives back
+		# with its answer, so it can work on several requests at once and answer them in any order
+		self.concurrency = configuration.redirector.concurrency if universal else 1
+		self.channels = range(self.concurrency-1, -1, -1) if self.concurrency > 1 else []  # the channel IDs not in use
+		self.channel = None							# the channel ID of the last request written
+		self.received = ''							# the start of an answer not yet complete
+		self.verdicts = verdicts					# the decisions of the programs, shared by the workers
+
 		# Do not move, we need the forking AFTER the setup
 		if program:
 			self.process = self.child_factory.createProcess(self.program, universal=universal)
@@ -94,15 +104,30 @@ class Redirector (object):
 		return False
 
 	def writeChild (self, request_string):
+		if self.concurrency > 1:
+			if not self.channels:
+				return False
+
+			self.channel = self.channels.pop()
+			request_string = '%d %s' % (self.channel, request_string)
+
 		try:
 			self.process.stdin.write(request_string)
 			status = True
 
-		except ValueError:
+		# the file was closed, or the child went away (EPIPE)
+		except (ValueError, IOError):
 			status = False
 
+		if status is False and self.channel is not None:
+			self.freeChannel(self.channel)
+
 		return status
 
+	def freeChannel (self, channel):
+		self.channels.append(channel)
+		self.channel = None
+
 	def readChildResponse (self):
 		try:
 			response = None
@@ -117,6 +142,44 @@ class Redirector (object):
 
 		return response
 
+	def readChildResponses (self):
+		"""the answers of a child using channel IDs, as (channel, answer), or None if the child is gone"""
+		try:
+			# the poller told us there is data, one read will not block
+			data = os.read(self.process.stdout.fileno(), 65536)
+		except (OSError, ValueError):
+			data = ''
+
+		if not data:
+			return None
+
+		lines = (self.received + data).split('\n')
+		self.received = lines.pop()
+		responses = []
+
+		for line in lines:
+			channel, _, response = line.strip().partition(' ')
+			if not channel.isdigit():
+				self.log.error('invalid answer from the redirector (no channel ID): %s' % line.strip())
+				continue
+
+			responses.append((int(channel), response.strip()))
+
+		return responses
+
+
+	def parseChildResponse (self, response_s):
+		"""remove the ttl=<seconds> a program can add to its answer to say for how long it can be cached"""
+		ttl = None
+		words = []
+
+		for word in response_s.split():
+			if word.startswith('ttl=') and word[4:].isdigit():
+				ttl = int(word[4:])
+			else:
+				words.append(word)
+
+		return ' '.join(words), ttl
 
 	def createChildRequest (self, accept_addr, accept_port, peer, message, http_header):
 		return '%s %s - %s -\n' % (message.url_noport, peer, message.request.method)
@@ -171,18 +234,37 @@ class Redirector (object):
 
 		return response
 
+	def doCached (self, client_id, accept_addr, accept_port, peer, message):
+		"""the response to a request a program already decided about, or None"""
+		if self.verdicts is None:
+			return None
+
+		verdict = self.verdicts.get(self.verdicts.key(message, peer))
+		if verdict is None:
+			return None
+
+		classification, data, comment = verdict
+
+		if message.request.method == 'CONNECT':
+			(operation, destination), response = self.response_factory.connectResponse(client_id, message, classification, data, comment)
+		else:
+			(operation, destination), response = self.response_factory.contentResponse(client_id, message, classification, data, comment)
+
+		self.usage.logRequest(client_id, accept_addr, accept_port, peer, message.request.method, message.url, operation, message.host)
+		return response
+
 	def doHTTPRequest (self, client_id, accept_addr, accept_port, peer, message, http_header, source):
 		method = message.request.method
 
 		if self.enabled:
-			request_string = self.createChildRequest(accept_addr, accept_port, peer, message, http_header) if message else None
-			status = self.writeChild(request_string) if request_string else None
+			response = self.doCached(client_id, accept_addr, accept_port, peer, message)
 
-			if status is True:
-				response = Respond.defer(client_id, message)
+			if response is None:
+				request_string = self.createChildRequest(accept_addr, accept_port, peer, message, http_header) if message else None
+				status = self.writeChild(request_string) if request_string else None
 
-			else:
-				response = None
+				if status is True:
+					response = Respond.defer(client_id, message)
 
 		else:
 			response = Respond.download(client_id, message.host, message.port, message.upgrade, message.content_length, message)
@@ -199,14 +281,14 @@ class Redirector (object):
 			self.usage.logRequest(client_id, accept_addr, accept_port, peer, method, message.url, 'DENY', 'CONNECT NOT ALLOWED')
 
 		elif self.enabled:
-			request_string = self.createChildRequest(accept_addr, accept_port, peer, message, http_header) if message else None
-			status = self.writeChild(request_string) if request_string else None
+			response = self.doCached(client_id, accept_addr, accept_port, peer, message)
 
-			if status is True:
-				response = Respond.defer(client_id, message)
+			if response is None:
+				request_string = self.createChildRequest(accept_addr, accept_port, peer, message, http_header) if message else None
+				status = self.writeChild(request_string) if request_string else None
 
-			else:
-				response = None
+				if status is True:
+					response = Respond.defer(client_id, message)
 
 		else:
 			response = Respond.connect(client_id, message.host, message.port, '')
@@ -327,14 +409,26 @@ class Redirector (object):
 		else:
 			response_s = None
 
+		return self.respond(client_id, accept_addr, accept_port, peer, message, header, subheader, source, response_s)
+
+	def respond (self, client_id, accept_addr, accept_port, peer, message, header, subheader, source, response_s):
 		if source == 'tls':
 			return Respond.hangup(client_id)
 
-		response = self.classifyURL(message.request, response_s) if response_s is not None else None
+		if response_s is not None:
+			response_s, ttl = self.parseChildResponse(response_s)
+			response = self.classifyURL(message.request, response_s)
+
+		else:
+			response = None
 
 		if response is not None and source == 'proxy':
 			classification, data, comment = response
 
+			# do not remember answers we could not understand
+			if self.verdicts is not None and data != 'internal_error.html':
+				self.verdicts.set(self.verdicts.key(message, peer), response, ttl)
+
 			if message.request.method in ('GET','PUT','POST','HEAD','DELETE','PATCH'):
 				(operation, destination), decision = self.response_factory.contentResponse(client_id, message, classification, data, comment)
 
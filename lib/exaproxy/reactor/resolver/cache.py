@@ -0,0 +1,123 @@
+# encoding: utf-8
+"""
+cache.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+try:
+	from collections import OrderedDict
+except ImportError:
+	# support installable ordereddict module in older python versions
+	from ordereddict import OrderedDict
+
+from heapq import heappush, heappop
+from time import time
+
+# what we think an entry costs on top of its strings (dict, tuples, heap entry)
+ENTRY_OVERHEAD = 256
+
+
+class DNSCache (object):
+	"""The answers of our DNS queries, kept for the TTL of the records
+
+	The TTL is clamped between a minimum and a maximum, hostnames which could
+	not be resolved are remembered (as None) for a short time. When the memory
+	used goes over the budget, the least recently used hostnames are dropped."""
+
+	def __init__ (self, memory, minimum, maximum, negative):
+		self.memory = memory        # how many bytes we can use
+		self.minimum = minimum      # shortest time an answer is kept
+		self.maximum = maximum      # longest time an answer is kept
+		self.negative = negative    # how long a failure is kept
+
+		self.entries = OrderedDict()  # hostname -> ip, expire time (least recently used first)
+		self.expiring = []            # heap of expire time, hostname (an entry may have been replaced)
+		self.used = 0                 # the memory we think the entries use
+
+		self.hit = 0
+		self.miss = 0
+		self.negative_hit = 0
+		self.evicted = 0
+		self.expired = 0
+
+	def __len__ (self):
+		return len(self.entries)
+
+	def _size (self, hostname, ip):
+		return ENTRY_OVERHEAD + len(hostname) + (len(ip) if ip else 0)
+
+	def _remove (self, hostname):
+		ip, expire = self.entries.pop(hostname)
+		self.used -= self._size(hostname, ip)
+
+	def get (self, hostname, default=None, count=True):
+		"""the cached address (None if the hostname did not resolve) or default
+		count is False for the lookups which must not change the hit and miss ratios"""
+		entry = self.entries.pop(hostname, None)
+
+		if entry is None:
+			if count:
+				self.miss += 1
+			return default
+
+		ip, expire = entry
+
+		if expire <= time():
+			self.used -= self._size(hostname, ip)
+			self.expired += 1
+			if count:
+				self.miss += 1
+			return default
+
+		# most recently used
+		self.entries[hostname] = entry
+
+		if count:
+			if ip is None:
+				self.negative_hit += 1
+			else:
+				self.hit += 1
+
+		return ip
+
+	def set (self, hostname, ip, ttl=None):
+		"""cache an address for the record TTL, or a failure to resolve if ip is None"""
+		if ip is None:
+			ttl = self.negative
+		elif ttl is None:
+			ttl = self.maximum
+		else:
+			ttl = min(max(ttl, self.minimum), self.maximum)
+
+		if hostname in self.entries:
+			self._remove(hostname)
+
+		expire = time() + ttl
+		self.entries[hostname] = ip, expire
+		self.used += self._size(hostname, ip)
+		heappush(self.expiring, (expire, hostname))
+
+		while self.used > self.memory and self.entries:
+			oldest = next(iter(self.entries))
+			self._remove(oldest)
+			self.evicted += 1
+
+	def expire (self):
+		"""forget the entries which expired"""
+		now = time()
+		expiring = self.expiring
+		entries = self.entries
+
+		while expiring and expiring[0][0] <= now:
+			expire, hostname = heappop(expiring)
+			entry = entries.get(hostname, None)
+
+			# the entry may have been evicted, used after its expiration or replaced
+			if entry is not None and entry[1] == expire:
+				self._remove(hostname)
+				self.expired += 1
+
+		# entries removed otherwise leave their expiration behind, do not let them pile up
+		if len(expiring) > 4 * len(entries) + 1024:
+			self.expiring = sorted((when, name) for (name, (_, when)) in entries.iteritems())
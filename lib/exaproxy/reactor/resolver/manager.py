@@ -1,11 +1,22 @@
 import time
 
-from collections import deque
+try:
+	from collections import OrderedDict
+except ImportError:
+	# support installable ordereddict module in older python versions
+	from ordereddict import OrderedDict
 
 from .worker import DNSResolver
+from .cache import DNSCache
 from exaproxy.network.functions import isip
+from exaproxy.network.functions import isipv4
+from exaproxy.network.functions import isipv6
 from exaproxy.util.log.logger import Logger
 
+# the IPv6 address of a hostname is cached with this suffix (a hostname has no space)
+_AAAA = ' AAAA'
+
+
 class ResolverManager (object):
 	resolverFactory = DNSResolver
 
@@ -33,16 +44,19 @@ class ResolverManager (object):
 		# TCP workers that have not yet sent a complete request
 		self.sending = {}  # sock :
 
-		# Maximum number of entry we will cache (1024 DNS lookup per second !)
-		# assuming 1k per entry, which is a lot, it mean 20Mb of memory
-		# which at the default of 900 seconds of cache is 22 new host per seonds
-		self.max_entries  = 1024*20
+		# the hostnames we sent a query for, and the other clients waiting for its answer
+		self.inflight = {}  # hostname : identifier, time sent, [(client_id, command, decision), ...]
+		self.coalesced = 0  # lookups which did not need a query of their own
+
+		# after this long, something went wrong with the query and we will not wait for it
+		self.patience = configuration.dns.timeout * (configuration.dns.retries + 1)
 
 		# track the current queries and when they were started
-		self.active = []
+		self.active = OrderedDict()  # (time sent, client_id, sock) : None, oldest first
 
-		self.cache = {}
-		self.cached = deque()
+		# the answers we received, for the TTL of the records (within limits)
+		dns = configuration.dns
+		self.cache = DNSCache(dns.cache, dns.minimum, dns.ttl, dns.negative)
 
 		self.max_workers = max_workers
 		self.worker_count = len(self.workers)  # the UDP client
@@ -52,44 +66,35 @@ class ResolverManager (object):
 		self.log = Logger('resolver', configuration.log.resolver)
 		self.chained = {}
 
-	def cacheDestination (self, hostname, ip):
-		if hostname not in self.cache:
-			expire_time = time.time() + self.configuration.dns.ttl
-			expire_time = expire_time - expire_time % 5  # group the DNS record per buckets 5 seconds
-			latest_time, latest_hosts = self.cached[-1] if self.cached else (-1, None)
-
-			if expire_time > latest_time:
-				hosts = []
-				self.cached.append((expire_time, hosts))
-			else:
-				hosts = latest_hosts
+		# when we can connect over both IPv4 and IPv6, the IPv6 address is asked for alongside the IPv4 one
+		# (no client waits for it) so the content manager can try both (IPv6 first)
+		self.dual = configuration.tcp4.out and configuration.tcp6.out and configuration.tcp6.fallback > 0
+		self.companions = {}  # w_id, identifier : hostname
+		self.alternating = {}  # hostname : w_id, identifier, time sent
 
-			self.cache[hostname] = ip
-			hosts.append(hostname)
+	def cacheDestination (self, hostname, ip, ttl=None):
+		# ip is None when the hostname could not be resolved
+		self.cache.set(hostname, ip, ttl)
 
 	def expireCache (self):
-		# expire only one set of cache entries at a time
-		if self.cached:
-			current_time = time.time()
-			expire_time, hosts = self.cached[0]
-
-			if current_time >= expire_time or len(self.cache) > self.max_entries:
-				expire_time, hosts = self.cached.popleft()
-
-				for hostname in hosts:
-					self.cache.pop(hostname, None)
+		self.cache.expire()
 
 
 	def cleanup(self):
 		now = time.time()
 		cutoff = now - self.configuration.dns.timeout
-		count = 0
+		expired = []
 
-		for timestamp, client_id, sock in self.active:
-			if timestamp > cutoff:
+		for key in self.active:
+			if key[0] > cutoff:
 				break
 
-			count += 1
+			expired.append(key)
+
+		for key in expired:
+			del self.active[key]
+
+		for timestamp, client_id, sock in expired:
 			cli_data = self.clients.pop(client_id, None)
 			worker = self.workers.get(sock)
 			tcpudp = 'udp' if worker is self.worker else 'tcp'
@@ -102,23 +107,39 @@ class ResolverManager (object):
 
 				if data:
 					client_id, original, hostname, command, decision = data
-					self.log.error('timeout when requesting address for %s using the %s client - attempt %s' % (hostname, tcpudp, resolve_count))
+					self.log.error('timeout when requesting address for %s using the %s client - attempt %s', hostname, tcpudp, resolve_count)
 
 					if resolve_count < self.configuration.dns.retries and worker is self.worker:
-						self.log.info('going to retransmit request for %s - attempt %s of %s' % (hostname, resolve_count+1, self.configuration.dns.retries))
+						self.log.info('going to retransmit request for %s - attempt %s of %s', hostname, resolve_count+1, self.configuration.dns.retries)
 						self.startResolving(client_id, command, decision, resolve_count+1, identifier=identifier)
 						continue
 
-					self.log.error('given up trying to resolve %s after %s attempts' % (hostname, self.configuration.dns.retries))
+					self.log.error('given up trying to resolve %s after %s attempts', hostname, self.configuration.dns.retries)
 					yield client_id, 'rewrite', ('503', 'dns.html', '', '', '', hostname, 'peer')
 
+					_, _, waiting = self.inflight.pop(original, (None, None, []))
+					for waiter, _, _ in waiting:
+						yield waiter, 'rewrite', ('503', 'dns.html', '', '', '', hostname, 'peer')
+
 			if worker is not None:
 				if worker is not self.worker:
 					worker.close()
 					self.workers.pop(sock)
 
-		if count:
-			self.active = self.active[count:]
+		# the IPv6 queries which were not answered
+		for hostname, (w_id, identifier, sent) in self.alternating.items():
+			if sent < cutoff:
+				del self.alternating[hostname]
+				self.companions.pop((w_id, identifier), None)
+				self.chained.pop(identifier, None)
+
+		# the queries we lost track of (the clients waiting on them would otherwise never be answered)
+		for hostname, (_, sent, waiting) in self.inflight.items():
+			if sent < now - self.patience:
+				del self.inflight[hostname]
+
+				for waiter, _, _ in waiting:
+					yield waiter, 'rewrite', ('503', 'dns.html', '', '', '', hostname, 'peer')
 
 	def resolves(self, command, decision):
 		if command in ('download', 'connect', 'intercept'):
@@ -150,21 +171,58 @@ class ResolverManager (object):
 
 		return newdecision
 
+	def resolveAlternate (self, hostname):
+		"""ask for the IPv6 address of hostname, without any client waiting for it"""
+		if hostname in self.alternating:
+			return
+
+		identifier, _ = self.worker.resolveHost(hostname, qtype='AAAA')
+
+		# the answer is only cached, we do not follow the CNAME if it has no AAAA (see DNSClient.getResponse)
+		self.chained[identifier] = 10
+		self.companions[(self.worker.w_id, identifier)] = hostname
+		self.alternating[hostname] = self.worker.w_id, identifier, time.time()
+
+	def alternate (self, hostname, ip):
+		"""the addresses to connect to: the IPv6 and IPv4 ones (IPv6 first) if we know both, ip otherwise"""
+		if not self.dual or ip is None or not isipv4(ip):
+			return ip
+
+		# only the clients' own lookups are counted as hits and misses
+		ip6 = self.cache.get(hostname + _AAAA, False, count=False)
+
+		if ip6 is False:
+			self.resolveAlternate(hostname)
+			return ip
+
+		if ip6 is None:
+			return ip
+
+		return ip6, ip
+
 	def startResolving(self, client_id, command, decision, resolve_count=1, identifier=None):
 		hostname = self.extractHostname(command, decision)
 
 		if hostname:
-			# Resolution is already in our cache
-			if hostname in self.cache and identifier is None:
-				ip = self.cache[hostname]
+			# False when we do not know about the hostname, None when we could not resolve it
+			ip = self.cache.get(hostname, False) if identifier is None else False
 
+			# Resolution is already in our cache
+			if ip is not False:
 				if ip is not None:
-					resolved = self.resolveDecision(command, decision, ip)
+					resolved = self.resolveDecision(command, decision, self.alternate(hostname, ip))
 					response = (client_id, command) + resolved
 
 				else:
 					response = client_id, 'rewrite', '503', 'dns.html', 'http', '', '', hostname, 'peer'
 
+			# a query was already sent for this hostname (not too long ago), wait for its answer
+			elif identifier is None and self.inflight.get(hostname, (None, 0, None))[1] > time.time() - self.patience:
+				identifier, _, waiting = self.inflight[hostname]
+				waiting.append((client_id, command, decision))
+				self.coalesced += 1
+				response = None
+
 			# do not try to resolve domains which are not FQDN
 			elif self.configuration.dns.fqdn and '.' not in hostname:
 				identifier = None
@@ -173,17 +231,27 @@ class ResolverManager (object):
 			# each DNS part (between the dots) must be under 256 chars
 			elif max(len(p) for p in hostname.split('.')) > 255:
 				identifier = None
-				self.log.info('jumbo hostname: %s' % hostname)
+				self.log.info('jumbo hostname: %s', hostname)
 				response = client_id, 'rewrite', '503', 'dns.html', 'http', '', '', hostname, 'peer'
 			# Lookup that DNS name
 			else:
+				retransmit = identifier is not None
 				identifier, _ = self.worker.resolveHost(hostname, identifier=identifier)
 				response = None
 				active_time = time.time()
 
+				if not retransmit:
+					# any client still waiting on a query which never completed can use this one
+					_, _, waiting = self.inflight.get(hostname, (None, None, []))
+					self.inflight[hostname] = identifier, active_time, waiting
+
 				self.resolving[(self.worker.w_id, identifier)] = client_id, hostname, hostname, command, decision
 				self.clients[client_id] = (self.worker.w_id, identifier, active_time, resolve_count)
-				self.active.append((active_time, client_id, self.worker.socket))
+				self.active[active_time, client_id, self.worker.socket] = None
+
+				# resolve both families in parallel
+				if self.dual and not retransmit and self.cache.get(hostname + _AAAA, False, count=False) is False:
+					self.resolveAlternate(hostname)
 		else:
 			identifier = None
 			response = None
@@ -224,7 +292,7 @@ class ResolverManager (object):
 			active_time = time.time()
 			self.resolving[(worker.w_id, identifier)] = client_id, hostname, hostname, command, decision
 			self.clients[client_id] = (worker.w_id, identifier, active_time, resolve_count)
-			self.active.append((active_time, client_id, self.worker.socket))
+			self.active[active_time, client_id, self.worker.socket] = None
 
 			if all_sent:
 				self.poller.addReadSocket('read_resolver', worker.socket)
@@ -238,14 +306,34 @@ class ResolverManager (object):
 
 		return identifier
 
+	def answerWaiting (self, hostname, ip):
+		"""the responses for the clients waiting on the query for hostname"""
+		_, _, waiting = self.inflight.pop(hostname, (None, None, []))
+
+		for client_id, command, decision in waiting:
+			if ip is not None:
+				yield (client_id, command) + self.resolveDecision(command, decision, ip)
+			else:
+				yield client_id, 'rewrite', '503', 'dns.html', 'http', '', '', hostname, 'peer'
+
 	def getResponse(self, sock):
 		worker = self.workers.get(sock)
+		waiting = []
 
 		if worker:
 			result = worker.getResponse(self.chained)
 
 			if result:
-				identifier, forhost, ip, completed, newidentifier, newhost, newcomplete = result
+				identifier, forhost, ip, completed, newidentifier, newhost, newcomplete, ttl = result
+
+				# the IPv6 address asked for alongside the IPv4 one, it is only cached
+				hostname = self.companions.pop((worker.w_id, identifier), None)
+				if hostname is not None:
+					self.alternating.pop(hostname, None)
+					self.chained.pop(identifier, None)
+					self.cacheDestination(hostname + _AAAA, ip if completed and ip and isipv6(ip) else None, ttl)
+					return []
+
 				data = self.resolving.pop((worker.w_id, identifier), None)
 
 				chain_count = self.chained.pop(identifier, 0)
@@ -253,7 +341,7 @@ class ResolverManager (object):
 					self.chained[newidentifier] = chain_count + 1
 
 				if not data:
-					self.log.info('ignoring response for %s (%s) with identifier %s' % (forhost, ip, identifier))
+					self.log.info('ignoring response for %s (%s) with identifier %s', forhost, ip, identifier)
 
 			else:
 				# unable to parse response
@@ -266,9 +354,7 @@ class ResolverManager (object):
 
 				if identifier is not None:
 					if clidata is not None:
-						key = clidata[2], client_id, worker.socket
-						if key in self.active:
-							self.active.remove(key)
+						self.active.pop((clidata[2], client_id, worker.socket), None)
 
 				# check to see if we received an incomplete response
 				if not completed:
@@ -284,7 +370,7 @@ class ResolverManager (object):
 						active_time = time.time()
 						self.resolving[(worker.w_id, newidentifier)] = client_id, original, newhost, command, decision
 						self.clients[client_id] = (worker.w_id, newidentifier, active_time, 1)
-						self.active.append((active_time, client_id, worker.socket))
+						self.active[active_time, client_id, worker.socket] = None
 
 					if completed and newcomplete:
 						self.poller.addReadSocket('read_resolver', worker.socket)
@@ -304,19 +390,22 @@ class ResolverManager (object):
 					active_time = time.time()
 					self.resolving[(worker.w_id, identifier)] = client_id, original, hostname, command, decision
 					self.clients[client_id] = (worker.w_id, identifier, active_time, resolve_count)
-					self.active.append((active_time, client_id, worker.socket))
+					self.active[active_time, client_id, worker.socket] = None
 					response = None
 
 				# success
 				elif ip is not None:
-					resolved = self.resolveDecision(command, decision, ip)
+					self.cacheDestination(original, ip, ttl)
+					addresses = self.alternate(original, ip)
+					resolved = self.resolveDecision(command, decision, addresses)
 					response = (client_id, command) + resolved
-					self.cacheDestination(original, ip)
+					waiting = list(self.answerWaiting(original, addresses))
 
 				# not found
 				else:
 					response = client_id, 'rewrite', '503', 'dns.html', 'http', '', '', hostname, 'peer'
-					#self.cacheDestination(original, ip)
+					self.cacheDestination(original, None)
+					waiting = list(self.answerWaiting(original, None))
 			else:
 				response = None
 
@@ -331,7 +420,8 @@ class ResolverManager (object):
 		else:
 			response = None
 
-		return response
+		# the clients which were waiting for the same hostname are answered with the first one
+		return [response] + waiting if response else waiting
 
 
 	def continueSending(self, sock):
@@ -355,4 +445,4 @@ class ResolverManager (object):
 				self.poller.addReadSocket('read_resolver', sock)
 
 			else:
-				self.log.error('could not find client for dns request for %s. request is being left to timeout.' % str(hostname))
+				self.log.error('could not find client for dns request for %s. request is being left to timeout.', hostname)
@@ -84,7 +84,7 @@ class DNSClient (object):
 
 		# we might not have been sent all of the response yet
 		if not completed:
-			return None, None, None, True, None, None, None
+			return None, None, None, True, None, None, None, None
 
 		# check that we were able to properly parse the response
 		if not response:
@@ -134,7 +134,7 @@ class DNSClient (object):
 				newhost = value
 				value = None
 
-		return response.identifier, response.qhost, value, response.isComplete(), newidentifier, newhost, newcomplete
+		return response.identifier, response.qhost, value, response.isComplete(), newidentifier, newhost, newcomplete, response.getTTL()
 
 	def close (self):
 		self.socket.close()
@@ -0,0 +1,145 @@
+# encoding: utf-8
+"""
+timing.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import time
+
+from collections import defaultdict
+
+from exaproxy.util.histogram import Histogram
+from exaproxy.util.log.logger import UsageLogger
+from exaproxy.util.log.usage import FIELDS
+from exaproxy.util.log.usage import STAGES
+
+_TIME, _CLIENT, _SOURCE, _ACCEPT_IP, _ACCEPT_PORT, _PEER, _METHOD, _URL, _ACTION, _DESTINATION = range(10)
+_ACCEPT, _DECISION, _DNS, _CONNECT, _FIRST, _LAST = range(10, 10 + len(STAGES))
+_STATUS, _SIZE = range(10 + len(STAGES), 12 + len(STAGES))
+
+_stages = dict((name, index) for (index, name) in enumerate(FIELDS))
+
+# the sources which send us an HTTP (or ICAP) request line
+_parsed = ('proxy', 'icap', 'web')
+
+
+def _destination (command, decision):
+	if command in ('download', 'connect', 'intercept'):
+		return '%s:%s' % (decision[0], decision[1])
+
+	if command == 'redirect':
+		return decision
+
+	if command in ('file', 'rewrite'):
+		return decision[1]
+
+	return ''
+
+
+class RequestTimer (object):
+	"""When each request went through each stage, by client socket
+
+	The reactor and the client manager stamp the requests as they progress.
+	A request is complete when the client sends the next one or goes away:
+	its stages are counted in per stage histograms (reported by the Monitor)
+	and, one request in usage.sample, written to the usage log if a structured
+	format is used"""
+
+	def __init__ (self, configuration):
+		self.usage = UsageLogger('usage')
+		self.structured = configuration.usage.enable and configuration.usage.format != 'text'
+		self.sample = configuration.usage.sample if self.structured else 0
+
+		self.accepted = {}   # client socket -> when the connection was accepted
+		self.requests = {}   # client socket -> the request being timed (a list of FIELDS)
+		self.stages = defaultdict(Histogram)  # stage -> the time taken by the requests to reach it
+		self.completed = 0L  # number of requests timed
+
+	def accept (self, sock):
+		self.accepted[sock] = time.time()
+
+	def start (self, sock, name, accept_addr, accept_port, peer, request, source):
+		if sock in self.requests:
+			self.complete(sock)
+
+		now = time.time()
+
+		# only the first request of a connection waited for it to be accepted
+		accepted = self.accepted.pop(sock, None)
+		waited = now - accepted if accepted is not None else None
+
+		if request and source in _parsed:
+			line = request[:request.find('\n')].split(' ', 2)
+			method, url = (line[0], line[1]) if len(line) > 1 else ('', '')
+		else:
+			method, url = '', ''
+
+		self.requests[sock] = [
+			now, name, source, accept_addr, accept_port, peer, method, url, '', '',
+			waited, None, None, None, None, None,
+			None, None,
+		]
+
+	def decide (self, sock, command, decision):
+		record = self.requests.get(sock)
+		if record is None:
+			return
+
+		record[_DECISION] = time.time() - record[_TIME]
+		record[_ACTION] = command
+
+		try:
+			record[_DESTINATION] = _destination(command, decision)
+		except (IndexError, TypeError):
+			pass
+
+	def stamp (self, sock, stage):
+		"""record the time of the stage, only the first time it is reached"""
+		record = self.requests.get(sock)
+		index = _stages[stage]
+
+		if record is not None and record[index] is None:
+			record[index] = time.time() - record[_TIME]
+
+	def sent (self, sock):
+		"""data was sent to the client for the request"""
+		record = self.requests.get(sock)
+		if record is None:
+			return
+
+		elapsed = time.time() - record[_TIME]
+
+		if record[_FIRST] is None:
+			record[_FIRST] = elapsed
+
+		record[_LAST] = elapsed
+
+	def respond (self, sock, code, size):
+		"""the status and body size of the response of the web server (so far)"""
+		record = self.requests.get(sock)
+		if record is None:
+			return
+
+		record[_STATUS] = code
+		record[_SIZE] = size
+
+	def complete (self, sock):
+		record = self.requests.pop(sock, None)
+		if record is None:
+			return None
+
+		for stage, elapsed in zip(STAGES, record[_ACCEPT:_STATUS]):
+			if elapsed is not None:
+				self.stages[stage].record(elapsed)
+
+		self.completed += 1
+
+		if self.sample and self.completed % self.sample == 0:
+			self.usage.logRecord(tuple(record))
+
+		return record
+
+	def close (self, sock):
+		self.accepted.pop(sock, None)
+		return self.complete(sock)
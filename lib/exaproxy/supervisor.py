@@ -15,10 +15,13 @@ from socket import has_ipv6
 from .util.pid import PID
 from .util.daemon import Daemon
 from .util.alarm import alarm_thread
+from .util.reactors import ReactorProcesses
 
 from .reactor.content.manager import ContentManager
 from .reactor.client.manager import ClientManager
 from .reactor.resolver.manager import ResolverManager
+from .reactor.timing import RequestTimer
+from .reactor.deadline import Deadlines
 from .network.async import Poller
 from .network.server import Server
 from .network.server import InterceptServer
@@ -27,7 +30,7 @@ from .monitor import Monitor
 
 from .reactor import Reactor
 from .reactor.redirector import fork_redirector
-from .reactor.redirector import redirector_message_thread
+from .reactor.redirector import redirector_dispatcher
 
 from .configuration import load
 from exaproxy.util.log.logger import Logger
@@ -58,7 +61,7 @@ class Supervisor (object):
 
 		self.signal_log = Logger('signal', configuration.log.signal)
 		self.log_writer = SysLogWriter('log', configuration.log.destination, configuration.log.enable, level=configuration.log.level)
-		self.usage_writer = UsageWriter('usage', configuration.usage.destination, configuration.usage.enable)
+		self.usage_writer = UsageWriter('usage', configuration.usage.destination, configuration.usage.enable, size=configuration.usage.queue, overflow=configuration.usage.overflow, format=configuration.usage.format, rotate_size=configuration.usage.rotate_size, rotate_time=configuration.usage.rotate_time, rotate_keep=configuration.usage.rotate_keep)
 
 		sys.exitfunc = self.log_writer.writeMessages
 
@@ -75,32 +78,55 @@ class Supervisor (object):
 		self.pid = PID(self.configuration)
 
 		self.daemon = Daemon(self.configuration)
+		self.daemon.daemonise()
+		self.pid.save()
+
+		# fork the other reactor processes before creating any poller or socket
+		# (and write our pending logs first so they are not written again by each child)
+		self.log_writer.writeMessages()
+		self.usage_writer.writeMessages()
+
+		self.reactors = ReactorProcesses(self.configuration)
+		if not self.reactors.fork():
+			self.log_writer.pid = os.getpid()
+			self.usage_writer.pid = os.getpid()
+
 		self.poller = Poller(self.configuration.daemon)
 
-		self.poller.setupRead('read_proxy')       # Listening proxy sockets
-		self.poller.setupRead('read_web')         # Listening webserver sockets
-		self.poller.setupRead('read_icap')        # Listening icap sockets
-		self.poller.setupRead('read_tls')         # Listening tls sockets
-		self.poller.setupRead('read_passthrough') # Listening raw data sockets
-		self.poller.setupRead('read_redirector')  # Pipes carrying responses from the redirector process
-		self.poller.setupRead('read_resolver')    # Sockets currently listening for DNS responses
+		self.poller.setupRead('read_proxy', edge=True)        # Listening proxy sockets
+		self.poller.setupRead('read_web', edge=True)          # Listening webserver sockets
+		self.poller.setupRead('read_icap', edge=True)         # Listening icap sockets
+		self.poller.setupRead('read_tls', edge=True)          # Listening tls sockets
+		self.poller.setupRead('read_passthrough', edge=True)  # Listening raw data sockets
+		self.poller.setupRead('read_redirector')              # Pipes carrying responses from the redirector process
+		self.poller.setupRead('read_resolver')                # Sockets currently listening for DNS responses
+
+		self.poller.setupRead('read_client')               # Active clients
+		self.poller.setupRead('opening_client')            # Clients we have not yet read a request from
+		self.poller.setupWrite('write_client', edge=True)  # Active clients with buffered data to send
+		self.poller.setupWrite('write_resolver')           # Active DNS requests with buffered data to send
+		self.poller.setupWrite('write_redirector')         # Pipe to the redirector process when it is full
 
-		self.poller.setupRead('read_client')      # Active clients
-		self.poller.setupRead('opening_client')   # Clients we have not yet read a request from
-		self.poller.setupWrite('write_client')    # Active clients with buffered data to send
-		self.poller.setupWrite('write_resolver')  # Active DNS requests with buffered data to send
+		self.poller.setupRead('read_download', edge=True)      # Established connections
+		self.poller.setupWrite('write_download', edge=True)    # Established connections we have buffered data to send to
+		self.poller.setupWrite('opening_download', edge=True)  # Opening connections
 
-		self.poller.setupRead('read_download')      # Established connections
-		self.poller.setupWrite('write_download')    # Established connections we have buffered data to send to
-		self.poller.setupWrite('opening_download')  # Opening connections
+		self.poller.setupRead('read_splice', edge=True)    # Tunnels relayed by the kernel
+		self.poller.setupWrite('write_splice', edge=True)  # Tunnels with data waiting in a pipe
 
 		self.poller.setupRead('read_interrupt')		# Scheduled events
 		self.poller.setupRead('read_control')		# Responses from commands sent to the redirector process
+		self.poller.setupRead('read_reactor')		# Statistics sent by the other reactor processes
+
+		for pipe in self.reactors.pipes():
+			self.poller.addReadSocket('read_reactor', pipe)
 
 		self.monitor = Monitor(self)
 		self.page = Page(self)
+		self.deadlines = Deadlines(configuration)
+		self.timer = RequestTimer(configuration)
 		self.content = ContentManager(self,configuration)
-		self.client = ClientManager(self.poller, configuration)
+		self.client = ClientManager(self.poller, configuration, self.timer, self.deadlines)
 		self.resolver = ResolverManager(self.poller, self.configuration, configuration.dns.retries*10)
 		self.proxy = Server('http proxy',self.poller,'read_proxy', configuration.http)
 		self.web = Server('web server',self.poller,'read_web', configuration.web)
@@ -130,10 +156,12 @@ class Supervisor (object):
 
 
 		# fork the redirector process before performing any further setup
+		# (and write our pending logs first so they are not written again by the child)
+		self.log_writer.writeMessages()
 		redirector = fork_redirector(self.poller, self.configuration)
 
-		# use simple blocking IO for communication with the redirector process
-		self.redirector = redirector_message_thread(redirector)
+		# the reactor writes the requests to the redirector process without blocking
+		self.redirector = redirector_dispatcher(self.poller, redirector)
 
 
 		# NOTE: create threads _after_ all forking is done
@@ -141,7 +169,7 @@ class Supervisor (object):
 		# regularly interrupt the reactor for maintenance
 		self.interrupt_scheduler = alarm_thread(self.poller, self.alarm_time)
 
-		self.reactor = Reactor(self.configuration, self.web, self.proxy, self.passthrough, self.icap, self.tls, self.redirector, self.content, self.client, self.resolver, self.log_writer, self.usage_writer, self.poller)
+		self.reactor = Reactor(self.configuration, self.web, self.proxy, self.passthrough, self.icap, self.tls, self.redirector, self.content, self.client, self.resolver, self.log_writer, self.usage_writer, self.timer, self.deadlines, self.poller, self.reactors)
 
 		self.interfaces()
 
@@ -179,6 +207,7 @@ class Supervisor (object):
 		sys.exit()
 
 	def sigquit (self,signum, frame):
+		self.reactors.signal(signum)
 		if self._softstop:
 			self.signal_log.critical('multiple SIG INT received, shutdown')
 			self._shutdown = True
@@ -188,6 +217,7 @@ class Supervisor (object):
 			self._listen = False
 
 	def sigterm (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG TERM received, shutdown request')
 		if os.environ.get('PDB',False):
 			self._pdb = True
@@ -203,24 +233,29 @@ class Supervisor (object):
 	# 	self._reload = True
 
 	def sigtrap (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG TRAP received, toggle debug')
 		self._toggle_debug = True
 
 
 	def sigusr1 (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG USR1 received, decrease worker number')
 		self._decrease_spawn_limit += 1
 
 	def sigusr2 (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG USR2 received, increase worker number')
 		self._increase_spawn_limit += 1
 
 
 	def sigttou (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG TTOU received, stop listening')
 		self._listen = False
 
 	def sigttin (self,signum, frame):
+		self.reactors.signal(signum)
 		self.signal_log.critical('SIG IN received, star listening')
 		self._listen = True
 
@@ -250,11 +285,13 @@ class Supervisor (object):
 		events = {'read_interrupt'}
 
 		while True:
-			count_second = (count_second + 1) % self.second_frequency
-			count_minute = (count_minute + 1) % self.minute_frequency
+			# only count the alarms, not the loops made to read the redirector responses
+			if 'read_interrupt' in events:
+				count_second = (count_second + 1) % self.second_frequency
+				count_minute = (count_minute + 1) % self.minute_frequency
 
-			count_saturation = (count_saturation + 1) % self.saturation_frequency
-			count_interface = (count_interface + 1) % self.interface_frequency
+				count_saturation = (count_saturation + 1) % self.saturation_frequency
+				count_interface = (count_interface + 1) % self.interface_frequency
 
 			try:
 				if self._pdb:
@@ -291,6 +328,11 @@ class Supervisor (object):
 				# clear the alarm condition
 				self.interrupt_scheduler.acknowledgeAlarm()
 
+				# the process which forked us is gone, we should not outlive it
+				if not self.reactors.alive():
+					self.log.critical('the first reactor process went away, shutdown')
+					self._shutdown = True
+
 				# must follow the reactor so we are sure to go through the reactor at least once
 				# and flush any logs
 				if self._shutdown:
@@ -363,6 +405,9 @@ class Supervisor (object):
 					elif expire_source == 'web':
 						self.web.notifyClose(None, count=expire_count)
 
+				# close the idle connections to web servers we kept for too long
+				self.reactor.content.expire()
+
 				# report if we saw too many connections
 				if count_saturation == 0:
 					self.proxy.saturation()
@@ -410,6 +455,10 @@ class Supervisor (object):
 		# save our monitoring stats
 		if count_second == 0:
 			ok = self.monitor.second(stats)
+
+			# let the first reactor process know how we are doing
+			if ok is True:
+				ok = self.reactors.report(stats, self.monitor.histograms())
 		else:
 			ok = True
 			expired = 0
@@ -421,9 +470,6 @@ class Supervisor (object):
 
 
 	def initialise (self):
-		self.daemon.daemonise()
-		self.pid.save()
-
 		# only start listening once we know we were able to fork our worker processes
 		tcp4 = self.configuration.tcp4
 		tcp6 = self.configuration.tcp6
@@ -488,7 +534,8 @@ class Supervisor (object):
 			if not ok:
 				self.log.critical('Passthrough server, unable to listen on %s:%s' % (passthrough.host, passthrough.port))
 
-		if ok and self.configuration.web.enable:
+		# only the first reactor process serves the web interface
+		if ok and self.configuration.web.enable and self.reactors.primary:
 			s = self.web.listen(self.configuration.web.host,self.configuration.web.port, 10, 10)
 			ok = bool(s)
 			if not ok:
@@ -502,11 +549,14 @@ class Supervisor (object):
 		try:
 			self.web.stop()  # accept no new web connection
 			self.proxy.stop()  # accept no new proxy connections
+			self.reactors.stop()  # wait for the other reactor processes
 			self.redirector.stop()  # shut down redirector children
 			self.content.stop()  # stop downloading data
 			self.client.stop()  # close client connections
-			self.pid.remove()
+			if self.reactors.primary:
+				self.pid.remove()
 			self.interrupt_scheduler.stop()
+			self.usage_writer.stop()  # write the usage lines still queued
 		except KeyboardInterrupt:
 			self.log.info('^C received while shutting down. Exiting immediately because you insisted.')
 			sys.exit()
@@ -0,0 +1,147 @@
+# encoding: utf-8
+"""
+buffer.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import socket
+
+from collections import deque
+from itertools import islice
+
+from exaproxy.network.errno_list import errno_block
+
+# python 3.3 and later can write several chunks with one system call
+_sendmsg = hasattr(socket.socket, 'sendmsg')
+
+# how many chunks we pass to sendmsg at once (IOV_MAX is 1024 on linux)
+MAX_CHUNKS = 64
+
+# small chunks are merged (up to this size) so we do not make one system call per chunk
+GATHER_SIZE = 64*1024
+
+
+class WriteBuffer (object):
+	"""Data waiting to be sent on a socket
+
+	The data is kept as a queue of chunks, so appending does not copy the
+	backlog and a partial send only slices the first chunk (using a memoryview)"""
+
+	__slots__ = ['chunks', 'size']
+
+	def __init__ (self, data=''):
+		self.chunks = deque()
+		self.size = 0
+
+		if data:
+			self.append(data)
+
+	def __len__ (self):
+		return self.size
+
+	def __nonzero__ (self):
+		return self.size != 0
+
+	def __str__ (self):
+		return ''.join(chunk if isinstance(chunk, str) else chunk.tobytes() for chunk in self.chunks)
+
+	def append (self, data):
+		if data:
+			self.chunks.append(data)
+			self.size += len(data)
+
+	def prepend (self, data):
+		if data:
+			self.chunks.appendleft(data)
+			self.size += len(data)
+
+	def clear (self):
+		self.chunks.clear()
+		self.size = 0
+
+	def consume (self, sent):
+		"""forget about the first sent bytes of the buffer"""
+		self.size -= sent
+		chunks = self.chunks
+
+		while sent:
+			chunk = chunks[0]
+			length = len(chunk)
+
+			if sent < length:
+				# no copy, the view keeps a reference to the original string
+				chunks[0] = memoryview(chunk)[sent:] if isinstance(chunk, str) else chunk[sent:]
+				break
+
+			chunks.popleft()
+			sent -= length
+
+	def _gather (self):
+		"""merge the small chunks at the front of the queue into one"""
+		chunks = self.chunks
+		parts = []
+		size = 0
+
+		while chunks and size + len(chunks[0]) <= GATHER_SIZE:
+			chunk = chunks.popleft()
+			parts.append(chunk if isinstance(chunk, str) else chunk.tobytes())
+			size += len(chunk)
+
+		if parts:
+			chunks.appendleft(''.join(parts))
+
+		return chunks[0]
+
+	def _send (self, sock):
+		# return how much was sent and how much we tried to send
+		if _sendmsg:
+			chunks = list(islice(self.chunks, MAX_CHUNKS))
+			attempted = sum(len(chunk) for chunk in chunks)
+			sent = sock.sendmsg(chunks)
+
+		else:
+			chunk = self.chunks[0]
+			if len(chunk) < GATHER_SIZE and len(self.chunks) > 1:
+				chunk = self._gather()
+
+			attempted = len(chunk)
+			sent = sock.send(chunk)
+
+		self.consume(sent)
+		return sent, attempted
+
+	def send (self, sock):
+		"""send as much data as the socket accepts in one system call and return how much was sent
+		socket errors are raised as with sock.send"""
+
+		if not self.chunks:
+			# still let the socket report any error (like a failed connection)
+			return sock.send('')
+
+		return self._send(sock)[0]
+
+	def flush (self, sock):
+		"""send until the buffer is empty or the socket is full and return how much was sent
+		socket errors are raised as with sock.send, unless some data could be sent"""
+
+		if not self.chunks:
+			return sock.send('')
+
+		total = 0
+
+		while self.chunks:
+			try:
+				sent, attempted = self._send(sock)
+			except socket.error, e:
+				if total and e.args[0] in errno_block:
+					break
+				raise
+
+			total += sent
+
+			# a short write: the socket is full, we will be told when it can take more
+			if sent < attempted:
+				break
+
+		return total
@@ -31,8 +31,8 @@ class Daemon (object):
 		if configuration.web.debug:
 			self.log.critical('WARNING: python remote execution via the web server is enabled')
 
-		if configuration.daemon.reactor == 'epoll' and not sys.platform.startswith('linux'):
-			self.log.error('exaproxy.daemon.reactor can only be epoll only on Linux')
+		if configuration.daemon.reactor in ('epoll','edge') and not sys.platform.startswith('linux'):
+			self.log.error('exaproxy.daemon.reactor can only be epoll or edge only on Linux')
 			sys.exit(1)
 
 		if configuration.daemon.reactor == 'kqueue' and not sys.platform.startswith('freebsd') and not sys.platform.startswith('darwin'):
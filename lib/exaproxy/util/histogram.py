@@ -0,0 +1,113 @@
+# encoding: utf-8
+"""
+histogram.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+# each power of two is split in 2**SUB_BITS buckets, so a value is known within 12.5%
+SUB_BITS = 3
+SUB = 1 << SUB_BITS
+
+# the percentiles we report
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket (value):
+	"""the bucket of a value in microseconds (values under 2*SUB have their own bucket)"""
+	if value < 2*SUB:
+		return value
+
+	shift = value.bit_length() - SUB_BITS - 1
+	return (shift << SUB_BITS) + (value >> shift)
+
+def highest (index):
+	"""the largest value counted in a bucket"""
+	if index < 2*SUB:
+		return index
+
+	shift = (index >> SUB_BITS) - 1
+	return ((index - (shift << SUB_BITS) + 1) << shift) - 1
+
+
+class Histogram (object):
+	"""Durations counted in logarithmic buckets (as HdrHistogram does)
+
+	Recording is a few integer operations, the memory used only depends on
+	the range of the durations seen, and histograms from several processes
+	can be added together before the percentiles are computed"""
+
+	__slots__ = ['counts', 'count', 'total', 'maximum']
+
+	def __init__ (self):
+		self.counts = {}   # bucket -> number of durations in the bucket
+		self.count = 0     # number of durations recorded
+		self.total = 0     # sum of the durations, in microseconds
+		self.maximum = 0   # longest duration, in microseconds
+
+	def record (self, elapsed):
+		"""count a duration given in seconds"""
+		value = int(elapsed * 1000000)
+		index = bucket(value)
+
+		self.counts[index] = self.counts.get(index, 0) + 1
+		self.count += 1
+		self.total += value
+
+		if value > self.maximum:
+			self.maximum = value
+
+	def dump (self):
+		"""the content of the histogram, to be merged in another process"""
+		return self.counts, self.count, self.total, self.maximum
+
+	def merge (self, data):
+		counts, count, total, maximum = data
+
+		for index, number in counts.iteritems():
+			self.counts[index] = self.counts.get(index, 0) + number
+
+		self.count += count
+		self.total += total
+		self.maximum = max(self.maximum, maximum)
+
+	def percentile (self, percent):
+		"""the duration, in microseconds, under which percent of the durations are"""
+		if not self.count:
+			return 0
+
+		wanted = self.count * percent / 100.0
+		seen = 0
+
+		for index in sorted(self.counts):
+			seen += self.counts[index]
+			if seen >= wanted:
+				return min(highest(index), self.maximum)
+
+		return self.maximum
+
+	def below (self, limits):
+		"""the number of durations up to each limit (in microseconds, sorted)"""
+		returned = []
+		seen = 0
+		indexes = sorted(self.counts)
+
+		for limit in limits:
+			while indexes and highest(indexes[0]) <= limit:
+				seen += self.counts[indexes.pop(0)]
+
+			returned.append(seen)
+
+		return returned
+
+	def summary (self):
+		returned = {
+			'count': self.count,
+			'mean': self.total / self.count if self.count else 0,
+			'max': self.maximum,
+		}
+
+		for percent in PERCENTILES:
+			returned['p%s' % percent] = self.percentile(percent)
+
+		return returned
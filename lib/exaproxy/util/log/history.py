@@ -43,7 +43,7 @@ class _History:
 
 	def formated (self):
 		for timestamp, name, level, text in self.snapshot():
-			date = time.strftime('%a, %d %b %Y %H:%M:%S',timestamp)
+			date = time.strftime('%a, %d %b %Y %H:%M:%S',time.localtime(timestamp))
 			yield '%s %s %-13s %s' % (date, name, Level.name(level), text)
 
 def History (size=1000):
@@ -23,51 +23,60 @@ class Logger:
 		self.active = active
 		self.loglevel = loglevel
 
-	def log (self, text, loglevel):
-		now = time.localtime()
-		self.history.record(now, self.name, loglevel, text)
+	def enabled (self, loglevel):
+		"""would a message at this level be written (by our mailbox's writer)"""
+		return self.active is True and loglevel >= self.loglevel and loglevel >= self.mailbox.level
 
-		if self.active is True and loglevel >= self.loglevel:
-			self.mailbox.addMessage((self.name, loglevel, now, text))
-			res = True
-		else:
-			res = None
+	def log (self, text, loglevel, args=()):
+		# the message is only built if it is going to be written:
+		# text can be a format string for args or a function returning the message
+		if self.active is not True or loglevel < self.loglevel or loglevel < self.mailbox.level:
+			return None
 
-		return res
+		if args:
+			text = text % args
+
+		elif callable(text):
+			text = text()
+
+		now = time.time()
+		self.history.record(now, self.name, loglevel, text)
+		self.mailbox.addMessage((self.name, loglevel, now, text))
+		return True
 
 	def stdout (self, message):
 		print message
 
-	def debug (self, message):
-		self.log(message, logging.DEBUG)
+	def debug (self, message, *args):
+		self.log(message, logging.DEBUG, args)
 
-	def info (self, message):
-		self.log(message, logging.INFO)
+	def info (self, message, *args):
+		self.log(message, logging.INFO, args)
 
-	def notice (self, message):
-		self.log(message, logging.INFO)
+	def notice (self, message, *args):
+		self.log(message, logging.INFO, args)
 
-	def warning (self, message):
-		self.log(message, logging.WARNING)
+	def warning (self, message, *args):
+		self.log(message, logging.WARNING, args)
 
-	def error (self, message):
-		self.log(message, logging.ERROR)
+	def error (self, message, *args):
+		self.log(message, logging.ERROR, args)
 
-	def critical (self, message):
-		self.log(message, logging.CRITICAL)
+	def critical (self, message, *args):
+		self.log(message, logging.CRITICAL, args)
 
-	def alert (self, message):
-		self.log(message, logging.WARNING)
+	def alert (self, message, *args):
+		self.log(message, logging.WARNING, args)
 
-	def emergency (self, message):
-		self.log(message, logging.CRITICAL)
+	def emergency (self, message, *args):
+		self.log(message, logging.CRITICAL, args)
 
 
 class UsageLogger (Logger):
 	mailbox = usage_store
 
 	def logRequest (self, client_id, client_port, accept_ip, client_ip, command, url, status, destination):
-		if self.active:
+		if self.enabled(logging.INFO):
 			now = time.time()
 			line = '%s %.02f %s %s %s %s %s %s/%s' % (
 				time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
@@ -79,3 +88,13 @@ class UsageLogger (Logger):
 			res = None
 
 		return res
+
+	def logRecord (self, record):
+		"""a structured record (a tuple of usage.FIELDS) rather than a line of text, not kept in the history"""
+		if self.enabled(logging.INFO):
+			self.mailbox.addMessage((self.name, logging.INFO, record[0], record))
+			res = True
+		else:
+			res = None
+
+		return res
@@ -1,7 +1,16 @@
+import logging
+
+# the level of the messages stored when their writer is disabled
+SILENT = logging.CRITICAL + 1
+
 class MessageStore:
 	def __init__ (self, name):
 		self.name = name
 		self.queue = []
+		self.level = logging.DEBUG  # the least important message the writer will write
+
+	def setLevel (self, active, level):
+		self.level = level if active else SILENT
 
 	def addMessage (self, message):
 		return self.queue.append(message)
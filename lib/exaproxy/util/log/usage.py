@@ -0,0 +1,74 @@
+# encoding: utf-8
+"""
+usage.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import struct
+
+# the fields of the structured usage records (see reactor/timing.py)
+# the stages are in the order they usually happen: seconds since the request was read, None if it
+# did not happen (but accept, how long the connection was open before the request was read)
+# the status and body size of the response of the web server are None when there was none
+STAGES = ('accept', 'decision', 'dns', 'connect', 'first_byte', 'last_byte')
+FIELDS = ('time', 'client', 'source', 'accept_ip', 'accept_port', 'peer', 'method', 'url', 'action', 'destination') + STAGES + ('status', 'size')
+
+# a binary record is a fixed header followed by its strings: the size of what follows the size,
+# the time, the accept port, the stages (-1 if they did not happen), the length of the strings,
+# the status (0 if none) and the size (-1 if none)
+_fixed = struct.Struct('!IdH6d8IHq')
+_strings = (1, 2, 3, 5, 6, 7, 8, 9)
+
+def pack (record):
+	strings = [record[index] or '' for index in _strings]
+	stages = [-1.0 if stage is None else stage for stage in record[10:16]]
+	lengths = [len(string) for string in strings]
+	status = record[16] or 0
+	size = -1 if record[17] is None else record[17]
+
+	header = _fixed.pack(_fixed.size - 4 + sum(lengths), record[0], record[4] or 0, *(stages + lengths + [status, size]))
+	return header + ''.join(strings)
+
+def unpack (data, offset=0):
+	"""the record starting at offset and where the next one starts"""
+	size, when, port, accept, decision, dns, connect, first, last, l1, l2, l3, l4, l5, l6, l7, l8, status, length = _fixed.unpack_from(data, offset)
+
+	p1 = offset + _fixed.size
+	p2 = p1 + l1
+	p3 = p2 + l2
+	p4 = p3 + l3
+	p5 = p4 + l4
+	p6 = p5 + l5
+	p7 = p6 + l6
+	p8 = p7 + l7
+
+	return (
+		when, data[p1:p2], data[p2:p3], data[p3:p4], port, data[p4:p5], data[p5:p6], data[p6:p7], data[p7:p8], data[p8:p8+l8],
+		None if accept < 0 else accept,
+		None if decision < 0 else decision,
+		None if dns < 0 else dns,
+		None if connect < 0 else connect,
+		None if first < 0 else first,
+		None if last < 0 else last,
+		status or None,
+		None if length < 0 else length,
+	), offset + 4 + size
+
+def records (data):
+	"""all the complete records in data (the content of a binary usage file)"""
+	offset = 0
+	size = len(data)
+
+	while offset < size:
+		try:
+			record, end = unpack(data, offset)
+		except struct.error:
+			break
+
+		# the end of the file may have been read while the record was being written
+		if end > size:
+			break
+
+		yield record
+		offset = end
@@ -8,13 +8,21 @@ Copyright (c) 2011-2013  Exa Networks. All rights reserved.
 
 import os
 import sys
+import glob
+import json
 import time
 import logging
 import logging.handlers
 
+from threading import Thread
+from threading import Condition
+from collections import deque
+
 from .history import History,Level
 from .message import message_store
 from .message import usage_store
+from .usage import FIELDS
+from .usage import pack
 
 class RecordedLog (object):
 	history = History()
@@ -65,6 +73,8 @@ class LogWriter (RecordedLog):
 			self.active = True
 			self.level = self.debug_level
 
+		self.mailbox.setLevel(self.active, self.level)
+
 
 class DebugLogWriter(LogWriter):
 	mailbox = message_store
@@ -75,10 +85,13 @@ class DebugLogWriter(LogWriter):
 		self.level = level
 		self.fd = fd
 
+		# the loggers do not build the messages we would not write
+		self.mailbox.setLevel(active, level)
+
 	def formatMessage (self, name, level, timestamp, message):
 		identifier = self.getIdentifier()
 		loglevel = Level.name(level)
-		date_string = time.strftime('%a, %d %b %Y %H:%M:%S',timestamp)
+		date_string = time.strftime('%a, %d %b %Y %H:%M:%S',time.localtime(timestamp))
 		template = '%s %s %-6d %-10s %-13s %%s' % (date_string, identifier, self.pid, loglevel, name)
 
 		return '\n'.join(template % line for line in message.split('\n'))
@@ -101,6 +114,9 @@ class SysLogWriter(LogWriter):
 		self.active = active
 		self.level = level
 
+		# the loggers do not build the messages we would not write
+		self.mailbox.setLevel(active, level)
+
 		_syslog = logging.getLogger(name)
 		for handler in _syslog.handlers:
 			_syslog.removeHandler(handler)
@@ -109,6 +125,7 @@ class SysLogWriter(LogWriter):
 		_syslog.setLevel(level)
 
 		self._syslog = _syslog
+		self._handler = _handler
 
 	def formatMessage (self, name, level, timestamp, message):
 		identifier = self.getIdentifier()
@@ -149,5 +166,251 @@ class SysLogWriter(LogWriter):
 		return handler
 
 
+class RotatingFile (object):
+	"""A file the usage records are appended to, renamed when too big or too old
+
+	Every process writes to the same file: the one which rotates it renames it
+	(with the date of the rotation) and the others notice it and open the new one.
+	The time based rotation happens on multiples of the period since the epoch so
+	that all the processes agree on it"""
+
+	def __init__ (self, path, size=0, period=0, keep=0):
+		self.path = path
+		self.size = size        # the largest size of the file in bytes, 0 for no limit
+		self.period = period    # how many seconds a file is used for, 0 for no limit
+		self.keep = keep        # how many rotated files to keep, 0 to keep them all
+
+		self.fd = None
+		self.inode = None
+		self.opened = None
+		self._open()
+
+	def _open (self):
+		if self.fd is not None:
+			try:
+				os.close(self.fd)
+			except OSError:
+				pass
+
+		self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+		self.inode = os.fstat(self.fd).st_ino
+		self.opened = time.time()
+
+	def _rotate (self, now):
+		name = '%s.%s' % (self.path, time.strftime('%Y%m%d-%H%M%S', time.localtime(now)))
+		target, count = name, 0
+
+		while os.path.exists(target):
+			count += 1
+			target = '%s-%d' % (name, count)
+
+		try:
+			os.rename(self.path, target)
+		except OSError:
+			pass  # another process moved it first
+
+		self._open()
+		self._expire()
+
+	def _expire (self):
+		if not self.keep:
+			return
+
+		rotated = sorted(glob.glob(self.path + '.*'), key=os.path.getmtime)
+
+		for name in rotated[:-self.keep]:
+			try:
+				os.remove(name)
+			except OSError:
+				pass
+
+	def write (self, data):
+		now = time.time()
+
+		try:
+			moved = os.stat(self.path).st_ino != self.inode
+		except OSError:
+			moved = True
+
+		# another process (or logrotate) moved the file away
+		if moved:
+			self._open()
+
+		if self.period and int(now // self.period) != int(self.opened // self.period):
+			self._rotate(now)
+
+		elif self.size:
+			current = os.fstat(self.fd).st_size
+			if current and current + len(data) > self.size:
+				self._rotate(now)
+
+		written = 0
+		while written < len(data):
+			written += os.write(self.fd, buffer(data, written))
+
+	def close (self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+
 class UsageWriter(SysLogWriter):
+	"""The usage records are written by a thread, in batches, so a slow disk or
+	syslog server does not hold the reactor
+
+	The records wait in a bounded queue: when it is full they are dropped (and
+	counted) or the reactor waits for the thread to make room. They are formatted
+	by the thread, as text lines, json lines or binary records (see usage.py).
+	Files are rotated by the writers themselves"""
+
 	mailbox = usage_store
+
+	def __init__ (self, name, destination, active=True, level=Level.value.INFO, size=65536, overflow='drop', format='text', rotate_size=0, rotate_time=0, rotate_keep=0):
+		self.rotation = rotate_size, rotate_time, rotate_keep
+		self.file = None                # the file we write to, if the destination is not syslog or a stream
+
+		SysLogWriter.__init__(self, name, destination, active, level)
+		self.size = size                # how many records can be waiting
+		self.block = overflow == 'block'
+		self.dropped = 0                # records lost as the queue was full
+		self.written = 0                # records handed to the destination
+
+		# syslog can not carry binary data
+		if format == 'binary' and self.file is None and not isinstance(self._handler, logging.StreamHandler):
+			format = 'json'
+
+		self.format = format
+		self.text = format == 'text'
+		self.encode = getattr(self, 'encode_%s' % format)
+		self.separator = '' if format == 'binary' else '\n'
+
+		self.queue = deque()            # the records waiting for the thread
+		self.condition = Condition()
+		self.stopping = False
+		self.thread = None
+		self.owner = None               # the process which started the thread
+
+	def getHandler (self, destination):
+		if destination in ('stdout', 'stderr', '') or destination.lower().startswith('host:'):
+			return SysLogWriter.getHandler(self, destination)
+
+		self.file = RotatingFile(destination, *self.rotation)
+		return logging.NullHandler()
+
+	def encode_text (self, name, level, timestamp, message):
+		return self.formatMessage(name, level, timestamp, message)
+
+	def encode_json (self, name, level, timestamp, message):
+		record = dict(zip(FIELDS, message))
+
+		try:
+			return json.dumps(record, separators=(',', ':'))
+		except UnicodeDecodeError:
+			# the url is not always valid utf-8
+			return json.dumps(record, separators=(',', ':'), encoding='latin-1')
+
+	def encode_binary (self, name, level, timestamp, message):
+		return pack(message)
+
+	def _start (self):
+		# threads do not survive a fork: each process needs its own
+		if self.owner != os.getpid():
+			if self.owner is not None:
+				self._handler.createLock()  # our parent's thread may have been holding it
+			self.queue = deque()        # the records queued before the fork are written by our parent
+			self.condition = Condition()
+			self.stopping = False
+			self.owner = os.getpid()
+
+			self.thread = Thread(target=self._run)
+			self.thread.daemon = True
+			self.thread.start()
+
+	def stop (self):
+		"""write the records queued and end the thread"""
+		if self.owner != os.getpid():
+			return
+
+		with self.condition:
+			self.stopping = True
+			self.condition.notify_all()
+
+		self.thread.join()
+		self.owner = None
+
+	def writeMessages (self):
+		messages = self.mailbox.readMessages()
+		if not messages or not self.active:
+			return
+
+		# the structured formats only write the records, not the lines of text
+		records = [(n,l,t,m) for (n,l,t,m) in messages if l >= self.level and (self.text or type(m) is tuple)]
+		if not records:
+			return
+
+		self._start()
+
+		with self.condition:
+			queue = self.queue
+
+			if self.block:
+				for record in records:
+					while len(queue) >= self.size:
+						self.condition.wait()
+					queue.append(record)
+					self.condition.notify_all()
+
+			else:
+				room = self.size - len(queue)
+				if room < len(records):
+					self.dropped += len(records) - max(room, 0)
+					records = records[:max(room, 0)]
+
+				queue.extend(records)
+				self.condition.notify_all()
+
+	def _run (self):
+		while True:
+			with self.condition:
+				while not self.queue and not self.stopping:
+					self.condition.wait()
+
+				if not self.queue:
+					return
+
+				records = list(self.queue)
+				self.queue.clear()
+
+				# the reactor may be waiting for room
+				self.condition.notify_all()
+
+			try:
+				self.writeBatch(records)
+			except Exception:
+				# the records are lost but we keep writing the next ones
+				with self.condition:
+					self.dropped += len(records)
+			else:
+				self.written += len(records)
+
+	def writeBatch (self, records):
+		lines = [self.encode(n,l,t,m) for (n,l,t,m) in records]
+
+		# a stream or a file can take them all at once, syslog needs one message per line
+		if self.file is not None:
+			self.file.write(self.separator.join(lines) + self.separator)
+			return
+
+		handler = self._handler
+
+		if not isinstance(handler, logging.StreamHandler):
+			for line in lines:
+				self.writeMessage(self.level, line)
+			return
+
+		handler.acquire()
+		try:
+			handler.stream.write(self.separator.join(lines) + self.separator)
+			handler.flush()
+		finally:
+			handler.release()
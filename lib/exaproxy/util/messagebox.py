@@ -1,5 +1,9 @@
 import os
 import pickle
+import cPickle
+import struct
+
+from collections import deque
 
 from exaproxy.network.errno_list import errno_block
 
@@ -75,8 +79,11 @@ class MessageReader:
 
 class MessageBox (MessageReader):
 	def __init__ (self, pipe_in, pipe_out):
-		self.pipe_in = os.fdopen(pipe_in, 'r', 0)
-		self.pipe_out = os.fdopen(pipe_out, 'w', 0)
+		# either end can be None for a one way channel
+		self.pipe_in = os.fdopen(pipe_in, 'r', 0) if pipe_in is not None else None
+		self.pipe_out = os.fdopen(pipe_out, 'w', 0) if pipe_out is not None else None
+		self.unsent = ''         # what a non blocking pipe did not accept yet
+		self.partial = False     # was the start of the unsent message written
 
 	def close (self):
 		if self.pipe_in is not None:
@@ -102,6 +109,28 @@ class MessageBox (MessageReader):
 				if e.errno not in errno_block:
 					raise e
 
+	def send (self, message):
+		"""write the message to a non blocking pipe without waiting, True if all of it was written
+		a message the full pipe did not take at all is replaced by the next one, when only its
+		start was written it is completed first and the next message is dropped
+		errors other than a full pipe are raised as OSError"""
+		if not self.partial:
+			pickled = pickle.dumps(message)
+			self.unsent = str(len(pickled)) + self.delimiter + str(pickled) + self.eom
+
+		while self.unsent:
+			try:
+				written = os.write(self.pipe_out.fileno(), self.unsent)
+			except OSError, e:
+				if e.errno in errno_block:
+					return False
+				raise
+
+			self.unsent = self.unsent[written:]
+			self.partial = bool(self.unsent)
+
+		return True
+
 	def get (self):
 		while True:
 			try:
@@ -122,3 +151,200 @@ class MessageBox (MessageReader):
 
 		return message
 
+
+
+
+# the requests and decisions exchanged with the redirector process are tuples of strings,
+# numbers and None: they are framed in binary (type, length, data) rather than pickled
+
+_header = struct.Struct('!I')       # the length of a frame
+_field = struct.Struct('!cI')       # the type of a field and the length of its data (or its number of items)
+
+READ_SIZE = 256*1024
+
+
+def _encode (value, parts):
+	kind = type(value)
+
+	if kind is str:
+		parts.append(_field.pack('s', len(value)))
+		parts.append(value)
+
+	elif kind is tuple or kind is list:
+		parts.append(_field.pack('t', len(value)))
+		for item in value:
+			_encode(item, parts)
+
+	elif value is None:
+		parts.append(_field.pack('n', 0))
+
+	elif kind is bool:
+		parts.append(_field.pack('T' if value else 'F', 0))
+
+	elif kind is int or kind is long:
+		value = str(value)
+		parts.append(_field.pack('i', len(value)))
+		parts.append(value)
+
+	elif kind is unicode:
+		value = value.encode('utf-8')
+		parts.append(_field.pack('u', len(value)))
+		parts.append(value)
+
+	else:
+		value = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+		parts.append(_field.pack('p', len(value)))
+		parts.append(value)
+
+def _decode (data, offset):
+	kind, length = _field.unpack_from(data, offset)
+	offset += _field.size
+
+	if kind == 's':
+		return data[offset:offset+length], offset + length
+
+	if kind == 't':
+		items = []
+		for _ in xrange(length):
+			item, offset = _decode(data, offset)
+			items.append(item)
+		return tuple(items), offset
+
+	if kind == 'n':
+		return None, offset
+
+	if kind == 'T':
+		return True, offset
+
+	if kind == 'F':
+		return False, offset
+
+	if kind == 'i':
+		return int(data[offset:offset+length]), offset + length
+
+	if kind == 'u':
+		return data[offset:offset+length].decode('utf-8'), offset + length
+
+	if kind == 'p':
+		return cPickle.loads(data[offset:offset+length]), offset + length
+
+	raise ValueError('invalid field type %s' % repr(kind))
+
+def frame (message):
+	parts = ['']
+	_encode(message, parts)
+	parts[0] = _header.pack(sum(len(part) for part in parts))
+	return ''.join(parts)
+
+
+class FrameBox (object):
+	"""Messages framed in binary, written and read many at a time
+
+	put only queues the message, flush writes all the queued messages with one
+	system call. read returns all the messages received with one system call
+	(what is left of an incomplete message is kept for the next read)"""
+
+	def __init__ (self, pipe_in, pipe_out):
+		# either end can be None for a one way channel
+		self.pipe_in = os.fdopen(pipe_in, 'r', 0) if pipe_in is not None else None
+		self.pipe_out = os.fdopen(pipe_out, 'w', 0) if pipe_out is not None else None
+		self.received = ''       # the start of a message not yet complete
+		self.messages = deque()  # messages received but not yet returned
+		self.pending = []        # framed messages not yet written
+		self.unsent = ''         # what a non blocking pipe did not accept yet
+
+	def close (self):
+		if self.pipe_in is not None:
+			try:
+				self.pipe_in.close()
+			except IOError:
+				pass
+
+		if self.pipe_out is not None:
+			try:
+				self.pipe_out.close()
+			except IOError:
+				pass
+
+	def put (self, message):
+		self.pending.append(frame(message))
+
+	def flush (self):
+		if not self.pending:
+			return
+
+		data = ''.join(self.pending)
+		self.pending = []
+
+		while True:
+			try:
+				return self.pipe_out.write(data)
+			except IOError, e:
+				if e.errno not in errno_block:
+					raise e
+
+	def send (self):
+		"""write as much of the queued messages as a non blocking pipe accepts, True if everything was written
+		errors other than a full pipe are raised as OSError"""
+		if self.pending:
+			data = ''.join(self.pending)
+			self.unsent = self.unsent + data if self.unsent else data
+			self.pending = []
+
+		while self.unsent:
+			try:
+				written = os.write(self.pipe_out.fileno(), self.unsent)
+			except OSError, e:
+				if e.errno in errno_block:
+					return False
+				raise
+
+			self.unsent = self.unsent[written:]
+
+		return True
+
+	def _receive (self):
+		"""read once from the pipe and decode the complete messages, False if the pipe was closed"""
+		try:
+			data = os.read(self.pipe_in.fileno(), READ_SIZE)
+		except OSError, e:
+			if e.errno in errno_block:
+				return True
+			data = ''
+		except ValueError:  # I/O operation on closed file
+			data = ''
+
+		if not data:
+			return False
+
+		data = self.received + data if self.received else data
+		offset = 0
+		size = len(data)
+
+		try:
+			while size - offset >= _header.size:
+				length, = _header.unpack_from(data, offset)
+				end = offset + _header.size + length
+
+				if end > size:
+					break
+
+				message, _ = _decode(data, offset + _header.size)
+				self.messages.append(message)
+				offset = end
+
+		except (struct.error, ValueError, TypeError, cPickle.UnpicklingError):
+			# we can not find where the next message starts
+			return False
+
+		self.received = data[offset:]
+		return True
+
+	def read (self):
+		"""the messages available after one read from the pipe (possibly none), None if the pipe was closed"""
+		if not self._receive() and not self.messages:
+			return None
+
+		messages = list(self.messages)
+		self.messages.clear()
+		return messages
@@ -0,0 +1,142 @@
+# encoding: utf-8
+"""
+reactors.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import os
+import fcntl
+import errno
+import signal
+import socket
+
+from .messagebox import MessageBox
+from .log.logger import Logger
+
+
+class ReactorProcesses (object):
+	"""Reactor processes accepting connections on the same listening ports (SO_REUSEPORT)
+
+	The first process forks the others, forwards them the signals it receives and
+	collects their statistics (once a second) so they can be added to its own"""
+
+	def __init__ (self, configuration):
+		self.number = max(1, configuration.daemon.reactors)
+		self.primary = True      # are we the process which forked the others
+		self.index = 0           # our position in the list of processes
+		self.parent = os.getpid()
+		self.children = {}       # pid -> index of the process
+		self.boxes = {}          # pipe -> pid, MessageBox, the statistics sent by each child
+		self.statistics = {}     # pid -> the last statistics received from the child
+		self.latency = {}        # pid -> the last histograms received from the child (see Monitor.histograms)
+		self.channel = None      # where a child sends its statistics
+		self.log = Logger('supervisor', configuration.log.supervisor)
+
+		if self.number > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+			self.log.critical('SO_REUSEPORT is not available, exaproxy.daemon.reactors is ignored')
+			self.number = 1
+
+	def fork (self):
+		"""fork the other reactor processes, must be called before any listening socket or poller is created"""
+		for index in range(1, self.number):
+			reader, writer = os.pipe()
+
+			pid = os.fork()
+
+			if pid == 0:  # the child process
+				os.close(reader)
+
+				for _, box in self.boxes.values():
+					box.close()
+
+				self.primary = False
+				self.index = index
+				self.children = {}
+				self.boxes = {}
+				self.channel = MessageBox(None, writer)
+
+				# a busy first process must not stop us from serving our clients
+				flags = fcntl.fcntl(writer, fcntl.F_GETFL)
+				fcntl.fcntl(writer, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+				# signals sent to the process group are forwarded to us by the first process
+				os.setpgid(0, 0)
+				return False
+
+			os.close(writer)
+
+			box = MessageBox(reader, None)
+			self.children[pid] = index
+			self.boxes[box.pipe_in] = pid, box
+
+		# logged once all the children exist, so they do not inherit the messages
+		for pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+			self.log.info('forked reactor process %d with pid %d' % (index, pid))
+
+		return True
+
+	def pipes (self):
+		return [box.pipe_in for _, box in self.boxes.values()]
+
+	def alive (self):
+		"""is the process which forked us still running"""
+		return self.primary or os.getppid() == self.parent
+
+	def report (self, stats, latency):
+		"""send our statistics and latency histograms to the first process
+		if its pipe is full this report is skipped, the next one supersedes it"""
+		if self.channel is None:
+			return True
+
+		try:
+			self.channel.send((stats, latency))
+		except (IOError, OSError):
+			return False
+
+		return True
+
+	def receive (self, pipe):
+		"""read statistics from a child, returns False if it went away"""
+		pid, box = self.boxes[pipe]
+		message = box.get()
+
+		if message is None:
+			self.log.critical('reactor process %d (pid %d) went away' % (self.children.get(pid, 0), pid))
+			return False
+
+		self.statistics[pid], self.latency[pid] = message
+		return True
+
+	def signal (self, signum):
+		"""forward a signal we received to our children"""
+		for pid in self.children:
+			try:
+				os.kill(pid, signum)
+			except OSError, e:
+				if e.errno != errno.ESRCH:
+					self.log.error('could not signal reactor process %d : %s' % (pid, str(e)))
+
+	def stop (self):
+		if self.channel is not None:
+			self.channel.close()
+			self.channel = None
+
+		if not self.children:
+			return
+
+		self.signal(signal.SIGTERM)
+
+		for pid in self.children:
+			try:
+				os.waitpid(pid, 0)
+			except OSError:
+				pass
+
+		for _, box in self.boxes.values():
+			box.close()
+
+		self.children = {}
+		self.boxes = {}
+		self.statistics = {}
+		self.latency = {}
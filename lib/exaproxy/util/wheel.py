@@ -0,0 +1,130 @@
+# encoding: utf-8
+"""
+wheel.py
+
+Copyright (c) 2011-2014  Exa Networks. All rights reserved.
+"""
+
+import time
+
+# each wheel has 2**BITS slots, a slot of a wheel covers a whole turn of the wheel below it
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+LEVELS = 4
+
+
+class TimerWheel (object):
+	"""Deadlines, kept in hierarchical wheels of slots (as the linux kernel timers)
+
+	Time is counted in ticks. A deadline is kept in the slot of the tick it
+	expires in, on the first wheel if it is less than one turn away, or in
+	the slot of a coarser wheel which is moved down to the wheel below once
+	it is reached. Adding, moving or removing a deadline is O(1), as is each
+	tick (but for the deadlines expiring or moved down)"""
+
+	def __init__ (self, tick):
+		self.tick = tick
+		self.current = int(time.time() / tick)  # the last tick handled
+		self.wheels = [[{} for _ in xrange(SLOTS)] for _ in xrange(LEVELS)]
+		self.where = {}  # key -> level, slot
+		self.counts = [0] * LEVELS  # number of deadlines on each wheel
+		self.longest = (1 << (BITS * LEVELS)) - 1
+
+	def __len__ (self):
+		return len(self.where)
+
+	def __contains__ (self, key):
+		return key in self.where
+
+	def _link (self, key, expires):
+		delta = min(expires - self.current, self.longest)
+
+		level = 0
+		while delta >= SLOTS << (BITS * level):
+			level += 1
+
+		# further than the coarsest wheel can count, it is moved down (and back) until it is close enough
+		index = ((self.current + delta) >> (BITS * level)) & MASK
+		self.wheels[level][index][key] = expires
+		self.where[key] = level, index
+		self.counts[level] += 1
+
+	def _unlink (self, key):
+		level, index = self.where.pop(key)
+		del self.wheels[level][index][key]
+		self.counts[level] -= 1
+
+	@property
+	def near (self):
+		"""the number of deadlines less than a turn of the first wheel away"""
+		return self.counts[0]
+
+	def add (self, key, delay):
+		"""(re)set the deadline of key, delay seconds from now"""
+		# the deadline is never early, at worse one tick late
+		expires = max(int((time.time() + delay) / self.tick) + 1, self.current + 1)
+
+		position = self.where.get(key, None)
+		if position is not None:
+			level, index = position
+
+			# moved within the same tick (as when data keeps flowing), nothing to do
+			if self.wheels[level][index][key] == expires:
+				return
+
+			self._unlink(key)
+
+		self._link(key, expires)
+
+	def remove (self, key):
+		if key in self.where:
+			self._unlink(key)
+
+	def expired (self):
+		"""the keys whose deadline passed, they are removed"""
+		now = int(time.time() / self.tick)
+		expired = []
+
+		while self.current < now:
+			# nothing can happen before the next turn of the first wheel with deadlines
+			# (if we were not called for a long time we do not go through every tick)
+			for level in xrange(LEVELS):
+				if self.counts[level]:
+					self.current = min(now - 1, self.current | ((1 << (BITS * level)) - 1))
+					break
+			else:
+				self.current = now
+				break
+
+			self.current += 1
+			current = self.current
+
+			# a turn of a wheel was completed, the next slot of the wheel above is moved down
+			level = 1
+			while level < LEVELS and not current & ((1 << (BITS * level)) - 1):
+				index = (current >> (BITS * level)) & MASK
+				slot = self.wheels[level][index]
+				self.wheels[level][index] = {}
+
+				self.counts[level] -= len(slot)
+
+				for key, expires in slot.iteritems():
+					del self.where[key]
+					self._link(key, expires)
+
+				level += 1
+
+			index = current & MASK
+			slot = self.wheels[0][index]
+
+			if slot:
+				self.wheels[0][index] = {}
+				self.counts[0] -= len(slot)
+
+				for key in slot:
+					del self.where[key]
+
+				expired.extend(slot)
+
+		return expired